@@ -1,17 +1,34 @@
+import time
+
+# 记录本模块（含 FastAPI 与各服务模块）的导入耗时，写入启动报告
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
+import asyncio
+import base64
 import logging
 import json
+import random
 import uuid
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from pathlib import Path
 from contextlib import asynccontextmanager
+from anyio import to_thread
 from models.schemas import UserBackground, AnalysisReport
 from api.errors import InvalidInput, NotFound, RateLimited, Timeout, DependencyUnavailable
 from services.analysis_service import AnalysisService
+from services.analysis_worker import AnalysisWorkerPool
+from services.cancellation import CancellationToken, TaskCancelled, use_token
+from services.encoded_response import EncodedBody
+from services.similarity_matcher import SimilarityMatcher
+from services.supabase_service import SupabaseService
+from services.metrics import ANALYSIS_QUEUE_DEPTH, ANALYSIS_TASKS_IN_FLIGHT, CONTENT_TYPE_LATEST, render_latest
+from services.profiling import TaskProfile, profiling
+from services.startup import STARTUP
 from config.settings import settings
 
 # Configure logging
@@ -24,24 +41,58 @@ logger = logging.getLogger(__name__)
 # Global analysis service instance
 analysis_service = None
 
+# 生产模式下由父进程在 fork 前预加载的相似度匹配器（案例表、TF-IDF 矩阵等），各工作进程写时复制共享
+preloaded_similarity_matcher: Optional[SimilarityMatcher] = None
+
+# Optional out-of-process analysis workers (ANALYSIS_WORKER_PROCESSES > 0)
+analysis_worker_pool: Optional[AnalysisWorkerPool] = None
+
 # 存储异步任务状态
 analysis_tasks: Dict[str, Dict] = {}
 
+# 运行中任务的句柄与取消令牌，用于 DELETE /api/analyze/{task_id} 真正中止任务
+running_analysis_tasks: Dict[str, Tuple[asyncio.Task, CancellationToken]] = {}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global analysis_service
+    global analysis_service, analysis_worker_pool
     logger.info("Starting up application...")
     try:
-        analysis_service = AnalysisService()
+        with STARTUP.phase("init analysis_service"):
+            matcher = preloaded_similarity_matcher
+            if matcher is not None:
+                # 预加载的数据继续共享，Supabase 连接不能跨 fork 复用，在本进程内重新建立
+                matcher.supabase_service = SupabaseService()
+            analysis_service = AnalysisService(similarity_matcher=matcher)
         logger.info("Analysis service initialized successfully")
     except Exception as e:
         logger.warning(f"Failed to initialize analysis service: {e}")
         analysis_service = None
-    logger.info("Application startup completed")
+    if settings.ANALYSIS_WORKER_PROCESSES > 0:
+        try:
+            with STARTUP.phase("init analysis_worker_pool"):
+                analysis_worker_pool = AnalysisWorkerPool(settings.ANALYSIS_WORKER_PROCESSES)
+            # 后台预热工作进程，不阻塞应用启动
+            asyncio.create_task(analysis_worker_pool.warm_up())
+        except Exception as e:
+            logger.warning(f"Failed to start analysis worker pool, falling back to in-process analysis: {e}")
+            analysis_worker_pool = None
+    logger.info(f"Application startup completed in {STARTUP.summary()}")
     yield
     # Shutdown
     logger.info("Shutting down application...")
+    if analysis_worker_pool:
+        analysis_worker_pool.shutdown()
+
+def preload_similarity_data():
+    """在当前进程加载案例数据（供 fork 工作进程前调用）"""
+    global preloaded_similarity_matcher
+    with STARTUP.phase("preload similarity data"):
+        matcher = SimilarityMatcher()
+        matcher.ensure_data_loaded()
+    preloaded_similarity_matcher = matcher
+    logger.info(f"Preloaded {len(matcher.cases_df) if matcher.cases_df is not None else 0} cases for worker processes")
 
 app = FastAPI(
     title="留学定位与选校规划系统",
@@ -173,20 +224,58 @@ async def detailed_health_check():
             "error": str(e)
         }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    statuses = [task["status"] for task in analysis_tasks.values()]
+    ANALYSIS_QUEUE_DEPTH.set(statuses.count("pending"))
+    ANALYSIS_TASKS_IN_FLIGHT.set(statuses.count("processing"))
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # -----------------------------
 # Analysis endpoints
 # -----------------------------
 
-async def process_analysis_task(task_id: str, user_background: UserBackground):
+def _should_profile(request: Request) -> bool:
+    """按请求头或抽样比例决定是否对该任务开启性能分析"""
+    if settings.PROFILE_HEADER_ENABLED and request.headers.get("x-debug-profile", "").lower() in ("1", "true", "yes"):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+async def process_analysis_task(task_id: str, user_background: UserBackground,
+                                cancel_token: Optional[CancellationToken] = None,
+                                profile: bool = False):
     """后台处理分析任务"""
+    token = cancel_token or CancellationToken()
+    task_profile = None
     try:
+        if analysis_tasks[task_id]["status"] == "cancelled":
+            return
+        
         # 更新任务状态为进行中
         analysis_tasks[task_id]["status"] = "processing"
         analysis_tasks[task_id]["progress"] = 0
         
-        # 调用分析服务
+        # 调用分析服务（启用进程池时在独立工作进程中执行）
         logger.info(f"Processing analysis task {task_id}")
-        report = await analysis_service.generate_analysis_report(user_background)
+        with use_token(token):
+            if analysis_worker_pool:
+                if profile:
+                    report, worker_profile = await analysis_worker_pool.generate_profiled_report(user_background)
+                    analysis_tasks[task_id]["profile"] = worker_profile
+                else:
+                    report = await analysis_worker_pool.generate_analysis_report(user_background)
+            else:
+                if profile:
+                    task_profile = TaskProfile(task_id, settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+                with profiling(task_profile):
+                    report = await analysis_service.generate_analysis_report(user_background)
+        
+        # 已取消的任务不允许被后续结果覆盖状态
+        if token.cancelled or analysis_tasks[task_id]["status"] == "cancelled":
+            logger.info(f"Analysis task {task_id} finished after cancellation, result discarded")
+            return
         
         if report:
             # 任务成功完成
@@ -195,20 +284,37 @@ async def process_analysis_task(task_id: str, user_background: UserBackground):
             analysis_tasks[task_id]["result"] = report
             analysis_tasks[task_id]["completed_at"] = "2024-01-01T00:00:00Z"
             logger.info(f"Analysis task {task_id} completed successfully")
+            # 完成的报告不再变化：序列化并压缩一次，之后的轮询直接返回缓存的字节
+            try:
+                analysis_tasks[task_id]["encoded_response"] = await to_thread.run_sync(
+                    EncodedBody, _completed_response(task_id, analysis_tasks[task_id])
+                )
+            except Exception as e:
+                logger.warning(f"Failed to pre-encode result of task {task_id}: {str(e)}")
         else:
             # 任务失败
             analysis_tasks[task_id]["status"] = "failed"
             analysis_tasks[task_id]["error"] = "分析服务返回空结果"
             logger.error(f"Analysis task {task_id} failed: service returned None")
+    
+    except (asyncio.CancelledError, TaskCancelled):
+        # 任务被取消：停止后续处理，不记录为失败
+        analysis_tasks[task_id]["status"] = "cancelled"
+        logger.info(f"Analysis task {task_id} cancelled")
             
     except Exception as e:
         # 任务出错
         analysis_tasks[task_id]["status"] = "failed"
         analysis_tasks[task_id]["error"] = str(e)
         logger.error(f"Analysis task {task_id} failed with error: {str(e)}")
+    
+    finally:
+        running_analysis_tasks.pop(task_id, None)
+        if task_profile is not None:
+            analysis_tasks[task_id]["profile"] = task_profile.to_dict()
 
 @app.post("/api/analyze")
-async def analyze_user_background(user_background: UserBackground, background_tasks: BackgroundTasks):
+async def analyze_user_background(user_background: UserBackground, request: Request):
     """
     异步分析用户背景并生成报告
     立即返回任务ID，前端需要轮询获取结果
@@ -241,15 +347,19 @@ async def analyze_user_background(user_background: UserBackground, background_ta
         task_id = str(uuid.uuid4())
         
         # 创建任务记录
+        profile = _should_profile(request)
         analysis_tasks[task_id] = {
             "status": "pending",
             "progress": 0,
             "created_at": "2024-01-01T00:00:00Z",
-            "user_background": user_background.dict()
+            "user_background": user_background.dict(),
+            "profile_enabled": profile
         }
         
-        # 在后台启动分析任务
-        background_tasks.add_task(process_analysis_task, task_id, user_background)
+        # 在后台启动分析任务，保留任务句柄以支持取消
+        cancel_token = CancellationToken()
+        handle = asyncio.create_task(process_analysis_task(task_id, user_background, cancel_token, profile))
+        running_analysis_tasks[task_id] = (handle, cancel_token)
         
         logger.info(f"Analysis task {task_id} started")
         
@@ -281,10 +391,19 @@ async def analyze_user_background(user_background: UserBackground, background_ta
                 detail="分析报告生成失败，请稍后重试"
             )
 
+def _completed_response(task_id: str, task: Dict) -> Dict:
+    return {
+        "task_id": task_id,
+        "status": "completed",
+        "result": task["result"],
+        "completed_at": task["completed_at"]
+    }
+
 @app.get("/api/analyze/{task_id}")
-async def get_analysis_result(task_id: str):
+async def get_analysis_result(task_id: str, request: Request):
     """
     获取分析任务结果
+    已完成任务返回预先序列化的字节，并按 Accept-Encoding 返回 br/gzip 压缩版本
     """
     if task_id not in analysis_tasks:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -292,12 +411,14 @@ async def get_analysis_result(task_id: str):
     task = analysis_tasks[task_id]
     
     if task["status"] == "completed":
-        return {
-            "task_id": task_id,
-            "status": "completed",
-            "result": task["result"],
-            "completed_at": task["completed_at"]
-        }
+        encoded = task.get("encoded_response")
+        if encoded is None:
+            return _completed_response(task_id, task)
+        body, encoding = encoded.negotiate(request.headers.get("accept-encoding"))
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
     elif task["status"] == "failed":
         return {
             "task_id": task_id,
@@ -315,6 +436,33 @@ async def get_analysis_result(task_id: str):
             "message": "分析进行中，请稍后查询"
         }
 
+@app.get("/api/analyze/{task_id}/profile")
+async def get_analysis_profile(task_id: str, format: str = "json"):
+    """
+    下载任务的性能分析结果（span 追踪 + 采样调用栈）
+    format=collapsed 时返回可直接用于火焰图工具的折叠栈文本
+    """
+    if task_id not in analysis_tasks:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    task = analysis_tasks[task_id]
+    if not task.get("profile_enabled"):
+        raise HTTPException(status_code=404, detail="该任务未开启性能分析")
+    
+    profile = task.get("profile")
+    if profile is None:
+        raise HTTPException(status_code=404, detail="性能分析结果尚未生成，请在任务结束后重试")
+    
+    if format == "collapsed":
+        return PlainTextResponse(
+            profile["collapsed_stacks"],
+            headers={"Content-Disposition": f'attachment; filename="{task_id}.collapsed.txt"'}
+        )
+    return JSONResponse(
+        content=profile,
+        headers={"Content-Disposition": f'attachment; filename="{task_id}.profile.json"'}
+    )
+
 @app.delete("/api/analyze/{task_id}")
 async def cancel_analysis_task(task_id: str):
     """
@@ -331,6 +479,14 @@ async def cancel_analysis_task(task_id: str):
     # 标记任务为已取消
     analysis_tasks[task_id]["status"] = "cancelled"
     
+    # 中止正在运行的任务：令牌通知线程中的调用停止重试，句柄取消等待中的协程
+    running = running_analysis_tasks.pop(task_id, None)
+    if running:
+        handle, cancel_token = running
+        cancel_token.cancel()
+        handle.cancel()
+        logger.info(f"Analysis task {task_id} cancellation requested")
+    
     return {"message": "任务已取消"}
 
 
@@ -360,34 +516,95 @@ async def refresh_similarity_data(background_tasks: BackgroundTasks):
 
 
 
+# 探索接口使用的中性背景，不含用户信息；其排序在每个数据快照内只计算一次
+EXPLORATION_BACKGROUND = UserBackground(
+    undergraduate_university="",
+    undergraduate_major="",
+    gpa=0,
+    gpa_scale="4.0",
+    graduation_year=2000,
+    target_countries=[],
+    target_majors=[],
+    target_degree_type="Master",
+)
+
+# 列表页需要的案例字段（完整案例通过 /api/analyze 或案例详情获取）
+SIMILAR_CASE_FIELDS = (
+    "id",
+    "admitted_university",
+    "admitted_program",
+    "admitted_country",
+    "admitted_degree_type",
+    "undergraduate_university",
+    "undergraduate_university_tier",
+    "undergraduate_major",
+    "gpa_4_scale",
+    "language_test_type",
+    "language_total_score",
+)
+
+
+def _encode_cursor(snapshot_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{snapshot_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, snapshot_id: str) -> int:
+    """解析分页游标；游标格式错误或来自旧的数据快照时返回 400，客户端应从第一页重新加载"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_snapshot, offset = raw.rsplit(":", 1)
+        offset = int(offset)
+    except Exception:
+        raise HTTPException(status_code=400, detail="分页游标无效")
+    if cursor_snapshot != snapshot_id or offset < 0:
+        raise HTTPException(status_code=400, detail="分页游标已失效，请重新加载")
+    return offset
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
 @app.get("/api/similar-cases")
-async def get_similar_cases(limit: int = 50):
-    """Return top-N similar cases for a minimal default background (for exploration).
+async def get_similar_cases(request: Request, limit: int = 50, cursor: Optional[str] = None):
+    """Return a page of cases ranked against a minimal default background (for exploration).
     Note: In real usage, the frontend should call /api/analyze with full background.
-    This endpoint exposes a bounded list primarily for 'load more' UX.
+    This endpoint serves the 'load more' UX: pass the returned next_cursor to fetch the next page.
+    Pages are immutable within a data snapshot and carry an ETag for conditional requests.
     """
     try:
         if not analysis_service:
             raise HTTPException(status_code=503, detail="分析服务不可用")
 
-        # Construct a minimal neutral background to fetch ranked cases
-        # For exploration endpoint, we don't use user-sensitive inputs.
-        dummy = UserBackground(
-            undergraduate_university="",
-            undergraduate_major="",
-            gpa=0,
-            gpa_scale="4.0",
-            graduation_year=2000,
-            target_countries=[],
-            target_majors=[],
-            target_degree_type="Master",
+        limit = max(1, min(limit, settings.SIMILAR_CASES_API_LIMIT))
+        matcher = analysis_service.similarity_matcher
+        # use matcher directly to avoid LLM; the ranking is cached per data snapshot
+        ranking = await to_thread.run_sync(matcher.rank_cases, EXPLORATION_BACKGROUND)
+        offset = _decode_cursor(cursor, ranking.snapshot_id) if cursor else 0
+
+        etag = f'"{ranking.snapshot_id}-{offset}-{limit}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        total = len(ranking.positions)
+        next_offset = offset + limit
+        return JSONResponse(
+            content={
+                "items": matcher.project_page(ranking, offset, limit, SIMILAR_CASE_FIELDS),
+                "next_cursor": _encode_cursor(ranking.snapshot_id, next_offset) if next_offset < total else None,
+                "total": total,
+            },
+            headers=headers,
         )
-
-        # use matcher directly to avoid LLM
-        cases = analysis_service.similarity_matcher.find_similar_cases(dummy, top_n=max(1, min(limit, 200)))
-        return {"items": cases}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching similar cases: {str(e)}")
         raise HTTPException(status_code=500, detail="获取相似案例失败")
+
+
+STARTUP.record("import app.main", time.perf_counter() - _IMPORT_STARTED)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+相似度匹配与报告流水线基准测试
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.run_benchmarks                       # 默认规模 1k,10k
+    python -m benchmarks.run_benchmarks --preset full         # 1k,10k,100k,500k
+    python -m benchmarks.run_benchmarks --sizes 1000,20000 --queries 50 --output out.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<old>.json
+    python -m benchmarks.run_benchmarks --sizes 100000 --ann-nprobe 4,16,64   # ANN 模式召回率/延迟
+
+结果写入 JSON 文件（默认 benchmarks/results/<commit>.json），便于跨提交对比
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic_cases import (  # noqa: E402
+    generate_cases, generate_user_backgrounds, SyntheticSupabaseService, LatencyGeminiService,
+)
+from services.similarity_matcher import SimilarityMatcher  # noqa: E402
+from services.analysis_service import AnalysisService  # noqa: E402
+from services.radar_scoring_service import RadarScoringService  # noqa: E402
+
+PRESETS = {
+    "quick": [1000],
+    "default": [1000, 10000],
+    "large": [1000, 10000, 50000, 100000],
+    "full": [1000, 10000, 100000, 500000],
+}
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 案例加载与检索中按需导入的重量级模块（见 services.startup.lazy_import），单独计时，不计入加载耗时
+HEAVY_MODULES = (
+    "pandas",
+    "scipy.sparse",
+    "sklearn.feature_extraction.text",
+    "sklearn.metrics.pairwise",
+    "sklearn.preprocessing",
+    "sklearn.decomposition",
+)
+
+_import_seconds: Optional[float] = None
+
+
+def import_heavy_modules() -> float:
+    """导入 HEAVY_MODULES 并返回首次导入的耗时（秒），之后调用直接返回该值"""
+    global _import_seconds
+    if _import_seconds is None:
+        import importlib
+
+        started = time.perf_counter()
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+        _import_seconds = time.perf_counter() - started
+    return _import_seconds
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _summarize(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def build_matcher(cases: List[Dict]) -> SimilarityMatcher:
+    return SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+
+
+def bench_similarity(size: int, queries: int, top_n: int, seed: int, trace_memory: bool) -> Dict:
+    """测量数据加载耗时/内存，以及 find_similar_cases 的延迟与吞吐"""
+    cases = generate_cases(size, seed=seed)
+    users = generate_user_backgrounds(queries, seed=seed + 1)
+    matcher = build_matcher(cases)
+    import_seconds = import_heavy_modules()
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    matcher.ensure_data_loaded()
+    load_seconds = time.perf_counter() - started
+    memory: Dict[str, int] = {}
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory.update({"load_resident_bytes": current, "load_peak_bytes": peak,
+                       "bytes_per_case": current // max(size, 1)})
+    del cases
+
+    # 预热一次，排除首次调用的惰性初始化
+    matcher.find_similar_cases(users[0], top_n=top_n)
+
+    latencies = []
+    total_started = time.perf_counter()
+    for user in users:
+        started = time.perf_counter()
+        matcher.find_similar_cases(user, top_n=top_n)
+        latencies.append(time.perf_counter() - started)
+    total_seconds = time.perf_counter() - total_started
+
+    if trace_memory:
+        tracemalloc.start()
+        matcher.find_similar_cases(users[0], top_n=top_n)
+        memory["query_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    # 两阶段排序的剪枝统计（按查询汇总）
+    pruning = [matcher.rank_cases(user, limit=top_n).pruning for user in users]
+    candidates = sum(stats.candidates for stats in pruning if stats)
+    scored = sum(stats.scored for stats in pruning if stats)
+
+    return {
+        "benchmark": "find_similar_cases",
+        "cases": size,
+        "queries": queries,
+        "top_n": top_n,
+        "load_seconds": load_seconds,
+        "import_seconds": import_seconds,
+        "latency": _summarize(latencies),
+        "throughput_qps": queries / total_seconds if total_seconds > 0 else None,
+        "memory": memory,
+        "scored_fraction": scored / candidates if candidates else None,
+    }
+
+
+def bench_ann(size: int, queries: int, top_n: int, seed: int, nprobes: List[int]) -> List[Dict]:
+    """ANN 检索模式：不同 nprobe 下相对精确模式的 top_n 召回率与延迟"""
+    cases = generate_cases(size, seed=seed)
+    users = generate_user_backgrounds(queries, seed=seed + 1)
+    exact = build_matcher(cases)
+    exact.search_mode = "exact"
+    exact.ensure_data_loaded()
+    approximate = build_matcher(cases)
+    approximate.search_mode = "ann"
+    approximate.ann_min_cases = 0
+    import_heavy_modules()
+    started = time.perf_counter()
+    approximate.ensure_data_loaded()
+    build_seconds = time.perf_counter() - started
+    del cases
+
+    expected = [{r["case_id"] for r in exact.find_similar_cases(user, top_n=top_n)} for user in users]
+    results = []
+    for nprobe in nprobes:
+        approximate.ann_nprobe = nprobe
+        approximate._ranking_cache.clear()
+        latencies, recalls = [], []
+        for user, exact_ids in zip(users, expected):
+            started = time.perf_counter()
+            found = approximate.find_similar_cases(user, top_n=top_n)
+            latencies.append(time.perf_counter() - started)
+            recalls.append(len(exact_ids & {r["case_id"] for r in found}) / max(len(exact_ids), 1))
+        results.append({
+            "benchmark": f"find_similar_cases_ann[nprobe={nprobe}]",
+            "cases": size,
+            "queries": queries,
+            "top_n": top_n,
+            "nprobe": nprobe,
+            "candidates": approximate.ann_candidates,
+            "index_lists": approximate.case_index.nlist,
+            "load_seconds": build_seconds,
+            "recall_mean": statistics.fmean(recalls),
+            "recall_min": min(recalls),
+            "latency": _summarize(latencies),
+        })
+    return results
+
+
+def bench_table_memory(size: int, seed: int) -> Dict:
+    """案例表紧凑表示前后的每条案例字节数（并确认按行取出的数据一致）"""
+    cases = generate_cases(size, seed=seed)
+    reports = {}
+    tables = {}
+    for compact in (False, True):
+        matcher = build_matcher(cases)
+        matcher.compact_cases = compact
+        reports[compact] = matcher.table_memory_report()
+        tables[compact] = matcher.cases_df
+    sample = min(size, 1000)
+    identical = tables[False].head(sample).to_dict("records") == tables[True].head(sample).to_dict("records")
+    return {
+        "benchmark": "case_table_memory",
+        "cases": size,
+        "bytes_per_case_before": reports[False]["bytes_per_case"],
+        "bytes_per_case_after": reports[True]["bytes_per_case"],
+        "columns_before": reports[False]["columns"],
+        "columns_after": reports[True]["columns"],
+        "rows_identical": identical,
+    }
+
+
+def bench_report(size: int, runs: int, llm_latency: float, seed: int) -> Dict:
+    """端到端测量 generate_analysis_report（使用模拟延迟的 GeminiService）"""
+    cases = generate_cases(size, seed=seed)
+    users = generate_user_backgrounds(runs, seed=seed + 2)
+    gemini = LatencyGeminiService(latency_seconds=llm_latency)
+    service = AnalysisService(
+        similarity_matcher=build_matcher(cases),
+        gemini_service=gemini,
+        radar_scoring_service=RadarScoringService(gemini_service=gemini),
+    )
+    service.similarity_matcher.ensure_data_loaded()
+
+    latencies = []
+    for user in users:
+        started = time.perf_counter()
+        report = asyncio.run(service.generate_analysis_report(user))
+        latencies.append(time.perf_counter() - started)
+        if report is None:
+            raise RuntimeError("generate_analysis_report returned None")
+
+    return {
+        "benchmark": "generate_analysis_report",
+        "cases": size,
+        "runs": runs,
+        "llm_latency_seconds": llm_latency,
+        "llm_calls_per_report": gemini.calls / max(runs, 1),
+        "latency": _summarize(latencies),
+    }
+
+
+def compare(current: Dict, baseline_path: Path) -> List[str]:
+    """与历史结果逐项对比 p50 延迟"""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    index = {(r["benchmark"], r["cases"]): r for r in baseline.get("results", [])}
+    lines = [f"compare against {baseline_path} (commit {baseline.get('meta', {}).get('commit')})"]
+    for result in current["results"]:
+        old = index.get((result["benchmark"], result["cases"]))
+        if not old or "latency" not in result:
+            continue
+        new_p50, old_p50 = result["latency"]["p50_ms"], old["latency"]["p50_ms"]
+        change = (new_p50 - old_p50) / old_p50 * 100 if old_p50 else 0.0
+        lines.append(f"  {result['benchmark']:<26} cases={result['cases']:<7} "
+                     f"p50 {old_p50:10.2f}ms -> {new_p50:10.2f}ms ({change:+.1f}%)")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Similarity matcher and report pipeline benchmarks")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="default")
+    parser.add_argument("--sizes", help="comma separated case table sizes, overrides --preset")
+    parser.add_argument("--queries", type=int, default=10, help="find_similar_cases queries per size")
+    parser.add_argument("--top-n", type=int, default=150)
+    parser.add_argument("--report-runs", type=int, default=3, help="end-to-end report runs (0 disables)")
+    parser.add_argument("--report-size", type=int, default=10000, help="case table size for report runs")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="simulated seconds per LLM call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ann-nprobe", help="comma separated nprobe values; also benchmark the ANN search mode")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc measurements")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="previous result JSON to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else PRESETS[args.preset]
+
+    import_seconds = import_heavy_modules()
+    print(f"heavy module imports {import_seconds:.2f}s (not included in load times)")
+
+    results = []
+    for size in sizes:
+        result = bench_similarity(size, args.queries, args.top_n, args.seed, not args.no_memory)
+        results.append(result)
+        print(f"find_similar_cases  cases={size:<7} load={result['load_seconds']:.2f}s "
+              f"p50={result['latency']['p50_ms']:.2f}ms p95={result['latency']['p95_ms']:.2f}ms "
+              f"qps={result['throughput_qps']:.1f}")
+
+    if not args.no_memory:
+        for size in sizes:
+            result = bench_table_memory(size, args.seed)
+            results.append(result)
+            print(f"case table memory   cases={size:<7} {result['bytes_per_case_before']:.0f} -> "
+                  f"{result['bytes_per_case_after']:.0f} bytes/case (rows identical: {result['rows_identical']})")
+
+    if args.ann_nprobe:
+        nprobes = [int(n) for n in args.ann_nprobe.split(",")]
+        for size in sizes:
+            for result in bench_ann(size, args.queries, args.top_n, args.seed, nprobes):
+                results.append(result)
+                print(f"find_similar_cases (ann nprobe={result['nprobe']:<3}) cases={size:<7} "
+                      f"recall={result['recall_mean']:.3f} (min {result['recall_min']:.3f}) "
+                      f"p50={result['latency']['p50_ms']:.2f}ms")
+
+    if args.report_runs > 0:
+        result = bench_report(args.report_size, args.report_runs, args.llm_latency, args.seed)
+        results.append(result)
+        print(f"generate_analysis_report cases={args.report_size} "
+              f"p50={result['latency']['p50_ms']:.1f}ms llm_calls={result['llm_calls_per_report']:.0f}")
+
+    commit = _git_commit()
+    payload = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "import_seconds": import_seconds,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"results written to {output}")
+
+    if args.compare:
+        print("\n".join(compare(payload, Path(args.compare))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+合成案例数据
+按 processed_cases 表结构生成可复现的合成案例，以及模拟延迟的 GeminiService / SupabaseService 替身
+"""
+import random
+import time
+from typing import Dict, Iterator, List, Optional
+
+from models.schemas import (
+    UserBackground, CompetitivenessAnalysis, SchoolRecommendations, SchoolRecommendation,
+    CaseAnalysis, CaseComparison, BackgroundImprovement, ActionPlan,
+)
+
+TIERS = ["Tier 0", "Tier 1", "Tier 2", "Tier 3", "Tier 4"]
+TIER_WEIGHTS = [0.03, 0.12, 0.3, 0.3, 0.25]
+
+MAJOR_CATEGORIES = ["CS", "EE", "ME", "Finance", "Business", "Other"]
+MAJOR_WEIGHTS = [0.3, 0.15, 0.08, 0.17, 0.15, 0.15]
+MAJORS_BY_CATEGORY = {
+    "CS": ["计算机科学与技术", "软件工程", "人工智能", "数据科学与大数据技术"],
+    "EE": ["电子信息工程", "通信工程", "自动化"],
+    "ME": ["机械工程", "机械设计制造及其自动化"],
+    "Finance": ["金融学", "经济学", "国际经济与贸易"],
+    "Business": ["工商管理", "市场营销", "会计学"],
+    "Other": ["数学与应用数学", "统计学", "英语", "法学", "新闻学"],
+}
+
+COUNTRIES = ["US", "UK", "HK", "SG", "AU", "CA"]
+COUNTRY_WEIGHTS = [0.4, 0.25, 0.15, 0.08, 0.07, 0.05]
+
+UNIVERSITIES = [
+    "清华大学", "北京大学", "复旦大学", "上海交通大学", "浙江大学", "南京大学", "武汉大学",
+    "华中科技大学", "中山大学", "四川大学", "北京邮电大学", "华东师范大学", "苏州大学", "深圳大学",
+    "郑州大学", "南昌大学", "河北工业大学", "江南大学", "某某学院",
+]
+
+ADMITTED_UNIVERSITIES = {
+    "US": ["Carnegie Mellon University", "Columbia University", "University of Southern California", "Northeastern University"],
+    "UK": ["Imperial College London", "University College London", "University of Edinburgh", "King's College London"],
+    "HK": ["The University of Hong Kong", "HKUST", "CUHK", "City University of Hong Kong"],
+    "SG": ["National University of Singapore", "Nanyang Technological University"],
+    "AU": ["University of Melbourne", "University of Sydney", "UNSW"],
+    "CA": ["University of Toronto", "University of British Columbia"],
+}
+
+PROGRAMS = ["MS in Computer Science", "MSc Data Science", "MS in Electrical Engineering",
+            "MSc Finance", "MBA", "MS in Business Analytics", "PhD in Computer Science"]
+
+EXPERIENCE_PHRASES = [
+    "在腾讯实习担任算法工程师，参与推荐系统优化", "阿里巴巴数据分析实习", "字节跳动后端开发实习",
+    "参与国家自然科学基金项目", "发表SCI论文一篇", "在实验室从事深度学习研究",
+    "数学建模竞赛一等奖", "ACM程序设计竞赛银牌", "券商研究所行业研究实习", "四大会计师事务所审计实习",
+    "参与大学生创新创业项目", "计算机视觉方向科研助理", "自然语言处理方向毕业设计",
+    "投行部实习，参与IPO项目", "咨询公司实习，负责市场调研", "开源项目贡献者",
+]
+
+
+def generate_cases(n: int, seed: int = 42) -> List[Dict]:
+    """生成 n 条与 processed_cases 表结构一致的合成案例"""
+    rng = random.Random(seed)
+    cases = []
+    for i in range(n):
+        category = rng.choices(MAJOR_CATEGORIES, MAJOR_WEIGHTS)[0]
+        country = rng.choices(COUNTRIES, COUNTRY_WEIGHTS)[0]
+        test_type = rng.choice(["TOEFL", "IELTS", ""])
+        if test_type == "TOEFL":
+            language_score = rng.randint(80, 118)
+        elif test_type == "IELTS":
+            # 与线上数据一致，雅思以 x10 的整数存储（7.0 -> 70）
+            language_score = rng.choice([60, 65, 70, 75, 80])
+        else:
+            language_score = 0
+        phrases = rng.sample(EXPERIENCE_PHRASES, rng.randint(0, 4))
+        cases.append({
+            "id": i + 1,
+            "original_id": 100000 + i,
+            "gpa_4_scale": round(rng.uniform(2.6, 4.0), 2),
+            "undergraduate_university_tier": rng.choices(TIERS, TIER_WEIGHTS)[0],
+            "undergraduate_major_category": category,
+            "language_total_score": language_score,
+            "language_test_type": test_type,
+            "gre_total": rng.choice([0, rng.randint(310, 335)]),
+            "gmat_total": rng.choice([0, 0, 0, rng.randint(600, 760)]),
+            "research_experience_count": rng.randint(0, 3),
+            "internship_experience_count": rng.randint(0, 3),
+            "work_experience_years": rng.choice([0.0, 0.0, 1.0, 2.0]),
+            "experience_text": "；".join(phrases),
+            "admitted_university": rng.choice(ADMITTED_UNIVERSITIES[country]),
+            "admitted_program": rng.choice(PROGRAMS),
+            "admitted_country": country,
+            "admitted_degree_type": "PhD" if rng.random() < 0.15 else "Master",
+            "undergraduate_university": rng.choice(UNIVERSITIES),
+            "undergraduate_major": rng.choice(MAJORS_BY_CATEGORY[category]),
+        })
+    return cases
+
+
+def generate_user_backgrounds(n: int, seed: int = 7) -> List[UserBackground]:
+    """生成 n 个用于查询的合成用户背景"""
+    rng = random.Random(seed)
+    users = []
+    for _ in range(n):
+        category = rng.choices(MAJOR_CATEGORIES, MAJOR_WEIGHTS)[0]
+        users.append(UserBackground(
+            undergraduate_university=rng.choice(UNIVERSITIES),
+            undergraduate_major=rng.choice(MAJORS_BY_CATEGORY[category]),
+            gpa=round(rng.uniform(2.8, 3.9), 2),
+            gpa_scale="4.0",
+            graduation_year=2025,
+            language_test_type="TOEFL",
+            language_total_score=rng.randint(90, 115),
+            research_experiences=[{"name": "科研项目", "description": rng.choice(EXPERIENCE_PHRASES)}],
+            internship_experiences=[{"company": "某公司", "position": "实习生", "description": rng.choice(EXPERIENCE_PHRASES)}],
+            target_countries=rng.sample(COUNTRIES[:4], rng.randint(1, 3)),
+            target_majors=["Computer Science"],
+            target_degree_type="Master",
+        ))
+    return users
+
+
+class SyntheticSupabaseService:
+    """返回合成案例的 SupabaseService 替身"""
+
+    def __init__(self, cases: List[Dict], page_size: int = 1000):
+        self.cases = cases
+        self.page_size = page_size
+
+    def get_all_cases(self) -> List[Dict]:
+        return list(self.cases)
+
+    def iter_case_pages(self, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        cases = self.get_cases_by_filters(filters) if filters else self.cases
+        page_size = page_size or self.page_size
+        for offset in range(0, len(cases), page_size):
+            yield cases[offset:offset + page_size]
+
+    def get_cases_by_filters(self, filters: Dict) -> List[Dict]:
+        result = self.cases
+        for key, value in filters.items():
+            if value is None or value == "":
+                continue
+            if isinstance(value, list):
+                result = [case for case in result if case.get(key) in value]
+            else:
+                result = [case for case in result if case.get(key) == value]
+        return list(result)
+
+
+class LatencyGeminiService:
+    """模拟网络延迟的 GeminiService 替身，返回结构合法的固定结果"""
+
+    def __init__(self, latency_seconds: float = 0.05, jitter: float = 0.0, seed: Optional[int] = 0):
+        self.latency_seconds = latency_seconds
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _wait(self):
+        self.calls += 1
+        delay = self.latency_seconds + self._rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def analyze_competitiveness(self, user_background: UserBackground) -> CompetitivenessAnalysis:
+        self._wait()
+        return CompetitivenessAnalysis(strengths="GPA较高", weaknesses="缺少科研经历", summary="整体竞争力中等偏上")
+
+    def generate_school_recommendations(self, user_background: UserBackground,
+                                        similar_cases: List[Dict]) -> SchoolRecommendations:
+        self._wait()
+        recommendations = [
+            SchoolRecommendation(
+                university=case.get("case_data", {}).get("admitted_university", ""),
+                program=case.get("case_data", {}).get("admitted_program", ""),
+                reason="背景相似的案例获得录取",
+                supporting_cases=[],
+            )
+            for case in similar_cases[:10]
+        ]
+        return SchoolRecommendations(recommendations=recommendations, analysis_summary="基于相似案例的推荐")
+
+    def analyze_single_case(self, user_background: UserBackground, case_data: Dict) -> CaseAnalysis:
+        self._wait()
+        return CaseAnalysis(
+            case_id=int(case_data.get("id", 0)),
+            admitted_university=case_data.get("admitted_university", ""),
+            admitted_program=case_data.get("admitted_program", ""),
+            gpa=str(case_data.get("gpa_4_scale", 0)),
+            language_score=str(case_data.get("language_total_score", 0)),
+            undergraduate_info=f"{case_data.get('undergraduate_university', '')} {case_data.get('undergraduate_major', '')}",
+            comparison=CaseComparison(gpa="相近", university="相近", experience="相近"),
+            success_factors="GPA与科研",
+            takeaways="提升科研产出",
+        )
+
+    def generate_background_improvement(self, user_background: UserBackground,
+                                        weaknesses: str) -> BackgroundImprovement:
+        self._wait()
+        return BackgroundImprovement(
+            action_plan=[ActionPlan(timeframe="未来1-3个月", action="参与科研", goal="产出论文")],
+            strategy_summary="稳步提升",
+        )
+
+    def evaluate_research_experience(self, research_text: str, fallback: Optional[int] = 50) -> Optional[int]:
+        self._wait()
+        return 70
+
+    def evaluate_internship_experience(self, internship_text: str, fallback: Optional[int] = 50) -> Optional[int]:
+        self._wait()
+        return 65
@@ -20,6 +20,16 @@ class Settings:
     
     # Gemini API Configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+    # Gemini Rate Limiting
+    # 每个模型的配额，格式 "模型名:RPM:TPM"，逗号分隔；0 或未列出的模型不限流
+    GEMINI_RATE_LIMIT_ENABLED = os.getenv("GEMINI_RATE_LIMIT_ENABLED", "True").lower() == "true"
+    GEMINI_RATE_LIMITS = os.getenv(
+        "GEMINI_RATE_LIMITS",
+        "gemma-3-27b-it:30:15000,gemma-3-12b-it:30:15000,gemini-1.5-flash:15:1000000",
+    )
+    # 所有候选模型都没有余量时最多等待的秒数，超时后视为该模型调用失败
+    GEMINI_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT_SECONDS", "60"))
     
     # Application Configuration
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
@@ -29,6 +39,65 @@ class Settings:
     SIMILAR_CASES_LIMIT = int(os.getenv("SIMILAR_CASES_LIMIT", "150"))
     SIMILAR_CASES_ANALYSIS_LIMIT = int(os.getenv("SIMILAR_CASES_ANALYSIS_LIMIT", "10"))
     SIMILAR_CASES_API_LIMIT = int(os.getenv("SIMILAR_CASES_API_LIMIT", "200"))
+    # 相似度排序结果缓存容量（按规范化的评分输入缓存完整排序，数据刷新后失效，0 表示关闭）
+    SIMILARITY_RESULT_CACHE_SIZE = int(os.getenv("SIMILARITY_RESULT_CACHE_SIZE", "256"))
+    # 排序结果缓存占用内存的上限（MB）；指定名次上限的排序只缓存前若干名，分页浏览的完整排序按实际大小计入
+    SIMILARITY_RESULT_CACHE_MB = int(os.getenv("SIMILARITY_RESULT_CACHE_MB", "64"))
+    # 检索方式：exact（全量精确计算）或 ann（IVF 索引召回候选后精确重排，案例数达到 SIMILARITY_ANN_MIN_CASES 时启用）
+    SIMILARITY_SEARCH_MODE = os.getenv("SIMILARITY_SEARCH_MODE", "exact").lower()
+    SIMILARITY_ANN_MIN_CASES = int(os.getenv("SIMILARITY_ANN_MIN_CASES", "50000"))
+    # 每次查询召回的候选数与扫描的倒排列表数（nprobe 越大召回越高、延迟越高）
+    SIMILARITY_ANN_CANDIDATES = int(os.getenv("SIMILARITY_ANN_CANDIDATES", "3000"))
+    SIMILARITY_ANN_NPROBE = int(os.getenv("SIMILARITY_ANN_NPROBE", "64"))
+    # 经历文本特征：tfidf（词表上限 1000，每次加载重新拟合）或 hashing（特征哈希，刷新时只向量化新增/修改的案例）
+    SIMILARITY_EXPERIENCE_FEATURES = os.getenv("SIMILARITY_EXPERIENCE_FEATURES", "tfidf").lower()
+    SIMILARITY_HASHING_FEATURES = int(os.getenv("SIMILARITY_HASHING_FEATURES", str(1 << 18)))
+    SIMILARITY_HASHING_IDF = os.getenv("SIMILARITY_HASHING_IDF", "True").lower() == "true"
+    # 按 (录取国家, 学位类型) 分片计算相似度，多国家查询的各分片在线程池中并发计算
+    SIMILARITY_SHARDING = os.getenv("SIMILARITY_SHARDING", "False").lower() == "true"
+    SIMILARITY_SHARD_WORKERS = int(os.getenv("SIMILARITY_SHARD_WORKERS", "4"))
+    # 两阶段排序：按分桶的分数上下界剪掉不可能进入前 N 名的案例（结果与完整计算一致）
+    SIMILARITY_PRUNING = os.getenv("SIMILARITY_PRUNING", "True").lower() == "true"
+    # 案例表使用紧凑的列式表示：低基数字符串列转为 category，数值列缩小到能无损表示的类型
+    SIMILARITY_COMPACT_CASES = os.getenv("SIMILARITY_COMPACT_CASES", "True").lower() == "true"
+    # 流式加载案例：逐页写入列缓冲区，不在内存中保留完整的原始记录列表
+    SIMILARITY_STREAMING_LOAD = os.getenv("SIMILARITY_STREAMING_LOAD", "True").lower() == "true"
+    # 按需加载：只下载并索引查询目标国家的案例，常驻内存（国家快照与全量快照）超过预算时淘汰最久未使用的国家或全量快照。
+    # 经历特征在加载与刷新时流式读取一遍全表拟合（只保留经历文本），排序结果与常驻哪些国家无关；国家快照不建 ANN 索引
+    SIMILARITY_LAZY_COUNTRIES = os.getenv("SIMILARITY_LAZY_COUNTRIES", "False").lower() == "true"
+    # 按需加载模式下启动时预先加载的国家（逗号分隔，留空表示等到第一次查询）
+    SIMILARITY_PRELOAD_COUNTRIES = [
+        country.strip() for country in os.getenv("SIMILARITY_PRELOAD_COUNTRIES", "").split(",") if country.strip()
+    ]
+    SIMILARITY_MEMORY_BUDGET_MB = int(os.getenv("SIMILARITY_MEMORY_BUDGET_MB", "512"))
+
+    # Radar Scoring Configuration
+    # 经历评分缓存容量（按规范化经历文本哈希缓存大模型评分，0 表示关闭）
+    RADAR_SCORE_CACHE_SIZE = int(os.getenv("RADAR_SCORE_CACHE_SIZE", "4096"))
+    # 经历评分方式：heuristic（本地评分，置信度不足时调用大模型）、llm（始终调用大模型）、heuristic_only
+    EXPERIENCE_SCORER_MODE = os.getenv("EXPERIENCE_SCORER_MODE", "heuristic").lower()
+    EXPERIENCE_SCORER_MIN_CONFIDENCE = float(os.getenv("EXPERIENCE_SCORER_MIN_CONFIDENCE", "0.6"))
+    # 大模型评分作为校准标注样本追加写入的 JSONL 文件（留空不写入），用于离线拟合 config/experience_calibration.json
+    # （仓库不附带该文件，拟合前 heuristic 模式使用未校准的本地原始分）
+    EXPERIENCE_SCORER_LABELS_PATH = os.getenv("EXPERIENCE_SCORER_LABELS_PATH", "")
+
+    # Analysis Worker Configuration
+    # 0 表示在API进程内执行分析；大于0时使用独立的工作进程池
+    ANALYSIS_WORKER_PROCESSES = int(os.getenv("ANALYSIS_WORKER_PROCESSES", "0"))
+
+    # Server Configuration（python start_server.py --production）
+    # 生产模式下父进程预加载案例数据后 fork 出 SERVER_WORKERS 个工作进程，写时复制共享案例数据。
+    # 注意：分析任务状态保存在各工作进程内存中，多于 1 个工作进程时需由负载均衡保持会话粘性
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_TIMEOUT_KEEP_ALIVE = int(os.getenv("SERVER_TIMEOUT_KEEP_ALIVE", "5"))
+
+    # Profiling Configuration
+    # 请求头 X-Debug-Profile: 1 可对单个任务开启性能分析；PROFILE_SAMPLE_RATE 为随机抽样比例（0-1）
+    PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "True").lower() == "true"
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
     
     @property
     def source_database_url(self):
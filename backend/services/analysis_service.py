@@ -2,20 +2,28 @@ import logging
 from typing import List, Dict, Optional
 import asyncio
 import random
+import time
+from anyio import to_thread
 from models.schemas import UserBackground, AnalysisReport, SchoolRecommendations, CompetitivenessAnalysis
 from services.similarity_matcher import SimilarityMatcher
 from services.gemini_service import GeminiService
 from services.radar_scoring_service import RadarScoringService
 from services.retry import async_retry_full_jitter
+from services.cancellation import TaskCancelled
+from services.metrics import ANALYSIS_REPORT_SECONDS, PARTIAL_FAILURES_TOTAL
+from services.profiling import span
 
 
 logger = logging.getLogger(__name__)
 
 class AnalysisService:
-    def __init__(self):
-        self.similarity_matcher = SimilarityMatcher()
-        self.gemini_service = GeminiService()
-        self.radar_scoring_service = RadarScoringService()
+    def __init__(self, similarity_matcher: Optional[SimilarityMatcher] = None,
+                 gemini_service: Optional[GeminiService] = None,
+                 radar_scoring_service: Optional[RadarScoringService] = None):
+        self.similarity_matcher = similarity_matcher or SimilarityMatcher()
+        self.gemini_service = gemini_service or GeminiService()
+        # 雷达图评分与报告分析共用同一个 GeminiService（及共享的大模型客户端）
+        self.radar_scoring_service = radar_scoring_service or RadarScoringService(gemini_service=self.gemini_service)
         # allow tests to inject fake sleep/rng for retry without real waiting
         self._retry_sleep = None
         self._retry_rng = None
@@ -26,6 +34,7 @@ class AnalysisService:
     
     async def generate_analysis_report(self, user_background: UserBackground) -> Optional[AnalysisReport]:
         """Generate complete analysis report for user with progress tracking"""
+        started = time.perf_counter()
         try:
             logger.info("Starting analysis report generation")
             
@@ -35,7 +44,11 @@ class AnalysisService:
             logger.info("Finding similar cases...")
             
             try:
-                similar_cases = self.similarity_matcher.find_similar_cases(user_background, top_n=150)
+                with span("report.find_similar_cases"):
+                    # 首次加载或按需加载国家时会下载案例数据，放到工作线程中执行，不阻塞事件循环
+                    similar_cases = await to_thread.run_sync(
+                        lambda: self.similarity_matcher.find_similar_cases(user_background, top_n=150)
+                    )
             except Exception as e:
                 logger.error(f"Failed to find similar cases: {str(e)}")
                 raise Exception(f"数据库查询失败: {str(e)}")
@@ -55,15 +68,16 @@ class AnalysisService:
             # Task 1: Competitiveness analysis
             logger.info("Analyzing competitiveness...")
             
-            competitiveness = await async_retry_full_jitter(
-                self.gemini_service.analyze_competitiveness,
-                user_background,
-                exceptions=(RuntimeError, TimeoutError),
-                max_attempts=3,
-                base=2,
-                sleep=self._retry_sleep or asyncio.sleep,
-                rng=self._retry_rng or random.random,
-            )
+            with span("report.competitiveness"):
+                competitiveness = await async_retry_full_jitter(
+                    self.gemini_service.analyze_competitiveness,
+                    user_background,
+                    exceptions=(RuntimeError, TimeoutError),
+                    max_attempts=3,
+                    base=2,
+                    sleep=self._retry_sleep or asyncio.sleep,
+                    rng=self._retry_rng or random.random,
+                )
             if not competitiveness:
                 logger.error("Failed to get competitiveness analysis")
                 raise Exception("无法获取竞争力分析，请检查网络连接")
@@ -72,16 +86,17 @@ class AnalysisService:
             logger.info("Generating school recommendations...")
             
             if similar_cases:
-                school_recommendations = await async_retry_full_jitter(
-                    self.gemini_service.generate_school_recommendations,
-                    user_background,
-                    similar_cases,
-                    exceptions=(RuntimeError, TimeoutError),
-                    max_attempts=3,
-                    base=2,
-                    sleep=self._retry_sleep or asyncio.sleep,
-                    rng=self._retry_rng or random.random,
-                )
+                with span("report.school_recommendations"):
+                    school_recommendations = await async_retry_full_jitter(
+                        self.gemini_service.generate_school_recommendations,
+                        user_background,
+                        similar_cases,
+                        exceptions=(RuntimeError, TimeoutError),
+                        max_attempts=3,
+                        base=2,
+                        sleep=self._retry_sleep or asyncio.sleep,
+                        rng=self._retry_rng or random.random,
+                    )
                 if not school_recommendations:
                     logger.error("Failed to get school recommendations")
                     raise Exception("无法获取学校推荐，请检查网络连接")
@@ -98,19 +113,22 @@ class AnalysisService:
             for i, case in enumerate(similar_cases[:total_cases]):
                 case_data = case.get('case_data', {})
                 try:
-                    result = await async_retry_full_jitter(
-                        self.gemini_service.analyze_single_case,
-                        user_background,
-                        case_data,
-                        exceptions=(RuntimeError, TimeoutError),
-                        max_attempts=3,
-                        base=2,
-                        sleep=self._retry_sleep or asyncio.sleep,
-                        rng=self._retry_rng or random.random,
-                    )
+                    with span("report.case_analysis", index=i + 1):
+                        result = await async_retry_full_jitter(
+                            self.gemini_service.analyze_single_case,
+                            user_background,
+                            case_data,
+                            exceptions=(RuntimeError, TimeoutError),
+                            max_attempts=3,
+                            base=2,
+                            sleep=self._retry_sleep or asyncio.sleep,
+                            rng=self._retry_rng or random.random,
+                        )
                     if result:
                         case_analyses.append(result)
                         logger.info(f"Completed case analysis {i+1}")
+                except TaskCancelled:
+                    raise
                 except Exception as e:
                     logger.warning(f"Case analysis {i+1} failed: {str(e)}")
                     # 记录部分失败，不因单个案例失败而中断
@@ -123,16 +141,19 @@ class AnalysisService:
             background_improvement = None
             if competitiveness and getattr(competitiveness, 'weaknesses', None):
                 try:
-                    background_improvement = await async_retry_full_jitter(
-                        self.gemini_service.generate_background_improvement,
-                        user_background,
-                        competitiveness.weaknesses,
-                        exceptions=(RuntimeError, TimeoutError),
-                        max_attempts=3,
-                        base=2,
-                        sleep=self._retry_sleep or asyncio.sleep,
-                        rng=self._retry_rng or random.random,
-                    )
+                    with span("report.background_improvement"):
+                        background_improvement = await async_retry_full_jitter(
+                            self.gemini_service.generate_background_improvement,
+                            user_background,
+                            competitiveness.weaknesses,
+                            exceptions=(RuntimeError, TimeoutError),
+                            max_attempts=3,
+                            base=2,
+                            sleep=self._retry_sleep or asyncio.sleep,
+                            rng=self._retry_rng or random.random,
+                        )
+                except TaskCancelled:
+                    raise
                 except Exception as e:
                     logger.warning(f"Background improvement generation failed: {str(e)}")
                     # 背景改进建议失败不影响整体报告
@@ -141,10 +162,13 @@ class AnalysisService:
             # Step 5: Calculate radar scores
             logger.info("Calculating radar scores...")
             
-            radar_scores = self.radar_scoring_service.calculate_radar_scores(user_background)
+            with span("report.radar_scores"):
+                radar_scores = await self.radar_scoring_service.calculate_radar_scores(user_background)
             logger.info(f"Radar scores calculated: {radar_scores}")
             
             # Step 6: Assemble final report
+            for key in partial_failures:
+                PARTIAL_FAILURES_TOTAL.inc(kind="case" if key.startswith("case_") else key)
             degraded = True if partial_failures else False
             report = AnalysisReport(
                 competitiveness=competitiveness,
@@ -158,10 +182,12 @@ class AnalysisService:
             
 
             
+            ANALYSIS_REPORT_SECONDS.observe(time.perf_counter() - started, outcome="success")
             logger.info("Analysis report generation completed successfully")
             return report
             
         except Exception as e:
+            ANALYSIS_REPORT_SECONDS.observe(time.perf_counter() - started, outcome="error")
             logger.error(f"Error generating analysis report: {str(e)}")
             # 重新抛出异常，让上层处理
             raise e
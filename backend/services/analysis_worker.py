@@ -0,0 +1,148 @@
+"""
+分析任务进程池
+将 generate_analysis_report 分发到独立的工作进程执行，每个进程持有自己预加载的
+SimilarityMatcher 快照，避免CPU密集的相似度计算与HTTP请求处理争抢GIL
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from models.schemas import UserBackground, AnalysisReport
+from services.cancellation import CancellationToken, use_token
+from services.metrics import REGISTRY
+from services.profiling import TaskProfile, profiling
+from services.rate_limiter import share_rate_limit_state, use_local_rate_limit_state
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 每个工作进程内的分析服务实例（由 _init_worker 创建）
+_worker_service = None
+
+# 工作进程检查取消信号的间隔（秒）
+_CANCEL_POLL_SECONDS = 0.2
+
+
+def _init_worker(rate_limit_state=None, rate_limit_lock=None):
+    """工作进程初始化：创建分析服务并预加载案例数据"""
+    global _worker_service
+    from services.analysis_service import AnalysisService
+
+    if rate_limit_state is not None:
+        # 与API进程及其他工作进程共用同一组大模型限流令牌桶
+        share_rate_limit_state(rate_limit_state, rate_limit_lock)
+
+    _worker_service = AnalysisService()
+    try:
+        _worker_service.similarity_matcher.ensure_data_loaded()
+        logger.info("Analysis worker initialized with preloaded similarity data")
+    except Exception as e:
+        # 数据加载失败不阻止进程启动，首次任务时会再次尝试加载
+        logger.warning(f"Analysis worker failed to preload similarity data: {str(e)}")
+
+
+def _ping() -> bool:
+    return _worker_service is not None
+
+
+def run_analysis_job(user_background_data: Dict, cancel_event=None, profile: bool = False) -> Dict:
+    """在工作进程中执行一次完整的分析报告生成"""
+    user_background = UserBackground(**user_background_data)
+    task_profile = TaskProfile("worker", settings.PROFILE_SAMPLE_INTERVAL_MS / 1000) if profile else None
+    with profiling(task_profile):
+        report = asyncio.run(_run_analysis_job(user_background, cancel_event))
+    # 将本进程累计的指标随结果回传，由API进程合并后统一在 /metrics 暴露（Gauge 按进程号区分）
+    return {
+        "report": report,
+        "metrics": REGISTRY.drain(),
+        "pid": os.getpid(),
+        "profile": task_profile.to_dict() if task_profile else None,
+    }
+
+
+async def _run_analysis_job(user_background: UserBackground, cancel_event) -> Optional[Dict]:
+    token = CancellationToken()
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    finished = threading.Event()
+
+    def watch_cancel_event():
+        # 轮询API进程下发的取消信号，收到后停止重试并取消当前任务
+        while not finished.is_set():
+            if cancel_event.wait(_CANCEL_POLL_SECONDS):
+                token.cancel()
+                loop.call_soon_threadsafe(task.cancel)
+                return
+
+    if cancel_event is not None:
+        threading.Thread(target=watch_cancel_event, daemon=True).start()
+    try:
+        with use_token(token):
+            report = await _worker_service.generate_analysis_report(user_background)
+        return report.model_dump() if report else None
+    finally:
+        finished.set()
+
+
+class AnalysisWorkerPool:
+    """基于独立进程的分析任务池"""
+
+    def __init__(self, processes: int):
+        if processes < 1:
+            raise ValueError("processes must be >= 1")
+        self.processes = processes
+        # 使用 spawn 避免在已有线程/事件循环的进程中 fork
+        context = multiprocessing.get_context("spawn")
+        # 跨进程的取消信号与限流状态通过 Manager 共享给工作进程
+        self._manager = context.Manager()
+        rate_limit_state = self._manager.dict()
+        rate_limit_lock = self._manager.Lock()
+        share_rate_limit_state(rate_limit_state, rate_limit_lock)
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(rate_limit_state, rate_limit_lock),
+        )
+        logger.info(f"Analysis worker pool created with {processes} processes")
+
+    async def warm_up(self):
+        """启动所有工作进程，使其提前完成数据预加载"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _ping) for _ in range(self.processes))
+        )
+        logger.info("Analysis worker pool warmed up")
+
+    async def generate_analysis_report(self, user_background: UserBackground) -> Optional[AnalysisReport]:
+        """在工作进程中生成分析报告，结果回传到调用方进程"""
+        report, _ = await self._run(user_background, profile=False)
+        return report
+
+    async def generate_profiled_report(self, user_background: UserBackground) -> Tuple[Optional[AnalysisReport], Optional[Dict]]:
+        """在工作进程中生成分析报告，并返回工作进程内采集的性能分析结果"""
+        return await self._run(user_background, profile=True)
+
+    async def _run(self, user_background: UserBackground, profile: bool) -> Tuple[Optional[AnalysisReport], Optional[Dict]]:
+        loop = asyncio.get_running_loop()
+        cancel_event = self._manager.Event()
+        try:
+            result = await loop.run_in_executor(
+                self._executor, run_analysis_job, user_background.model_dump(), cancel_event, profile
+            )
+        except asyncio.CancelledError:
+            # 通知工作进程停止该任务，释放进程槽位
+            cancel_event.set()
+            raise
+        REGISTRY.merge(result["metrics"], process=str(result["pid"]))
+        data = result["report"]
+        return (AnalysisReport(**data) if data else None), result["profile"]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        use_local_rate_limit_state()
+        self._manager.shutdown()
@@ -0,0 +1,73 @@
+"""
+任务取消令牌
+在事件循环与线程池（以及工作进程）之间传递取消信号，使被取消的分析任务尽快停止调用大模型
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class TaskCancelled(Exception):
+    """任务已被取消（在线程中执行的同步代码通过该异常提前退出）"""
+
+    def __init__(self, message: str = "任务已取消"):
+        super().__init__(message)
+        self.message = message
+
+
+class CancellationToken:
+    """线程安全的取消令牌"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def wait(self, timeout: float) -> bool:
+        """可被取消打断的等待，返回 True 表示等待期间任务被取消"""
+        return self._event.wait(timeout)
+
+
+# 当前上下文的取消令牌；anyio 的线程卸载会复制上下文，因此线程内同样可见
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current_token.get()
+
+
+def raise_if_cancelled():
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds: float):
+    """阻塞等待指定秒数；若期间任务被取消则立即抛出 TaskCancelled"""
+    token = _current_token.get()
+    if token is None:
+        time.sleep(seconds)
+        return
+    if token.wait(seconds):
+        raise TaskCancelled()
+
+
+@contextmanager
+def use_token(token: CancellationToken) -> Iterator[CancellationToken]:
+    """在当前上下文中启用取消令牌"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
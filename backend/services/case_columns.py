@@ -0,0 +1,197 @@
+"""
+案例表的紧凑列式表示
+低基数的字符串列转换为 category（每列一份去重后的取值字典，行内只存整数编码），
+其余字符串列对重复值去重（相同内容共用一个字符串对象）；整数列缩小到能容纳取值范围的最小整型，
+浮点列在能无损表示时转换为 float32。按行取出的值与转换前完全相同，
+相似度计算与返回给前端的案例数据不受影响。
+CaseColumnBuilder 逐页把原始记录直接写入列缓冲区，加载时不再保留完整的记录列表
+"""
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 不同取值数不超过行数的该比例时转换为 category（如国家、院校、专业）；
+# 取值几乎各不相同的列（如经历文本）转换后反而更占内存
+MAX_CATEGORY_RATIO = 0.5
+
+# 相似度匹配使用的案例字段、缺省值，以及值为空（None、0、''）时是否替换为缺省值；
+# 数值缺省值的列为数值列
+CASE_COLUMNS: Tuple[Tuple[str, object, bool], ...] = (
+    ('id', 0, False),
+    ('original_id', 0, False),
+    ('gpa_4_scale', 0.0, True),
+    ('undergraduate_university_tier', '未知', True),
+    ('undergraduate_major_category', 'Other', True),
+    ('language_total_score', 0, True),
+    ('language_test_type', '', True),
+    ('gre_total', 0, True),
+    ('gmat_total', 0, True),
+    ('research_experience_count', 0, True),
+    ('internship_experience_count', 0, True),
+    ('work_experience_years', 0.0, True),
+    ('experience_text', '', True),
+    ('admitted_university', '', True),
+    ('admitted_program', '', True),
+    ('admitted_country', '', True),
+    ('admitted_degree_type', '', True),
+    ('undergraduate_university', '', True),
+    ('undergraduate_major', '', True),
+)
+
+# 列缓冲区的初始容量（行），不足时按倍数扩容
+_INITIAL_CAPACITY = 1024
+
+
+def normalize_case(case: Dict) -> Dict:
+    """按 CASE_COLUMNS 取出一条案例的字段（缺失时取缺省值）"""
+    return {name: _field(case, name, default, fill) for name, default, fill in CASE_COLUMNS}
+
+
+def _field(case: Dict, name: str, default, fill: bool):
+    value = case.get(name, default)
+    return (value or default) if fill else value
+
+
+def _is_string(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _deduplicate(series: pd.Series) -> pd.Series:
+    """重复的字符串共用同一个对象"""
+    seen: Dict[str, str] = {}
+    values = [seen.setdefault(value, value) if isinstance(value, str) else value for value in series.to_numpy(dtype=object)]
+    return pd.Series(values, index=series.index, dtype=series.dtype, name=series.name)
+
+
+def compact_column(column: pd.Series) -> pd.Series:
+    """单列的紧凑表示"""
+    if _is_string(column):
+        if len(column) and column.nunique(dropna=False) <= MAX_CATEGORY_RATIO * len(column):
+            return column.astype('category')
+        return _deduplicate(column)
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return pd.to_numeric(column, downcast='integer')
+    if pd.api.types.is_float_dtype(column.dtype) and column.dtype != np.float32:
+        narrowed = column.astype(np.float32)
+        # 只有所有值都能被 float32 精确表示时才转换（如 2.0、1.5），否则保留 float64（如 GPA 3.57）
+        if np.array_equal(narrowed.to_numpy(dtype=np.float64), column.to_numpy(), equal_nan=True):
+            return narrowed
+    return column
+
+
+def compact_cases(df: pd.DataFrame) -> pd.DataFrame:
+    """返回紧凑表示的案例表（不修改传入的 DataFrame）"""
+    return pd.DataFrame({name: compact_column(df[name]) for name in df.columns}, index=df.index)
+
+
+class CaseColumnBuilder:
+    """
+    流式构建案例表：逐页追加原始记录，数值列写入按需扩容的 NumPy 缓冲区，
+    字符串列只保存取值字典与每行的整数编码；每页追加后即可丢弃。
+    构建结果与 pd.DataFrame([normalize_case(c) for c in cases])（compact=True 时再经 compact_cases）一致
+    """
+
+    def __init__(self, columns: Iterable[Tuple[str, object, bool]] = CASE_COLUMNS):
+        self.columns: List[Tuple[str, object, bool]] = list(columns)
+        self.size = 0
+        self._capacity = _INITIAL_CAPACITY
+        self._numbers: Dict[str, np.ndarray] = {}
+        # 数值列是否出现过浮点数：没有时与 pandas 的推断一致，构建为整型列
+        self._floats: Dict[str, bool] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._values: Dict[str, Dict[object, int]] = {}
+        for name, default, _ in self.columns:
+            if isinstance(default, (int, float)):
+                self._numbers[name] = np.empty(self._capacity, dtype=np.float64)
+                self._floats[name] = False
+            else:
+                self._codes[name] = np.empty(self._capacity, dtype=np.int32)
+                self._values[name] = {}
+
+    def _reserve(self, size: int):
+        if size <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        for buffers in (self._numbers, self._codes):
+            for name, buffer in buffers.items():
+                grown = np.empty(capacity, dtype=buffer.dtype)
+                grown[:self.size] = buffer[:self.size]
+                buffers[name] = grown
+        self._capacity = capacity
+
+    def append(self, page: List[Dict]):
+        """追加一页原始记录"""
+        count = len(page)
+        if not count:
+            return
+        self._reserve(self.size + count)
+        start, stop = self.size, self.size + count
+        for name, default, fill in self.columns:
+            values = [_field(case, name, default, fill) for case in page]
+            if name in self._numbers:
+                if any(value is None for value in values):
+                    # 与 pandas 一致：含空值的数值列为浮点列，空值为 NaN
+                    values = [np.nan if value is None else value for value in values]
+                if not self._floats[name] and any(isinstance(value, float) for value in values):
+                    self._floats[name] = True
+                self._numbers[name][start:stop] = values
+            else:
+                index = self._values[name]
+                self._codes[name][start:stop] = [index.setdefault(value, len(index)) for value in values]
+        self.size = stop
+
+    def _string_column(self, name: str, compact: bool) -> pd.Series:
+        index = self._values[name]
+        codes = self._codes[name][:self.size]
+        categories = np.empty(len(index), dtype=object)
+        categories[:] = list(index)
+        try:
+            # 与 astype('category') 一致，取值字典按字典序排列
+            order = np.argsort(categories, kind='stable')
+        except TypeError:
+            order = None
+        if order is not None:
+            remap = np.empty(len(order), dtype=np.int32)
+            remap[order] = np.arange(len(order), dtype=np.int32)
+            codes, categories = remap[codes], categories[order]
+        if compact and self.size and len(categories) <= MAX_CATEGORY_RATIO * self.size:
+            return pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(categories)), name=name)
+        return pd.Series(categories[codes], name=name)
+
+    def build(self, compact: bool = True) -> pd.DataFrame:
+        """构建案例表并释放缓冲区"""
+        data = {}
+        for name, _, _ in self.columns:
+            if name in self._numbers:
+                values = self._numbers[name][:self.size].copy()
+                column = pd.Series(values if self._floats[name] else values.astype(np.int64), name=name)
+                data[name] = compact_column(column) if compact else column
+            else:
+                data[name] = self._string_column(name, compact)
+        self._numbers, self._codes, self._values = {}, {}, {}
+        return pd.DataFrame(data)
+
+
+def _column_bytes(series: pd.Series) -> int:
+    if isinstance(series.dtype, pd.CategoricalDtype) or not _is_string(series):
+        return int(series.memory_usage(deep=True, index=False))
+    # 字符串列：每行一个指针，共用的字符串对象只计一次
+    values = series.to_numpy(dtype=object)
+    distinct = {id(value): value for value in values}
+    return 8 * len(values) + sum(sys.getsizeof(value) for value in distinct.values())
+
+
+def memory_report(df: pd.DataFrame) -> Dict:
+    """案例表占用的内存：总字节数、每条案例的字节数，以及各列每条案例的字节数"""
+    usage = pd.Series({name: _column_bytes(df[name]) for name in df.columns}, dtype=np.int64)
+    rows = max(len(df), 1)
+    return {
+        'cases': len(df),
+        'bytes': int(usage.sum()),
+        'bytes_per_case': float(usage.sum() / rows),
+        'columns': {name: float(size / rows) for name, size in usage.items()},
+    }
@@ -0,0 +1,128 @@
+"""
+相似案例的近似最近邻检索（IVF）
+案例编码为定长向量，使查询向量与案例向量的内积近似相似度加权总分：
+院校层级、专业、GPA 区间等离散特征用 one-hot 编码，查询侧对应位置放该类别与用户的（加权）相似度，
+内积即为这些分项的加权和；经历文本使用降维后的稠密向量。
+加载时用 k-means 把案例划分为若干倒排列表，查询时按质心内积从高到低扫描 nprobe 个列表，
+取近似得分最高的若干候选，交由调用方用精确公式重排。nprobe 越大召回越高、延迟越高
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# k-means 训练样本数与迭代次数
+_TRAIN_SAMPLE = 30000
+_KMEANS_ITERATIONS = 8
+
+# 分块计算距离时每块的行数（限制临时矩阵的内存）
+_CHUNK_ROWS = 8192
+
+
+def default_nlist(size: int) -> int:
+    """倒排列表数：约为案例数的平方根"""
+    return int(max(1, min(4096, round(np.sqrt(size)))))
+
+
+class CaseIndex:
+    """
+    离散特征块 + 稠密特征块上的 IVF 索引
+    categorical: 块名 -> (每个案例的类别编码, 类别数)；dense: 每个案例的稠密向量（可为 None）
+    """
+
+    def __init__(self, categorical: Dict[str, Tuple[np.ndarray, int]], dense: Optional[np.ndarray] = None,
+                 nlist: Optional[int] = None, seed: int = 0):
+        self.blocks: List[str] = list(categorical)
+        self.codes: Dict[str, np.ndarray] = {name: codes.astype(np.int32) for name, (codes, _) in categorical.items()}
+        self.cardinality: Dict[str, int] = {name: int(size) for name, (_, size) in categorical.items()}
+        self.dense = None if dense is None else np.ascontiguousarray(dense, dtype=np.float32)
+        self.size = len(next(iter(self.codes.values()))) if self.codes else len(self.dense)
+        self.dimension = sum(self.cardinality.values()) + (0 if self.dense is None else self.dense.shape[1])
+        self.nlist = min(nlist or default_nlist(self.size), self.size)
+
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(self.size, min(self.size, max(_TRAIN_SAMPLE, self.nlist)), replace=False)
+        self.centroids = self._kmeans(np.sort(sample), rng)
+        assignment = np.concatenate([
+            self._nearest(self._embed(np.arange(start, min(start + _CHUNK_ROWS, self.size))))
+            for start in range(0, self.size, _CHUNK_ROWS)
+        ])
+        # 倒排列表以 CSR 形式存放：列表 l 的成员为 members[offsets[l]:offsets[l + 1]]
+        self.members = np.argsort(assignment, kind='stable').astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=self.nlist))])
+        logger.info(f"Built case index: {self.size} cases, {self.nlist} lists, {self.dimension} dims")
+
+    def _embed(self, rows: np.ndarray) -> np.ndarray:
+        """把若干案例展开为完整的嵌入向量（仅用于训练与分配）"""
+        embedded = np.zeros((len(rows), self.dimension), dtype=np.float32)
+        offset = 0
+        for name in self.blocks:
+            embedded[np.arange(len(rows)), offset + self.codes[name][rows]] = 1.0
+            offset += self.cardinality[name]
+        if self.dense is not None:
+            embedded[:, offset:] = self.dense[rows]
+        return embedded
+
+    def _nearest(self, embedded: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        centroids = self.centroids if centroids is None else centroids
+        # argmin ||x - c||^2 = argmax (2 x·c - ||c||^2)
+        return np.argmax(2 * embedded @ centroids.T - (centroids ** 2).sum(axis=1), axis=1)
+
+    def _kmeans(self, sample: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        points = self._embed(sample)
+        centroids = points[rng.choice(len(points), self.nlist, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            assignment = np.concatenate([
+                self._nearest(points[start:start + _CHUNK_ROWS], centroids)
+                for start in range(0, len(points), _CHUNK_ROWS)
+            ])
+            counts = np.bincount(assignment, minlength=self.nlist)
+            sums = np.stack([np.bincount(assignment, weights=points[:, d], minlength=self.nlist)
+                             for d in range(self.dimension)], axis=1)
+            # 空簇保留原质心
+            filled = counts > 0
+            centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        return centroids
+
+    def encode_query(self, rows: Dict[str, np.ndarray], dense_query: Optional[np.ndarray] = None) -> np.ndarray:
+        """查询向量：各离散块为按类别编码索引的（加权）相似度行，稠密块为（加权）查询向量"""
+        parts = [np.asarray(rows[name], dtype=np.float32)[:self.cardinality[name]] for name in self.blocks]
+        if self.dense is not None:
+            parts.append(np.zeros(self.dense.shape[1], dtype=np.float32) if dense_query is None
+                         else np.asarray(dense_query, dtype=np.float32).ravel())
+        return np.concatenate(parts)
+
+    def approximate_scores(self, query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """案例与查询向量的内积（按类别编码直接取值，无需展开 one-hot）"""
+        scores = np.zeros(len(positions), dtype=np.float32)
+        offset = 0
+        for name in self.blocks:
+            size = self.cardinality[name]
+            scores += query[offset:offset + size][self.codes[name][positions]]
+            offset += size
+        if self.dense is not None:
+            scores += self.dense[positions] @ query[offset:]
+        return scores
+
+    def search(self, query: np.ndarray, k: int, nprobe: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        返回近似得分最高的至多 k 个案例位置（升序）。mask 为候选过滤条件；
+        nprobe 个列表内的候选不足 k 个时继续扩大扫描范围
+        """
+        order = np.argsort(-(self.centroids @ query))
+        probe = max(1, nprobe)
+        while True:
+            lists = order[:probe]
+            candidates = np.concatenate([self.members[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if len(candidates) >= k or probe >= self.nlist:
+                break
+            probe *= 2
+        if len(candidates) > k:
+            scores = self.approximate_scores(query, candidates)
+            candidates = candidates[np.argpartition(-scores, k - 1)[:k]]
+        # 按案例原有顺序返回，精确重排时分数相同的案例与精确模式的次序一致
+        return np.sort(candidates)
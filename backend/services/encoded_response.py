@@ -0,0 +1,85 @@
+"""
+预序列化、预压缩的 JSON 响应体
+已完成任务的报告不再变化：只用快速 JSON 编码器（orjson，未安装时退回标准库 json）序列化一次，
+同时生成 gzip/brotli（brotli 未安装时跳过）压缩版本，之后按请求的 Accept-Encoding 直接返回字节
+"""
+import gzip
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于部署环境
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 取决于部署环境
+    brotli = None
+
+# 小于该字节数的响应不压缩（压缩收益抵不过开销）
+MIN_COMPRESS_BYTES = 1024
+
+# 同等支持时优先使用的编码
+_PREFERENCE = ("br", "gzip")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    item = getattr(obj, "item", None)
+    if callable(item):
+        # NumPy 标量（相似度分数、案例字段等）
+        return item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节（中文不转义）"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+class EncodedBody:
+    """一份 JSON 响应的原始字节及其压缩版本"""
+
+    def __init__(self, payload: Any):
+        self.identity = dumps(payload)
+        self.variants: Dict[str, bytes] = {}
+        if len(self.identity) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(self.identity, compresslevel=6)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(self.identity, quality=5)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """按 Accept-Encoding 选择响应体，返回 (字节, Content-Encoding)；不压缩时编码为 None"""
+        accepted = _accepted_encodings(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_quality = None, 0.0
+        for encoding in _PREFERENCE:
+            quality = accepted.get(encoding, wildcard)
+            if encoding in self.variants and quality > best_quality:
+                best, best_quality = encoding, quality
+        if best is None:
+            return self.identity, None
+        return self.variants[best], best
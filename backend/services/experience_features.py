@@ -0,0 +1,142 @@
+"""
+经历文本的哈希特征
+字符 n-gram 经特征哈希映射到固定维度，无需拟合词表：新案例可以直接向量化后追加，
+已有案例的词频行在数据刷新后保持不变。IDF 由增量维护的文档频率计算（与 TfidfVectorizer
+的平滑公式一致）；特征器按案例 id 记录已计入的案例，同步时新增的计入、删除的扣减、修改的先扣减旧词频，
+文档频率始终恰好对应当前的案例集合，与刷新次数无关
+"""
+import copy
+import logging
+import threading
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 默认哈希维度：2^18，中文字符 n-gram 的冲突率足够低
+DEFAULT_N_FEATURES = 1 << 18
+
+
+class HashedExperienceFeaturizer:
+    """char_wb n-gram 特征哈希 + 增量 IDF；transform 返回 L2 归一化的稀疏行向量"""
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES, ngram_range: Tuple[int, int] = (2, 4),
+                 use_idf: bool = True):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.n_features = n_features
+        self.use_idf = use_idf
+        self._hasher = HashingVectorizer(
+            analyzer='char_wb',
+            ngram_range=ngram_range,
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+        )
+        self._lock = threading.Lock()
+        self.n_documents = 0
+        self.document_frequency = np.zeros(n_features, dtype=np.int64)
+        self._idf: Optional[np.ndarray] = None
+        # 已计入文档频率的案例：(案例 id, 经历文本, 词频行)，行与 id 一一对应；同步时整体替换，不原地修改
+        self._documents: Optional[Tuple[np.ndarray, np.ndarray, object]] = None
+
+    def counts(self, texts: List[str]):
+        """词频矩阵（无状态，同一文本总是得到同一行）"""
+        if not texts:
+            from scipy import sparse
+
+            return sparse.csr_matrix((0, self.n_features), dtype=np.float64)
+        return self._hasher.transform(texts)
+
+    def partial_fit(self, counts) -> "HashedExperienceFeaturizer":
+        """把一批案例的词频计入文档频率"""
+        self._update_frequency(counts, 1)
+        return self
+
+    def _update_frequency(self, counts, sign: int):
+        if not self.use_idf or counts.shape[0] == 0:
+            return
+        present = np.bincount(counts.indices, minlength=self.n_features)
+        with self._lock:
+            self.document_frequency += sign * present
+            self.n_documents += sign * counts.shape[0]
+            self._idf = None
+
+    def sync(self, ids: Sequence[Hashable], texts: Sequence[str]):
+        """
+        使文档频率恰好对应给定的案例集合，返回与 ids 逐行对应的词频矩阵。
+        id 与经历文本都未变的案例沿用上次的词频行（不重新哈希），新增的案例计入，
+        不再出现或文本已修改的案例扣减上次计入的词频；id 有重复时整体重新计数
+        """
+        import pandas as pd
+        from scipy import sparse
+
+        ids = np.asarray(ids)
+        texts = np.asarray(texts, dtype=object)
+        previous = self._documents
+        new_index = pd.Index(ids)
+        old_index = pd.Index(previous[0]) if previous is not None else None
+        if previous is None or not old_index.is_unique or not new_index.is_unique:
+            if previous is not None:
+                with self._lock:
+                    self.document_frequency = np.zeros(self.n_features, dtype=np.int64)
+                    self.n_documents = 0
+                    self._idf = None
+            counts = self.counts(texts.tolist())
+            self._update_frequency(counts, 1)
+            reused = 0
+        else:
+            _, old_texts, old_counts = previous
+            source = old_index.get_indexer(ids)
+            unchanged = source >= 0
+            unchanged[unchanged] = old_texts[source[unchanged]] == texts[unchanged]
+            kept = np.zeros(len(old_index), dtype=bool)
+            kept[source[unchanged]] = True
+            self._update_frequency(old_counts[~kept], -1)
+            fresh = self.counts(texts[~unchanged].tolist())
+            self._update_frequency(fresh, 1)
+            # 先拼接旧词频行与新词频行，再按当前案例顺序取行
+            order = np.where(unchanged, source, 0)
+            order[~unchanged] = old_counts.shape[0] + np.arange(fresh.shape[0])
+            counts = sparse.vstack([old_counts, fresh], format='csr')[order]
+            reused = int(unchanged.sum())
+        logger.info(f"Hashed experience features: {reused} reused, {len(ids) - reused} vectorized")
+        self._documents = (ids, texts, counts)
+        return counts
+
+    @property
+    def idf(self) -> Optional[np.ndarray]:
+        if not self.use_idf:
+            return None
+        idf = self._idf
+        if idf is None:
+            with self._lock:
+                # 平滑 IDF：log((1 + n) / (1 + df)) + 1
+                idf = np.log((1 + self.n_documents) / (1 + self.document_frequency)) + 1
+                self._idf = idf
+        return idf
+
+    def weight(self, counts):
+        """按当前 IDF 加权并做 L2 归一化"""
+        from sklearn.preprocessing import normalize
+
+        if counts.shape[0] == 0:
+            return counts
+        if self.use_idf:
+            return normalize(counts.multiply(self.idf).tocsr(), norm='l2', copy=False)
+        # 不加权时不能原地归一化调用方的词频矩阵
+        return normalize(counts, norm='l2')
+
+    def copy(self) -> "HashedExperienceFeaturizer":
+        """复制特征器（文档频率独立），在副本上同步案例不会改变原特征器的 IDF"""
+        clone = copy.copy(self)
+        with self._lock:
+            clone.document_frequency = self.document_frequency.copy()
+            clone.n_documents = self.n_documents
+        clone._idf = None
+        clone._lock = threading.Lock()
+        return clone
+
+    def transform(self, texts: List[str]):
+        return self.weight(self.counts(texts))
@@ -0,0 +1,258 @@
+"""
+经历质量的本地启发式评分
+基于关键词特征（论文发表、知名机构、岗位类型等）与长度/结构信号给科研、实习经历打分，
+同时给出置信度；置信度足够时雷达图直接使用本地评分，否则再调用大模型。
+本地评分到大模型评分的线性校准离线拟合（config/experience_calibration.json），运行时固定不变，
+同一段经历在任何进程、任何时刻得到相同的分数；大模型评分只作为标注样本记录，供下一次离线拟合使用：
+
+    python -m services.experience_scorer labels.jsonl   # 拟合并写入 config/experience_calibration.json
+
+仓库不附带校准文件：未拟合前 heuristic 模式直接使用特征权重得到的原始分（不做校准），
+启动时会记录一条提示。
+"""
+import json
+import logging
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_PATH = Path(__file__).parent.parent / "config" / "experience_calibration.json"
+
+
+def _en(*words: str) -> str:
+    """英文关键词按整词匹配（中文字符也属于 \\w，不能直接用 \\b）"""
+    return r"(?<![a-z])(?:" + "|".join(words) + r")(?![a-z])"
+
+
+# 特征组 -> [(正则, 权重)]：权重为命中时在基础分上增加的分数，同一组内只取最高的一项
+RESEARCH_FEATURES: Dict[str, List[Tuple[str, float]]] = {
+    "top_venue": [
+        (_en("cvpr", "iccv", "eccv", "neurips", "nips", "icml", "iclr", "acl", "emnlp", "naacl", "aaai",
+             "ijcai", "kdd", "sigir", "sigmod", "vldb", "osdi", "sosp", "isca", r"ccf[- ]?a") + "|顶会|顶刊", 30),
+        (_en(r"ccf[- ]?b", r"ieee trans\w*", "transactions"), 22),
+    ],
+    "publication": [
+        (r"一作|第一作者|" + _en("first author"), 18),
+        (r"论文|发表|期刊|会议|" + _en("sci", "ssci", "papers?", "publications?", "journal", "conference"), 15),
+        (r"核心期刊|在投|预印本|" + _en("ei", "under review", "submitted", "arxiv"), 8),
+    ],
+    "award": [
+        (r"(国际|国家级).{0,6}(一等奖|金奖|特等奖)|美赛.{0,4}[of]奖|" + _en("acm") + r".{0,6}(金|银)", 12),
+        (r"一等奖|二等奖|金奖|银奖|特等奖|获奖|奖项", 6),
+    ],
+    "funding": [
+        (r"国家自然科学基金|国家重点研发|国家社科基金|国家级项目|973|863", 10),
+        (r"省级|省部级|大创|大学生创新|创新创业|校级项目|科研项目|课题", 5),
+    ],
+    "patent": [
+        (r"专利|软件著作权|软著|" + _en("patents?"), 5),
+    ],
+    "method": [
+        (r"深度学习|机器学习|神经网络|强化学习|自然语言处理|计算机视觉|大模型|实验设计|建模|仿真|算法|"
+         + _en("nlp", "transformers?", "llms?"), 4),
+    ],
+    "role": [
+        (r"负责|主导|独立完成|核心成员|项目负责人|" + _en("lead", "led"), 4),
+        (r"科研助理|实验室|课题组|" + _en("research assistant", "ra", "lab"), 3),
+    ],
+}
+
+INTERNSHIP_FEATURES: Dict[str, List[Tuple[str, float]]] = {
+    "company": [
+        (r"谷歌|微软|苹果|亚马逊|英伟达|腾讯|阿里|字节|华为|百度|美团|京东|网易|快手|拼多多|小米|蚂蚁|滴滴|"
+         r"高盛|摩根|中金|中信证券|华泰|麦肯锡|波士顿咨询|贝恩|普华永道|德勤|安永|毕马威|四大|"
+         + _en("google", "microsoft", "apple", "meta", "facebook", "amazon", "nvidia", "openai", "deepmind",
+               "bytedance", "goldman", "morgan", "jp ?morgan", "mckinsey", "bcg", "bain", "pwc", "deloitte",
+               "ey", "kpmg"), 28),
+        (r"券商|证券|基金|银行|投行|研究所|研究院|上市公司|外企|500强|独角兽|会计师事务所", 16),
+        (r"公司|企业|集团|科技|有限|创业|" + _en("startup"), 6),
+    ],
+    "role": [
+        (r"算法|研发|开发|工程师|研究员|量化|产品经理|"
+         + _en("engineer", "developer", "researcher", "quant", "product manager"), 12),
+        (r"分析师|数据分析|投资|行业研究|审计|咨询|运营|市场|策略|" + _en("analyst", "consult\\w*"), 9),
+        (r"实习生|助理|" + _en("intern", "assistant"), 4),
+    ],
+    "impact": [
+        (r"\d+(\.\d+)?\s*%|提升|提高|降低|优化|上线|落地|负责|主导|独立|"
+         + _en("increased?", "improved?", "reduced?", "launched?"), 8),
+    ],
+    "ipo": [
+        (r"并购|尽调|尽职调查|估值|财务模型|" + _en("ipo", "m&a"), 6),
+    ],
+    "duration": [
+        (r"(6|六|7|七|8|八|9|九|10|十|11|12)\s*个?月|半年|一年|1\s*年", 6),
+        (r"(3|三|4|四|5|五)\s*个?月", 3),
+    ],
+}
+
+_FEATURES = {"research": RESEARCH_FEATURES, "internship": INTERNSHIP_FEATURES}
+_COMPILED = {
+    kind: {group: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in rules]
+           for group, rules in features.items()}
+    for kind, features in _FEATURES.items()
+}
+
+# 没有任何特征时的基础分（与大模型提示词中“描述简单或缺乏具体内容给30-50分”一致）
+_BASE_SCORE = 40.0
+
+# 拟合校准需要的最少大模型样本数
+_MIN_CALIBRATION_SAMPLES = 20
+
+
+class Calibration(NamedTuple):
+    """
+    本地原始分到大模型评分的线性校准（斜率为正，保持原始分的先后顺序）。
+    大模型只评估低置信度的经历，样本集中在原始分的低段；范围外的原始分沿拟合直线外推，
+    强经历之间的差距得以保留，最终分数再截断到评分范围内
+    """
+    slope: float
+    intercept: float
+    samples: int
+
+    def apply(self, x: float) -> float:
+        return self.slope * x + self.intercept
+
+
+def fit_calibration(samples: List[Tuple[float, float]]) -> Optional[Calibration]:
+    """
+    离线拟合 (本地原始分, 大模型评分) 样本的最小二乘直线；
+    样本不足、原始分没有差异或拟合斜率不为正（校准会打乱原始分的先后顺序）时返回 None
+    """
+    n = len(samples)
+    if n < _MIN_CALIBRATION_SAMPLES:
+        return None
+    sx = sum(x for x, _ in samples)
+    sy = sum(y for _, y in samples)
+    sxx = sum(x * x for x, _ in samples)
+    sxy = sum(x * y for x, y in samples)
+    denominator = n * sxx - sx * sx
+    if denominator <= 0:
+        return None
+    slope = (n * sxy - sx * sy) / denominator
+    if slope <= 0:
+        return None
+    intercept = (sy - slope * sx) / n
+    return Calibration(slope, intercept, n)
+
+
+def load_calibrations(path: Path = CALIBRATION_PATH) -> Dict[str, Calibration]:
+    """读取离线拟合的校准参数；文件不存在时不做校准"""
+    if not path.exists():
+        logger.info(f"No experience score calibration at {path}; heuristic scores are used uncalibrated")
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {kind: Calibration(**params) for kind, params in json.load(f).items() if kind in _FEATURES}
+    except Exception as e:
+        logger.warning(f"Failed to load experience score calibration: {str(e)}")
+        return {}
+
+
+def save_calibrations(calibrations: Dict[str, Calibration], path: Path = CALIBRATION_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({kind: calibration._asdict() for kind, calibration in calibrations.items()}, f, indent=2)
+
+
+class ExperienceScore:
+    """本地评分结果：校准后的分数、未校准的原始分数、置信度（0-1）与命中的特征组"""
+
+    def __init__(self, score: int, raw_score: float, confidence: float, features: List[str]):
+        self.score = score
+        self.raw_score = raw_score
+        self.confidence = confidence
+        self.features = features
+
+
+class ExperienceScorer:
+    """科研/实习经历的本地启发式评分器（校准参数在构造时固定）"""
+
+    def __init__(self, calibrations: Optional[Dict[str, Calibration]] = None, labels_path: Optional[Path] = None):
+        self.calibrations: Dict[str, Calibration] = dict(calibrations or {})
+        # 标注样本追加写入的 JSONL 文件（None 表示不记录）
+        self.labels_path = labels_path
+        self._lock = threading.Lock()
+
+    def score(self, kind: str, text: str) -> ExperienceScore:
+        """评估一段经历文本；kind 为 "research" 或 "internship" """
+        normalized = unicodedata.normalize("NFKC", text or "").lower()
+        entries = [line for line in normalized.splitlines() if line.strip()]
+        length = len(re.sub(r"\s+", "", normalized))
+
+        raw = _BASE_SCORE
+        matched: List[str] = []
+        for group, rules in _COMPILED[kind].items():
+            weight = max((w for pattern, w in rules if pattern.search(normalized)), default=0.0)
+            if weight:
+                raw += weight
+                matched.append(group)
+
+        # 结构信号：多段经历、描述充分时加分
+        raw += min(len(entries) - 1, 3) * 3 if entries else 0
+        if length >= 120:
+            raw += 4
+        elif length < 15:
+            raw -= 5
+
+        # 置信度：命中的特征组越多、描述越充分越高；极短或毫无特征的描述交给大模型判断
+        confidence = 0.3 + 0.15 * len(matched) + min(length, 200) / 200 * 0.2
+        if not matched:
+            confidence = min(confidence, 0.3)
+        confidence = max(0.0, min(1.0, confidence))
+
+        calibration = self.calibrations.get(kind)
+        calibrated = calibration.apply(raw) if calibration else raw
+        return ExperienceScore(int(round(max(30.0, min(100.0, calibrated)))), raw, confidence, matched)
+
+    def record_label(self, kind: str, raw_score: float, llm_score: int):
+        """把一次大模型评分追加到标注文件，作为下一次离线拟合的样本（不影响当前的评分）"""
+        if self.labels_path is None:
+            return
+        with self._lock:
+            try:
+                with open(self.labels_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"kind": kind, "raw_score": raw_score, "llm_score": llm_score}) + "\n")
+            except OSError as e:
+                logger.warning(f"Failed to record experience score label: {str(e)}")
+
+
+_scorer: Optional[ExperienceScorer] = None
+_scorer_lock = threading.Lock()
+
+
+def get_experience_scorer() -> ExperienceScorer:
+    """获取进程内共享的本地评分器（使用离线拟合的校准参数）"""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                labels_path = settings.EXPERIENCE_SCORER_LABELS_PATH
+                _scorer = ExperienceScorer(load_calibrations(), Path(labels_path) if labels_path else None)
+    return _scorer
+
+
+def fit_label_file(path: Path) -> Dict[str, Calibration]:
+    """按经历类型拟合标注文件（record_label 写入的 JSONL）中的样本"""
+    samples: Dict[str, List[Tuple[float, float]]] = {kind: [] for kind in _FEATURES}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                label = json.loads(line)
+                samples.setdefault(label["kind"], []).append((float(label["raw_score"]), float(label["llm_score"])))
+    fitted = {kind: fit_calibration(pairs) for kind, pairs in samples.items() if kind in _FEATURES}
+    return {kind: calibration for kind, calibration in fitted.items() if calibration is not None}
+
+
+if __name__ == "__main__":
+    import sys
+
+    calibrations = fit_label_file(Path(sys.argv[1]))
+    save_calibrations(calibrations)
+    for kind, calibration in calibrations.items():
+        print(f"{kind}: {calibration}")
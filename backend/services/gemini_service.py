@@ -1,19 +1,20 @@
-import google.generativeai as genai
 import json
 import logging
+import time
 from typing import Dict, List, Optional
-from config.settings import settings
+from services.llm_client import get_llm_client
+from services.rate_limiter import estimate_tokens
+from services.cancellation import TaskCancelled, raise_if_cancelled, cancellable_sleep
+from services.metrics import GEMINI_CALL_SECONDS, RETRIES_TOTAL, FALLBACKS_TOTAL
+from services.profiling import span
 from models.schemas import UserBackground, CompetitivenessAnalysis, SchoolRecommendations, SchoolRecommendation, SupportingCase, CaseAnalysis, BackgroundImprovement
 
 logger = logging.getLogger(__name__)
 
 class GeminiService:
     def __init__(self):
-        # 使用环境变量中的API密钥
-        api_key = settings.GEMINI_API_KEY
-        if not api_key:
-            raise Exception("GEMINI_API_KEY environment variable is required")
-        genai.configure(api_key=api_key)
+        # 使用进程内共享的大模型客户端（缺少API密钥时抛出异常）
+        self.llm_client = get_llm_client()
         
         # 模型候选顺序：A > B > C
         self.model_candidates = [
@@ -26,53 +27,67 @@ class GeminiService:
         self.current_model_index = 0
         logger.info("LLM scheduler initialized with model candidates: A > B > C")
     
-    def _call_gemini_api(self, prompt: str, max_retries: int = 2, timeout_seconds: int = 600) -> Optional[str]:
+    def _call_gemini_api(self, prompt: str, max_retries: int = 2, timeout_seconds: int = 600,
+                         method: str = "unknown") -> Optional[str]:
         """Call Gemini API with model candidate fallback and retry logic"""
+        estimated_tokens = estimate_tokens(prompt)
+        rate_limiter = self.llm_client.rate_limiter
         # 按候选顺序尝试模型
         for model_index in range(len(self.model_candidates)):
+            # 任务已取消时不再切换模型或发起新的调用
+            raise_if_cancelled()
             model_name = self.model_candidates[model_index]
             logger.info(f"Trying model {model_name} (candidate {model_index + 1})")
             
             try:
-                # 创建模型实例
-                model = genai.GenerativeModel(model_name)
+                # 获取共享客户端中缓存的模型句柄
+                model = self.llm_client.get_model(model_name)
                 
                 # 尝试调用，最多重试max_retries次
                 for attempt in range(max_retries):
+                    raise_if_cancelled()
+                    # 客户端限流：等待配额，或在后续候选模型有余量时直接切换
+                    if not rate_limiter.acquire(model_name, estimated_tokens, self.model_candidates[model_index + 1:]):
+                        logger.warning(f"No rate limit headroom for {model_name}, switching to next candidate")
+                        break
+                    started = time.perf_counter()
                     try:
-                        response = model.generate_content(
-                            prompt,
-                            generation_config=genai.types.GenerationConfig(
-                                temperature=0.5,
-                                top_p=0.9,
-                                top_k=40,
-                                max_output_tokens=6144,
+                        with span("gemini.generate_content", method=method, model=model_name, attempt=attempt + 1):
+                            response = model.generate_content(
+                                prompt,
+                                generation_config=self.llm_client.generation_config
                             )
-                        )
+                        
+                        usage = getattr(response, "usage_metadata", None)
+                        rate_limiter.record_usage(model_name, estimated_tokens, getattr(usage, "prompt_token_count", None))
                         
                         if response and response.text:
+                            GEMINI_CALL_SECONDS.observe(time.perf_counter() - started, method=method, model=model_name, outcome="success")
                             logger.info(f"✅ API call successful with {model_name} on attempt {attempt + 1}")
                             return response.text
                         else:
+                            GEMINI_CALL_SECONDS.observe(time.perf_counter() - started, method=method, model=model_name, outcome="empty")
                             logger.warning(f"Empty response from {model_name} on attempt {attempt + 1}")
                             
                     except Exception as e:
+                        GEMINI_CALL_SECONDS.observe(time.perf_counter() - started, method=method, model=model_name, outcome="error")
                         error_msg = str(e).lower()
                         logger.warning(f"{model_name} attempt {attempt + 1} failed: {str(e)}")
                         
                         # 配额错误直接切换到下一个模型
                         if "quota" in error_msg or "rate limit" in error_msg or "429" in error_msg:
                             logger.error(f"API quota exceeded for {model_name}: {str(e)}")
+                            rate_limiter.report_throttled(model_name)
                             break
                         elif any(keyword in error_msg for keyword in ["network", "timeout", "deadline", "504", "503", "502"]):
                             # 网络和超时错误进行重试
                             if attempt == max_retries - 1:
                                 logger.error(f"Network/timeout error after {max_retries} attempts with {model_name}: {str(e)}")
                                 break
-                            import time
                             wait_time = (attempt + 1) * 2
+                            RETRIES_TOTAL.inc(component="gemini", operation=method)
                             logger.info(f"Retrying {model_name} in {wait_time} seconds...")
-                            time.sleep(wait_time)
+                            cancellable_sleep(wait_time)
                         else:
                             # 其他错误直接切换到下一个模型
                             logger.error(f"Non-retryable error with {model_name}: {str(e)}")
@@ -80,13 +95,17 @@ class GeminiService:
                 
                 # 如果当前模型的所有重试都失败了，记录并尝试下一个模型
                 if model_index < len(self.model_candidates) - 1:
+                    FALLBACKS_TOTAL.inc(kind="gemini_model")
                     logger.warning(f"Model {model_name} failed, switching to next candidate")
                 else:
                     logger.error(f"All model candidates failed")
                     
+            except TaskCancelled:
+                raise
             except Exception as e:
                 logger.error(f"Failed to initialize model {model_name}: {str(e)}")
                 if model_index < len(self.model_candidates) - 1:
+                    FALLBACKS_TOTAL.inc(kind="gemini_model")
                     logger.warning(f"Switching to next candidate")
                 else:
                     logger.error(f"All model candidates failed to initialize")
@@ -99,16 +118,17 @@ class GeminiService:
             return None
         
         try:
-            # Try to find JSON in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-            else:
-                # If no JSON found, try to parse the entire response
-                return json.loads(response_text)
+            with span("gemini.parse_json", length=len(response_text)):
+                # Try to find JSON in the response
+                start_idx = response_text.find('{')
+                end_idx = response_text.rfind('}') + 1
+                
+                if start_idx != -1 and end_idx > start_idx:
+                    json_str = response_text[start_idx:end_idx]
+                    return json.loads(json_str)
+                else:
+                    # If no JSON found, try to parse the entire response
+                    return json.loads(response_text)
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON from Gemini response: {str(e)}")
             # 不记录完整响应文本，避免泄露敏感信息
@@ -153,7 +173,7 @@ class GeminiService:
   "summary": "[一段总结性文字，综合评价用户的整体竞争力水平，并给出申请成功概率的大致判断]"
 }}"""
 
-        response_text = self._call_gemini_api(prompt)
+        response_text = self._call_gemini_api(prompt, method="analyze_competitiveness")
         if not response_text:
             # 如果API调用失败，抛出异常以便被上层捕获
             raise Exception("Gemini API call failed")
@@ -225,17 +245,18 @@ class GeminiService:
 }}"""
 
         # 使用标准超时和重试配置
-        response_text = self._call_gemini_api(prompt)
+        response_text = self._call_gemini_api(prompt, method="generate_school_recommendations")
         
         # 如果复杂推荐失败，尝试简化版本
         if not response_text:
             logger.warning("Complex recommendation failed, trying simplified version...")
+            FALLBACKS_TOTAL.inc(kind="simplified_recommendations")
             simplified_prompt = f"""基于相似案例推荐8个学校项目：
 用户：GPA {user_background.gpa}，{user_background.undergraduate_university}
 案例：{json.dumps(cases_data[:5], ensure_ascii=False)}
 输出JSON：{{"recommendations":[{{"university":"学校","program":"项目","reason":"简短理由","supporting_cases":[{{"case_id":"1","similarity_score":0.8,"key_similarities":"相似点"}}]}}],"analysis_summary":"总结"}}"""
             
-            response_text = self._call_gemini_api(simplified_prompt)
+            response_text = self._call_gemini_api(simplified_prompt, method="generate_school_recommendations")
             if not response_text:
                 raise Exception("Both complex and simplified school recommendations failed")
         
@@ -322,7 +343,7 @@ class GeminiService:
   "takeaways": "用户可以从中学习到..."
 }}"""
 
-        response_text = self._call_gemini_api(prompt)
+        response_text = self._call_gemini_api(prompt, method="analyze_single_case")
         if not response_text:
             return None
         
@@ -394,7 +415,7 @@ class GeminiService:
   "strategy_summary": "总体申请策略建议..."
 }}"""
 
-        response_text = self._call_gemini_api(prompt)
+        response_text = self._call_gemini_api(prompt, method="generate_background_improvement")
         if not response_text:
             return None
         
@@ -411,9 +432,10 @@ class GeminiService:
             logger.error(f"Error creating BackgroundImprovement: {str(e)}")
             return None
     
-    def evaluate_research_experience(self, research_text: str) -> int:
+    def evaluate_research_experience(self, research_text: str, fallback: Optional[int] = 50) -> Optional[int]:
         """
         评估科研背景质量，返回0-100的分数
+        调用或解析失败时返回 fallback（传入 None 可让调用方区分失败与真实评分）
         """
         if not research_text or not research_text.strip():
             return 30
@@ -438,9 +460,9 @@ class GeminiService:
 """
         
         try:
-            response_text = self._call_gemini_api(prompt)
+            response_text = self._call_gemini_api(prompt, method="evaluate_research_experience")
             if not response_text:
-                return 50
+                return fallback
             
             # 提取数字分数
             import re
@@ -449,15 +471,16 @@ class GeminiService:
                 score = int(numbers[0])
                 return max(30, min(100, score))  # 确保分数在30-100范围内
             else:
-                return 50
+                return fallback
                 
         except Exception as e:
             logger.error(f"评估科研背景失败: {str(e)}")
-            return 50
+            return fallback
     
-    def evaluate_internship_experience(self, internship_text: str) -> int:
+    def evaluate_internship_experience(self, internship_text: str, fallback: Optional[int] = 50) -> Optional[int]:
         """
         评估实习背景质量，返回0-100的分数
+        调用或解析失败时返回 fallback（传入 None 可让调用方区分失败与真实评分）
         """
         if not internship_text or not internship_text.strip():
             return 30
@@ -483,9 +506,9 @@ class GeminiService:
 """
         
         try:
-            response_text = self._call_gemini_api(prompt)
+            response_text = self._call_gemini_api(prompt, method="evaluate_internship_experience")
             if not response_text:
-                return 50
+                return fallback
             
             # 提取数字分数
             import re
@@ -494,8 +517,8 @@ class GeminiService:
                 score = int(numbers[0])
                 return max(30, min(100, score))  # 确保分数在30-100范围内
             else:
-                return 50
+                return fallback
                 
         except Exception as e:
             logger.error(f"评估实习背景失败: {str(e)}")
-            return 50
\ No newline at end of file
+            return fallback
\ No newline at end of file
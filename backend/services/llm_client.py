@@ -0,0 +1,82 @@
+"""
+共享大模型客户端
+进程内只配置一次 genai，并按模型名缓存 GenerativeModel 句柄，所有 GeminiService
+共用同一个客户端（及其底层连接），限流、缓存等逻辑因此能看到全部流量。
+genai 在首次获取模型句柄时才导入和配置，服务启动不为其付出导入开销
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+from config.settings import settings
+from services.rate_limiter import RateLimiter, get_rate_limiter
+from services.startup import lazy_import
+
+# google.generativeai 导入较慢，在首次获取模型句柄时才真正导入
+genai = lazy_import("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClient:
+    """进程内共享的大模型客户端"""
+
+    def __init__(self, api_key: str):
+        self._api_key = api_key
+        self._configured = False
+        self._models: Dict[str, "genai.GenerativeModel"] = {}
+        self._generation_config = None
+        self._lock = threading.Lock()
+        # 按模型的 RPM/TPM 客户端限流，所有调用共用同一组令牌桶
+        self.rate_limiter: RateLimiter = get_rate_limiter()
+        logger.info("Shared LLM client created")
+
+    def _configure(self):
+        """首次使用时导入并配置 genai（调用方持有 self._lock）"""
+        if not self._configured:
+            # genai.configure 会重建默认客户端，只在共享客户端中调用一次，使底层连接得以复用
+            genai.configure(api_key=self._api_key)
+            self._configured = True
+            logger.info("Shared LLM client configured")
+
+    @property
+    def generation_config(self) -> "genai.types.GenerationConfig":
+        if self._generation_config is None:
+            with self._lock:
+                if self._generation_config is None:
+                    self._generation_config = genai.types.GenerationConfig(
+                        temperature=0.5,
+                        top_p=0.9,
+                        top_k=40,
+                        max_output_tokens=6144,
+                    )
+        return self._generation_config
+
+    def get_model(self, model_name: str) -> "genai.GenerativeModel":
+        """获取（并缓存）指定模型的句柄"""
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is None:
+                    self._configure()
+                    model = genai.GenerativeModel(model_name)
+                    self._models[model_name] = model
+        return model
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """获取进程内共享的大模型客户端（首次调用时初始化）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = settings.GEMINI_API_KEY
+                if not api_key:
+                    raise Exception("GEMINI_API_KEY environment variable is required")
+                _client = LLMClient(api_key)
+    return _client
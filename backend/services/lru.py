@@ -0,0 +1,67 @@
+"""
+线程安全的有界 LRU 缓存（按条目数，可选同时按字节数限制）
+命中/未命中按缓存名计入 cache_requests_total 指标
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from services.metrics import CACHE_REQUESTS_TOTAL
+
+_MISSING = object()
+
+
+class LRUCache:
+    """按最近使用淘汰的有界缓存"""
+
+    def __init__(self, name: str, maxsize: int = 1024, max_bytes: int = 0,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.name = name
+        self.maxsize = maxsize
+        # 按字节数限制时 sizeof 给出每个值占用的字节数（max_bytes 为 0 表示不按字节限制）
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+        CACHE_REQUESTS_TOTAL.inc(cache=self.name, result="miss" if value is _MISSING else "hit")
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        size = self._sizeof(value) if self.max_bytes and self._sizeof else 0
+        if self.max_bytes and size > self.max_bytes:
+            # 单个值超过字节上限时不缓存
+            return
+        with self._lock:
+            self.nbytes += size - self._sizes.pop(key, 0)
+            self._sizes[key] = size
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (self.max_bytes and self.nbytes > self.max_bytes):
+                evicted, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(evicted)
+
+    def discard(self, predicate: Callable[[Hashable], bool]):
+        """删除键满足条件的条目"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+                self.nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
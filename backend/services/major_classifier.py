@@ -0,0 +1,201 @@
+"""
+专业类别分类
+以 data/cleaned_majors.json 的专业目录（代码、名称、专业类）与 config/major_categories.json
+的类别规则为数据源，进程内只构建一次“专业名称/代码/专业类 -> 类别”的查找表；
+目录外的名称依次尝试关键词、最长目录名子串与 n-gram 相似度，并按名称缓存结果
+"""
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from services.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_CONFIG_PATH = Path(__file__).parent.parent / "config" / "major_categories.json"
+MAJOR_CATALOG_PATH = Path(__file__).parent.parent.parent / "data" / "cleaned_majors.json"
+
+# n-gram 模糊匹配的最低相似度
+MIN_FUZZY_SIMILARITY = 0.5
+
+_WHITESPACE = re.compile(r"\s+")
+# 目录中少量条目的代码混在名称里，如 "— 60 — 080905  物联网工程"
+_EMBEDDED_CODE = re.compile(r"(\d{6,7}[A-Z]*)\s+(\S+)$")
+# 名称中的括号备注，如 "计算机科学与技术(中外合作办学)"
+_PARENTHESES = re.compile(r"\(.*?\)")
+
+
+def normalize_major_name(name: str) -> str:
+    """规范化专业名称：全角转半角、去除空白、英文转小写"""
+    if not name:
+        return ""
+    return _WHITESPACE.sub("", unicodedata.normalize("NFKC", name)).lower()
+
+
+def _bigrams(text: str) -> Set[str]:
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class MajorMatch(NamedTuple):
+    """分类结果：目录中的专业名称（未匹配到目录时为空）、专业类及其代码（如 "0809"）与类别"""
+    name: str
+    subcategory: str
+    subcategory_code: str
+    category: str
+
+
+class MajorClassifier:
+    """专业名称到类别的查找表"""
+
+    def __init__(self, config: Dict, catalog: List[Dict]):
+        self.default_category: str = config.get("default_category", "Other")
+        categories: Dict[str, Dict] = config.get("categories", {})
+        self.categories: Tuple[str, ...] = tuple(categories) + (self.default_category,)
+
+        category_by_prefix = {
+            prefix: category
+            for category, rules in categories.items()
+            for prefix in rules.get("subcategory_codes", [])
+        }
+        # 关键词按长度降序匹配，较长的关键词更具体
+        self._keywords: Tuple[Tuple[str, str], ...] = tuple(sorted(
+            ((normalize_major_name(keyword), category)
+             for category, rules in categories.items() for keyword in rules.get("keywords", [])),
+            key=lambda item: -len(item[0]),
+        ))
+
+        entries = list(self._parse_catalog(catalog))
+        # 部分条目缺少代码，按专业类名称推断专业类代码
+        prefix_by_subcategory: Dict[str, str] = {}
+        votes: Dict[str, Counter] = {}
+        for code, _, subcategory in entries:
+            if code:
+                votes.setdefault(subcategory, Counter())[code[:4]] += 1
+        for subcategory, counter in votes.items():
+            prefix_by_subcategory[subcategory] = counter.most_common(1)[0][0]
+
+        overrides = {normalize_major_name(k): v for k, v in config.get("overrides", {}).items()}
+        index: Dict[str, MajorMatch] = {}
+        for code, name, subcategory in entries:
+            prefix = code[:4] if code else prefix_by_subcategory.get(subcategory, "")
+            key = normalize_major_name(name)
+            category = overrides.get(key) or category_by_prefix.get(prefix, self.default_category)
+            match = MajorMatch(name, subcategory, prefix, category)
+            index.setdefault(key, match)
+            if code:
+                index.setdefault(code.lower(), match)
+            if subcategory:
+                subcategory_match = MajorMatch("", subcategory, prefix, category_by_prefix.get(prefix, self.default_category))
+                index.setdefault(normalize_major_name(subcategory), subcategory_match)
+                index.setdefault(normalize_major_name(subcategory.rstrip("类")), subcategory_match)
+
+        self._index: Mapping[str, MajorMatch] = MappingProxyType(index)
+        # 供子串与 n-gram 回退使用的目录名称（仅专业名称，不含代码）
+        self._names: Tuple[Tuple[str, MajorMatch], ...] = tuple(
+            sorted(((normalize_major_name(name), index[normalize_major_name(name)]) for _, name, _ in entries),
+                   key=lambda item: -len(item[0]))
+        )
+        self._name_grams: Tuple[frozenset, ...] = tuple(frozenset(_bigrams(key)) for key, _ in self._names)
+        self._resolved = LRUCache("major_classify", 4096)
+
+    @staticmethod
+    def _parse_catalog(catalog: List[Dict]):
+        for item in catalog:
+            code, name = item.get("code", ""), item.get("name", "")
+            if not code:
+                embedded = _EMBEDDED_CODE.search(name)
+                if not embedded:
+                    continue
+                code, name = embedded.group(1)[:6], embedded.group(2)
+                if name.endswith("类") or name.startswith("学科门类"):
+                    continue
+            if name:
+                yield code, name, item.get("subcategory", "")
+
+    @classmethod
+    def from_files(cls, config_path: Path = CATEGORY_CONFIG_PATH,
+                   catalog_path: Optional[Path] = MAJOR_CATALOG_PATH) -> "MajorClassifier":
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load major category config: {str(e)}")
+            raise Exception(f"专业类别配置文件缺失或损坏: {str(e)}")
+        catalog: List[Dict] = []
+        if catalog_path is not None:
+            try:
+                with open(catalog_path, 'r', encoding='utf-8') as f:
+                    catalog = json.load(f)
+            except Exception as e:
+                # 专业目录缺失时只能依靠关键词规则分类
+                logger.warning(f"Failed to load major catalog: {str(e)}")
+        return cls(config, catalog)
+
+    def classify(self, major_name: str) -> MajorMatch:
+        """返回专业的目录匹配与类别；无法识别时类别为默认类别"""
+        key = normalize_major_name(major_name)
+        if not key:
+            return MajorMatch("", "", "", self.default_category)
+        match = self._index.get(key)
+        if match is not None:
+            return match
+        cached = self._resolved.get(key)
+        if cached is None:
+            cached = self._classify_fallback(key)
+            self._resolved.put(key, cached)
+        return cached
+
+    def category_of(self, major_name: str) -> str:
+        return self.classify(major_name).category
+
+    def _classify_fallback(self, key: str) -> MajorMatch:
+        # 去掉括号备注后再精确查找，如 "软件工程(中外合作办学)"
+        stripped = _PARENTHESES.sub("", key)
+        if stripped != key and stripped in self._index:
+            return self._index[stripped]
+
+        # 关键词规则（较长关键词优先）
+        for keyword, category in self._keywords:
+            if keyword in key:
+                return MajorMatch("", "", "", category)
+
+        # 包含某个目录专业名称（最长者优先），如 "金融学（CFA方向）"
+        for name, match in self._names:
+            if len(name) >= 2 and name in key:
+                return match
+
+        # n-gram 相似度
+        query = _bigrams(stripped or key)
+        best, best_score = None, 0.0
+        for (name, match), grams in zip(self._names, self._name_grams):
+            overlap = len(query & grams)
+            if overlap:
+                score = 2 * overlap / (len(query) + len(grams))
+                if score > best_score:
+                    best, best_score = match, score
+        if best is not None and best_score >= MIN_FUZZY_SIMILARITY:
+            return best
+        return MajorMatch("", "", "", self.default_category)
+
+
+_classifier: Optional[MajorClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_major_classifier() -> MajorClassifier:
+    """获取进程内共享的专业分类器（首次调用时构建）"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = MajorClassifier.from_files()
+                logger.info("Major classifier built")
+    return _classifier
@@ -0,0 +1,127 @@
+"""
+专业相关度矩阵
+专业用 (类别, 专业类代码) 表示，如 ("CS", "0809")；专业类未知时代码为空。
+两两相似度由 config/major_relatedness.json 决定，并预先计算成稠密的 NumPy 矩阵，
+相似度计算时按整数编码一次性取出所有候选案例的专业相似度
+"""
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RELATEDNESS_CONFIG_PATH = Path(__file__).parent.parent / "config" / "major_relatedness.json"
+
+MajorKey = Tuple[str, str]
+
+
+class MajorRelatedness:
+    """专业两两相似度：类别相同为 1，其次按类别关系、专业类所属学科门类逐级降低"""
+
+    def __init__(self, config: Dict, default_category: str = "Other"):
+        self.default_category = default_category
+        self.default_similarity = float(config.get("default_similarity", 0.1))
+        self.same_discipline_similarity = float(config.get("same_discipline_similarity", self.default_similarity))
+        self._category_pairs = self._symmetric(config.get("category_pairs", []))
+        self._discipline_pairs = self._symmetric(config.get("discipline_pairs", []))
+
+        self._lock = threading.Lock()
+        self._keys: List[MajorKey] = []
+        self._codes: Dict[MajorKey, int] = {}
+        self._matrix = np.ones((0, 0))
+
+    @staticmethod
+    def _symmetric(pairs) -> Dict[Tuple[str, str], float]:
+        table = {}
+        for a, b, value in pairs:
+            table[(a, b)] = table[(b, a)] = float(value)
+        return table
+
+    @classmethod
+    def from_file(cls, path: Path = RELATEDNESS_CONFIG_PATH, default_category: str = "Other") -> "MajorRelatedness":
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f), default_category)
+        except Exception as e:
+            logger.error(f"Failed to load major relatedness config: {str(e)}")
+            raise Exception(f"专业相关度配置文件缺失或损坏: {str(e)}")
+
+    def similarity(self, a: MajorKey, b: MajorKey) -> float:
+        """两个专业的相似度（0-1）"""
+        category_a, subcategory_a = a
+        category_b, subcategory_b = b
+        if category_a == category_b:
+            # 默认类别（Other）覆盖大量学科，两侧专业类都已知时按专业类区分
+            if category_a != self.default_category or not subcategory_a or not subcategory_b \
+                    or subcategory_a == subcategory_b:
+                return 1.0
+        elif (category_a, category_b) in self._category_pairs:
+            return self._category_pairs[(category_a, category_b)]
+        if subcategory_a and subcategory_b:
+            discipline_a, discipline_b = subcategory_a[:2], subcategory_b[:2]
+            if discipline_a == discipline_b:
+                return self.same_discipline_similarity
+            return self._discipline_pairs.get((discipline_a, discipline_b), self.default_similarity)
+        return self.default_similarity
+
+    def code(self, key: MajorKey) -> int:
+        """专业的整数编码（首次出现时登记，矩阵随之扩展）"""
+        code = self._codes.get(key)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(key)
+                if code is None:
+                    code = len(self._keys)
+                    self._extend([key])
+        return code
+
+    def codes(self, keys: List[MajorKey]) -> np.ndarray:
+        """批量编码，新专业一次性登记"""
+        with self._lock:
+            self._extend([key for key in dict.fromkeys(keys) if key not in self._codes])
+        return np.fromiter((self._codes[key] for key in keys), dtype=np.int32, count=len(keys))
+
+    def _extend(self, new_keys: List[MajorKey]):
+        if not new_keys:
+            return
+        keys = self._keys + new_keys
+        size, old = len(keys), len(self._keys)
+        matrix = np.empty((size, size))
+        matrix[:old, :old] = self._matrix
+        for i in range(size):
+            for j in range(old if i < old else 0, size):
+                matrix[i, j] = self.similarity(keys[i], keys[j])
+        for i in range(old, size):
+            matrix[:old, i] = [self.similarity(keys[j], keys[i]) for j in range(old)]
+        # 先替换为填好的新矩阵，再登记新专业的编码：不加锁的读取方拿到的编码总在矩阵范围内
+        self._matrix = matrix
+        self._keys = keys
+        for code, key in enumerate(new_keys, old):
+            self._codes[key] = code
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix
+
+    def row(self, key: MajorKey) -> np.ndarray:
+        """某个专业与所有已登记专业的相似度，按编码索引"""
+        code = self.code(key)
+        return self._matrix[code]
+
+
+_relatedness: Optional[MajorRelatedness] = None
+_relatedness_lock = threading.Lock()
+
+
+def get_major_relatedness(default_category: str = "Other") -> MajorRelatedness:
+    """获取进程内共享的专业相关度矩阵"""
+    global _relatedness
+    if _relatedness is None:
+        with _relatedness_lock:
+            if _relatedness is None:
+                _relatedness = MajorRelatedness.from_file(default_category=default_category)
+    return _relatedness
@@ -0,0 +1,329 @@
+"""
+运行指标
+轻量的进程内指标注册表（Counter / Gauge / Histogram），以 Prometheus 文本格式通过 /metrics 暴露
+"""
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认分桶（秒），覆盖毫秒级的相似度计算到数分钟的大模型调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: LabelValues, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> Dict[LabelValues, object]:
+        with self._lock:
+            return copy.deepcopy(self._values)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def merge(self, values: Dict[LabelValues, object], process: str = ""):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(_Metric):
+    """
+    瞬时值。其他进程回传的样本不可累加，按进程分别保存（每次合并替换该进程的全部样本），
+    渲染时附加 process 标签；本进程的样本不带 process 标签
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._processes: Dict[str, Dict[LabelValues, float]] = {}
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def merge(self, values: Dict[LabelValues, object], process: str = ""):
+        """记录进程 process 回传的样本（替换该进程上次回传的值）"""
+        with self._lock:
+            self._processes[process] = {key: float(value) for key, value in values.items()}
+
+    def get(self, process: Optional[str] = None, **labels: str) -> float:
+        """本进程的值；指定 process 时返回该进程最近回传的值"""
+        key = self._key(labels)
+        with self._lock:
+            values = self._values if process is None else self._processes.get(process, {})
+            return values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            merged = [(process, list(values.items())) for process, values in self._processes.items()]
+        for process, items in merged:
+            for key, value in items:
+                labels = _format_labels(self.labelnames, key, ("process", _escape(process)))
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+            self._processes.clear()
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """记录代码块耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, values: Dict[LabelValues, object], process: str = ""):
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = copy.deepcopy(other)
+                    continue
+                state["counts"] = [a + b for a, b in zip(state["counts"], other["counts"])]
+                state["sum"] += other["sum"]
+                state["count"] += other["count"]
+
+    def get_count(self, **labels: str) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state["count"] if state else 0
+
+    def _render_sample(self, key: LabelValues, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Dict[LabelValues, object]]:
+        """导出全部指标，用于从工作进程回传"""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def drain(self) -> Dict[str, Dict[LabelValues, object]]:
+        """
+        导出全部指标并清零可累加的指标（Counter / Histogram），工作进程每个任务结束时回传增量；
+        Gauge 保留当前值，下次回传时仍是该进程的瞬时值
+        """
+        snapshot = self.snapshot()
+        for metric in self._metrics:
+            if not isinstance(metric, Gauge):
+                metric.reset()
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Dict[LabelValues, object]], process: str = ""):
+        """合并其他进程导出的指标：Counter / Histogram 累加，Gauge 按 process 分别保存"""
+        by_name = {metric.name: metric for metric in self._metrics}
+        for name, values in snapshot.items():
+            metric = by_name.get(name)
+            if metric is not None:
+                metric.merge(values, process)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
+
+
+# -----------------------------
+# Latency histograms
+# -----------------------------
+
+FIND_SIMILAR_CASES_SECONDS = REGISTRY.register(Histogram(
+    "similarity_find_similar_cases_seconds",
+    "Time spent in SimilarityMatcher.find_similar_cases",
+))
+
+GEMINI_CALL_SECONDS = REGISTRY.register(Histogram(
+    "gemini_call_seconds",
+    "Latency of a single Gemini generate_content call by GeminiService method and model",
+    ("method", "model", "outcome"),
+))
+
+SUPABASE_PAGE_FETCH_SECONDS = REGISTRY.register(Histogram(
+    "supabase_page_fetch_seconds",
+    "Latency of a single Supabase page fetch",
+    ("query",),
+))
+
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "gemini_rate_limit_wait_seconds",
+    "Time spent waiting for client-side Gemini rate limit headroom, by model",
+    ("model",),
+))
+
+ANALYSIS_REPORT_SECONDS = REGISTRY.register(Histogram(
+    "analysis_report_seconds",
+    "Total time to generate an analysis report",
+    ("outcome",),
+))
+
+# -----------------------------
+# Counters
+# -----------------------------
+
+RETRIES_TOTAL = REGISTRY.register(Counter(
+    "retries_total",
+    "Retries performed, by component and operation",
+    ("component", "operation"),
+))
+
+FALLBACKS_TOTAL = REGISTRY.register(Counter(
+    "fallbacks_total",
+    "Fallbacks taken, by kind (e.g. switching to the next model candidate)",
+    ("kind",),
+))
+
+CACHE_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ("cache", "result"),
+))
+
+SIMILARITY_CANDIDATES_TOTAL = REGISTRY.register(Counter(
+    "similarity_candidates_total",
+    "Cases seen by the two-stage similarity ranker, by stage (scored in full / pruned by bounds)",
+    ("stage",),
+))
+
+PARTIAL_FAILURES_TOTAL = REGISTRY.register(Counter(
+    "analysis_partial_failures_total",
+    "Partial failures recorded in analysis reports, by partial_failures key kind",
+    ("kind",),
+))
+
+# -----------------------------
+# Gauges
+# -----------------------------
+
+ANALYSIS_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "analysis_queue_depth",
+    "Analysis tasks accepted but not yet started",
+))
+
+ANALYSIS_TASKS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "analysis_tasks_in_flight",
+    "Analysis tasks currently being processed",
+))
@@ -0,0 +1,209 @@
+"""
+任务级性能分析
+为单个分析任务挂载采样分析器与结构化 span 追踪，用于定位线上慢请求的耗时分布
+（iterrows、TF-IDF 计算、JSON 解析、网络等待等），无需重新部署
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import FrameType
+from typing import Dict, Iterator, List, Optional
+
+# 单个调用栈最多记录的帧数
+_MAX_STACK_DEPTH = 64
+
+
+class StackSampler:
+    """
+    后台线程按固定间隔采样指定线程的调用栈，输出折叠栈（collapsed stacks）。
+    线程池线程只在本任务的 span 执行期间采样；共用的事件循环线程只记录调用栈中包含本任务协程的样本
+    """
+
+    def __init__(self, interval_seconds: float = 0.01):
+        self.interval_seconds = interval_seconds
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        # 线程 -> 登记次数（嵌套 span 重复登记，全部结束后停止采样）
+        self._watched: Dict[int, int] = {}
+        # 线程 -> 样本必须包含的帧
+        self._required_frames: Dict[int, FrameType] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch_thread(self, thread_id: int, required_frame: Optional[FrameType] = None):
+        """开始采样线程；指定 required_frame 时只记录调用栈中包含该帧的样本"""
+        with self._lock:
+            self._watched[thread_id] = self._watched.get(thread_id, 0) + 1
+            if required_frame is not None:
+                self._required_frames[thread_id] = required_frame
+
+    def unwatch_thread(self, thread_id: int):
+        with self._lock:
+            count = self._watched.get(thread_id, 0) - 1
+            if count > 0:
+                self._watched[thread_id] = count
+            else:
+                self._watched.pop(thread_id, None)
+                self._required_frames.pop(thread_id, None)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_seconds):
+            with self._lock:
+                thread_ids = list(self._watched)
+                required_frames = dict(self._required_frames)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                required = required_frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    if frame is required:
+                        required = None
+                    if len(stack) < _MAX_STACK_DEPTH:
+                        code = frame.f_code
+                        name = getattr(code, "co_qualname", code.co_name)
+                        stack.append(f"{name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    elif required is None:
+                        break
+                    frame = frame.f_back
+                if required is not None:
+                    # 事件循环此刻在执行其他请求的协程
+                    continue
+                self.samples[";".join(reversed(stack))] += 1
+                self.sample_count += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class TaskProfile:
+    """单个任务的性能分析结果：span 列表 + 采样调用栈"""
+
+    def __init__(self, task_id: str, sample_interval_seconds: float = 0.01):
+        self.task_id = task_id
+        self.sampler = StackSampler(sample_interval_seconds)
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+        self._next_span_id = 0
+        self._started_at = time.perf_counter()
+        self._duration: Optional[float] = None
+
+    def new_span_id(self) -> int:
+        with self._lock:
+            self._next_span_id += 1
+            return self._next_span_id
+
+    def add_span(self, record: Dict):
+        with self._lock:
+            self.spans.append(record)
+
+    def offset_ms(self, timestamp: float) -> float:
+        return (timestamp - self._started_at) * 1000
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        self._duration = time.perf_counter() - self._started_at
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "task_id": self.task_id,
+            "duration_ms": (self._duration or 0.0) * 1000,
+            "sample_interval_ms": self.sampler.interval_seconds * 1000,
+            "sample_count": self.sampler.sample_count,
+            "spans": spans,
+            "collapsed_stacks": self.sampler.collapsed(),
+        }
+
+
+_current_profile: ContextVar[Optional[TaskProfile]] = ContextVar("task_profile", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("task_profile_span", default=None)
+
+
+def _task_root_frame() -> Optional[FrameType]:
+    """当前 asyncio 任务最外层协程的帧；不在事件循环中运行时为 None"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return None
+    if task is None:
+        return None
+    return getattr(task.get_coro(), "cr_frame", None)
+
+
+@contextmanager
+def profiling(profile: Optional[TaskProfile]) -> Iterator[Optional[TaskProfile]]:
+    """在当前上下文中启用任务性能分析；profile 为 None 时不做任何事"""
+    if profile is None:
+        yield None
+        return
+    reset = _current_profile.set(profile)
+    thread_id = threading.get_ident()
+    profile.sampler.watch_thread(thread_id, _task_root_frame())
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        profile.sampler.unwatch_thread(thread_id)
+        _current_profile.reset(reset)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """记录一个追踪区间；未启用性能分析时开销可忽略"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    span_id = profile.new_span_id()
+    parent_id = _current_span.get()
+    reset = _current_span.set(span_id)
+    thread_id = threading.get_ident()
+    # 线程池中执行的代码也纳入采样，span 结束后该线程可能转而执行其他请求，不再采样
+    profile.sampler.watch_thread(thread_id)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        profile.sampler.unwatch_thread(thread_id)
+        _current_span.reset(reset)
+        record = {
+            "id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "start_ms": profile.offset_ms(started),
+            "duration_ms": (time.perf_counter() - started) * 1000,
+            "thread_id": thread_id,
+        }
+        if attributes:
+            record["attributes"] = attributes
+        if error:
+            record["error"] = error
+        profile.add_span(record)
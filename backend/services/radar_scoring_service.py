@@ -2,81 +2,39 @@
 雷达图评分服务
 根据用户背景信息计算五大维度的能力得分
 """
+import asyncio
+import hashlib
 import logging
 import re
+import unicodedata
 from typing import List, Optional, Dict, Any
+from anyio import to_thread
 from models.schemas import UserBackground
 from services.gemini_service import GeminiService
+from services.cancellation import TaskCancelled
+from services.experience_scorer import ExperienceScorer, get_experience_scorer
+from services.lru import LRUCache
+from services.university_lookup import UniversityLookup, get_university_lookup
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class RadarScoringService:
     """雷达图评分服务"""
     
-    def __init__(self):
-        self.gemini_service = GeminiService()
+    def __init__(self, gemini_service: Optional[GeminiService] = None,
+                 experience_scorer: Optional[ExperienceScorer] = None,
+                 university_lookup: Optional[UniversityLookup] = None):
+        self.gemini_service = gemini_service or GeminiService()
+        # 本地启发式评分作为快速路径，置信度不足时才调用大模型
+        self.experience_scorer = experience_scorer or get_experience_scorer()
+        self.experience_scorer_mode = settings.EXPERIENCE_SCORER_MODE
+        self.experience_scorer_min_confidence = settings.EXPERIENCE_SCORER_MIN_CONFIDENCE
+        # 经历评分缓存：键为 (经历类型, 规范化文本哈希)，相同经历重复提交时不再调用大模型
+        self.experience_score_cache = LRUCache("radar_experience_score", settings.RADAR_SCORE_CACHE_SIZE)
         
-        # 院校分层数据
-        self.university_tiers = {
-            # Tier 0 (99-100分): 清华、北大
-            "tier_0": {
-                "score_range": (99, 100),
-                "universities": ["清华大学", "北京大学"]
-            },
-            
-            # Tier 1 (95-98分): 顶尖院校
-            "tier_1": {
-                "score_range": (95, 98),
-                "universities": [
-                    "北京航空航天大学", "北京理工大学", "中国人民大学", "哈尔滨工业大学",
-                    "复旦大学", "南京大学", "浙江大学", "中国科学技术大学",
-                    "上海交通大学", "西安交通大学"
-                ]
-            },
-            
-            # Tier 2 (85-94分): 优秀院校
-            "tier_2": {
-                "score_range": (85, 94),
-                "universities": [
-                    "中国农业大学", "南开大学", "北京师范大学", "天津大学", "吉林大学",
-                    "大连理工大学", "同济大学", "东北大学", "华东师范大学", "东南大学",
-                    "厦门大学", "山东大学", "中国海洋大学", "武汉大学", "华中科技大学",
-                    "湖南大学", "中南大学", "国防科学技术大学", "中山大学", "华南理工大学",
-                    "四川大学", "电子科技大学", "重庆大学", "西北工业大学", "西北农林科技大学",
-                    "兰州大学", "中央民族大学", "南方科技大学", "深圳大学", "上海财经大学",
-                    "对外经济贸易大学", "中央财经大学", "中国政法大学", "西安电子科技大学",
-                    "北京邮电大学", "南京航空航天大学", "南京理工大学", "西南财经大学",
-                    "华中师范大学", "中国科学院大学", "首都医科大学", "东北财经大学", "上海科技大学"
-                ]
-            },
-            
-            # Tier 3 (75-84分): 良好院校
-            "tier_3": {
-                "score_range": (75, 84),
-                "universities": [
-                    "北京交通大学", "北京工业大学", "北京科技大学", "北京化工大学", "北京林业大学",
-                    "中国传媒大学", "中央音乐学院", "北京中医药大学", "北京外国语大学",
-                    "中国地质大学(北京)", "中国矿业大学(北京)", "中国石油大学(北京)", "华北电力大学",
-                    "北京体育大学", "上海外国语大学", "上海大学", "东华大学", "华东理工大学",
-                    "第二军医大学", "天津医科大学", "苏州大学", "中国矿业大学", "南京邮电大学",
-                    "河海大学", "江南大学", "南京农业大学", "南京师范大学", "中国药科大学",
-                    "西北大学", "长安大学", "陕西师范大学", "第四军医大学", "武汉理工大学",
-                    "中南财经政法大学", "华中农业大学", "中国地质大学(武汉)", "西南交通大学",
-                    "四川农业大学", "哈尔滨工程大学", "东北林业大学", "东北农业大学", "辽宁大学",
-                    "大连海事大学", "东北师范大学", "延边大学", "暨南大学", "华南师范大学",
-                    "湖南师范大学", "安徽大学", "合肥工业大学", "河北工业大学", "郑州大学",
-                    "中国石油大学(华东)", "新疆大学", "石河子大学", "云南大学", "广西大学",
-                    "贵州大学", "海南大学", "内蒙古大学", "南昌大学", "宁夏大学", "青海大学",
-                    "太原理工大学", "西藏大学", "福州大学"
-                ]
-            },
-            
-            # Tier 4 (60-74分): 普通本科
-            "tier_4": {
-                "score_range": (60, 74),
-                "universities": []  # 其他所有本科院校
-            }
-        }
+        # 院校分层数据：与相似度匹配共用 config/university_tiers.json 构建的查找表
+        self.university_lookup = university_lookup or get_university_lookup()
         
         # 语言考试评分标准
         self.language_scoring = {
@@ -114,7 +72,7 @@ class RadarScoringService:
             }
         }
     
-    def calculate_radar_scores(self, user_background: UserBackground) -> List[int]:
+    async def calculate_radar_scores(self, user_background: UserBackground) -> List[int]:
         """
         计算雷达图五项能力得分
         返回: [学术能力, 语言能力, 科研背景, 实习背景, 院校背景]
@@ -130,12 +88,12 @@ class RadarScoringService:
             language_score = self._calculate_language_score(user_background)
             logger.info(f"语言能力得分: {language_score}")
             
-            # 3. 科研背景评分
-            research_score = self._calculate_research_score(user_background)
+            # 3/4. 科研与实习背景评分（两次大模型评估在线程池中并发执行，不阻塞事件循环）
+            research_score, internship_score = await asyncio.gather(
+                self._calculate_research_score(user_background),
+                self._calculate_internship_score(user_background),
+            )
             logger.info(f"科研背景得分: {research_score}")
-            
-            # 4. 实习背景评分
-            internship_score = self._calculate_internship_score(user_background)
             logger.info(f"实习背景得分: {internship_score}")
             
             # 5. 院校背景评分
@@ -147,6 +105,8 @@ class RadarScoringService:
             
             return scores
             
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error(f"计算雷达图评分失败: {str(e)}")
             # 返回默认分数，避免系统崩溃
@@ -236,7 +196,7 @@ class RadarScoringService:
         
         return 50
     
-    def _calculate_research_score(self, user_background: UserBackground) -> int:
+    async def _calculate_research_score(self, user_background: UserBackground) -> int:
         """计算科研背景得分"""
         try:
             if not user_background.research_experiences:
@@ -248,8 +208,10 @@ class RadarScoringService:
             if not research_text.strip():
                 return 30
             
-            # 使用Gemini评估科研背景质量
-            research_score = self.gemini_service.evaluate_research_experience(research_text)
+            # 使用Gemini评估科研背景质量（按规范化文本缓存）
+            research_score = await self._evaluate_experience(
+                "research", research_text, self.gemini_service.evaluate_research_experience
+            )
             
             # 基础保底分50分，然后根据LLM评估结果调整
             base_score = 50
@@ -257,11 +219,13 @@ class RadarScoringService:
             
             return min(100, final_score)
             
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error(f"计算科研背景得分失败: {str(e)}")
             return 40
     
-    def _calculate_internship_score(self, user_background: UserBackground) -> int:
+    async def _calculate_internship_score(self, user_background: UserBackground) -> int:
         """计算实习背景得分"""
         try:
             if not user_background.internship_experiences:
@@ -273,8 +237,10 @@ class RadarScoringService:
             if not internship_text.strip():
                 return 30
             
-            # 使用Gemini评估实习背景质量
-            internship_score = self.gemini_service.evaluate_internship_experience(internship_text)
+            # 使用Gemini评估实习背景质量（按规范化文本缓存）
+            internship_score = await self._evaluate_experience(
+                "internship", internship_text, self.gemini_service.evaluate_internship_experience
+            )
             
             # 基础保底分50分，然后根据LLM评估结果调整
             base_score = 50
@@ -282,25 +248,56 @@ class RadarScoringService:
             
             return min(100, final_score)
             
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error(f"计算实习背景得分失败: {str(e)}")
             return 40
     
+    async def _evaluate_experience(self, kind: str, text: str, evaluate) -> int:
+        """
+        评估经历文本：优先使用本地启发式评分，置信度不足时调用大模型。
+        本地评分与大模型的成功评分都按规范化文本哈希缓存，大模型评分同时记录为校准标注样本；
+        大模型失败时返回本地评分（或50）且不缓存
+        """
+        key = (kind, self._experience_digest(text))
+        cached = self.experience_score_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        local = None
+        if self.experience_scorer_mode != "llm":
+            local = self.experience_scorer.score(kind, text)
+            if (self.experience_scorer_mode == "heuristic_only"
+                    or local.confidence >= self.experience_scorer_min_confidence):
+                self.experience_score_cache.put(key, local.score)
+                return local.score
+        
+        score = await to_thread.run_sync(lambda: evaluate(text, fallback=None), abandon_on_cancel=True)
+        if score is None:
+            return local.score if local is not None else 50
+        self.experience_score_cache.put(key, score)
+        if local is not None:
+            self.experience_scorer.record_label(kind, local.raw_score, score)
+        return score
+    
+    @staticmethod
+    def _experience_digest(text: str) -> str:
+        """规范化经历文本（全半角、大小写、空白）后取哈希，使等价的提交命中同一缓存项"""
+        normalized = unicodedata.normalize("NFKC", text).lower()
+        normalized = re.sub(r"\s+", " ", normalized).strip()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    
     def _calculate_university_score(self, user_background: UserBackground) -> int:
         """计算院校背景得分"""
         try:
             university_name = user_background.undergraduate_university
             
-            # 查找院校所属层级
-            for tier_name, tier_info in self.university_tiers.items():
-                if university_name in tier_info["universities"]:
-                    score_range = tier_info["score_range"]
-                    # 返回范围中位数
-                    return int((score_range[0] + score_range[1]) / 2)
-            
-            # 如果没有找到，默认为Tier 4（普通本科）
-            tier_4_range = self.university_tiers["tier_4"]["score_range"]
-            return int((tier_4_range[0] + tier_4_range[1]) / 2)
+            # 查找院校所属层级，未收录的院校默认为Tier 4（普通本科）
+            tier = self.university_lookup.tier_of(university_name)
+            score_range = self.university_lookup.score_range(tier)
+            # 返回范围中位数
+            return int((score_range[0] + score_range[1]) / 2)
             
         except Exception as e:
             logger.error(f"计算院校背景得分失败: {str(e)}")
@@ -0,0 +1,199 @@
+"""
+大模型调用的客户端限流
+按模型维护 RPM/TPM 两个令牌桶，调用前先申请配额：有余量立即放行，否则在后续候选模型
+有余量时改用该模型，都没有余量时等待补充，从而把吞吐稳定在配额上限而不是等到 429 再重试。
+令牌桶状态默认保存在进程内；使用分析进程池时可通过 Manager 共享给所有工作进程
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config.settings import settings
+from services.cancellation import cancellable_sleep
+from services.metrics import RATE_LIMIT_WAIT_SECONDS, FALLBACKS_TOTAL
+from services.profiling import span
+
+logger = logging.getLogger(__name__)
+
+# 单次等待的最长间隔（秒），等待期间定期重新检查其他候选模型是否有余量
+_MAX_SLEEP_SLICE = 1.0
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计文本的 token 数：中日韩字符按每字 1 个计，其余字符按每 4 个字符 1 个计"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '\u3000' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af' or '\uff00' <= ch <= '\uffef')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ModelQuota:
+    """单个模型的配额（每分钟请求数、每分钟 token 数，0 表示不限制）"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = rpm
+        self.tpm = tpm
+
+
+def parse_quotas(spec: str) -> Dict[str, ModelQuota]:
+    """解析 "模型名:RPM:TPM,..." 格式的配额配置"""
+    quotas: Dict[str, ModelQuota] = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            name, rpm, tpm = item.rsplit(":", 2)
+            quotas[name.strip()] = ModelQuota(float(rpm), float(tpm))
+        except ValueError:
+            logger.warning(f"Ignoring malformed rate limit entry: {item}")
+    return quotas
+
+
+class BucketStore:
+    """令牌桶状态存储；state/lock 可替换为 Manager 提供的代理以在多个进程间共享"""
+
+    def __init__(self, state=None, lock=None):
+        self._state = state if state is not None else {}
+        self._lock = lock if lock is not None else threading.Lock()
+
+    def _level(self, key: str, capacity: float, rate: float, now: float) -> float:
+        entry = self._state.get(key)
+        if entry is None:
+            return capacity
+        tokens, updated_at = entry
+        return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+    def take(self, buckets: Sequence[Tuple[str, float, float, float]], now: float, commit: bool = True) -> float:
+        """
+        原子地从多个桶中扣除令牌，buckets 为 (key, amount, capacity, rate_per_second)。
+        全部桶都有余量时扣除（commit=True）并返回 0，否则不扣除并返回还需等待的秒数
+        """
+        with self._lock:
+            levels = [self._level(key, capacity, rate, now) for key, _, capacity, rate in buckets]
+            wait = 0.0
+            for (key, amount, capacity, rate), level in zip(buckets, levels):
+                if level < amount:
+                    wait = max(wait, (amount - level) / rate)
+            if wait == 0.0 and commit:
+                for (key, amount, _, _), level in zip(buckets, levels):
+                    self._state[key] = (level - amount, now)
+            return wait
+
+    def adjust(self, key: str, delta: float, capacity: float, rate: float, now: float):
+        """按实际用量修正桶内令牌（delta 为正表示归还，可使余量暂时为负）"""
+        with self._lock:
+            self._state[key] = (min(capacity, self._level(key, capacity, rate, now) + delta), now)
+
+    def drain(self, key: str, now: float):
+        """清空令牌桶（服务端已返回限流错误时使用）"""
+        with self._lock:
+            self._state[key] = (0.0, now)
+
+
+class RateLimiter:
+    """按模型限流的令牌桶集合"""
+
+    def __init__(self, quotas: Dict[str, ModelQuota], max_wait_seconds: float = 60.0,
+                 store: Optional[BucketStore] = None, enabled: bool = True):
+        self.quotas = quotas
+        self.max_wait_seconds = max_wait_seconds
+        self.store = store or BucketStore()
+        self.enabled = enabled
+
+    @classmethod
+    def from_settings(cls) -> "RateLimiter":
+        return cls(
+            parse_quotas(settings.GEMINI_RATE_LIMITS),
+            max_wait_seconds=settings.GEMINI_RATE_LIMIT_MAX_WAIT_SECONDS,
+            enabled=settings.GEMINI_RATE_LIMIT_ENABLED,
+        )
+
+    def _buckets(self, model_name: str, tokens: int) -> List[Tuple[str, float, float, float]]:
+        quota = self.quotas.get(model_name) if self.enabled else None
+        if quota is None:
+            return []
+        buckets = []
+        if quota.rpm > 0:
+            buckets.append((f"{model_name}:requests", 1, quota.rpm, quota.rpm / 60.0))
+        if quota.tpm > 0:
+            # 超过桶容量的请求按容量计，否则永远无法放行
+            buckets.append((f"{model_name}:tokens", min(tokens, quota.tpm), quota.tpm, quota.tpm / 60.0))
+        return buckets
+
+    def has_headroom(self, model_name: str, tokens: int) -> bool:
+        buckets = self._buckets(model_name, tokens)
+        return not buckets or self.store.take(buckets, time.time(), commit=False) == 0.0
+
+    def try_acquire(self, model_name: str, tokens: int) -> float:
+        """非阻塞申请配额：成功返回 0，否则返回还需等待的秒数"""
+        buckets = self._buckets(model_name, tokens)
+        if not buckets:
+            return 0.0
+        return self.store.take(buckets, time.time())
+
+    def acquire(self, model_name: str, tokens: int, alternatives: Sequence[str] = ()) -> bool:
+        """
+        为一次调用申请配额。返回 True 表示可以调用该模型；返回 False 表示应改用下一个
+        候选模型（某个后续候选当前有余量，或等待超过 max_wait_seconds）
+        """
+        wait = self.try_acquire(model_name, tokens)
+        if wait == 0.0:
+            return True
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.max_wait_seconds
+        with span("gemini.rate_limit_wait", model=model_name, tokens=tokens):
+            while wait > 0.0:
+                if any(self.has_headroom(name, tokens) for name in alternatives):
+                    FALLBACKS_TOTAL.inc(kind="gemini_rate_limit_route")
+                    logger.info(f"Rate limit reached for {model_name}, routing to a candidate with headroom")
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Rate limit wait for {model_name} exceeded {self.max_wait_seconds}s")
+                    return False
+                cancellable_sleep(min(wait, remaining, _MAX_SLEEP_SLICE))
+                wait = self.try_acquire(model_name, tokens)
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - started, model=model_name)
+        return True
+
+    def record_usage(self, model_name: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """用响应中的实际 token 数修正调用前的估计值"""
+        quota = self.quotas.get(model_name) if self.enabled else None
+        if quota is None or quota.tpm <= 0 or not isinstance(actual_tokens, int) or actual_tokens <= 0:
+            return
+        delta = min(estimated_tokens, quota.tpm) - actual_tokens
+        if delta:
+            self.store.adjust(f"{model_name}:tokens", delta, quota.tpm, quota.tpm / 60.0, time.time())
+
+    def report_throttled(self, model_name: str):
+        """服务端返回 429 时清空该模型的请求桶，使后续调用等待补充或改用其他模型"""
+        quota = self.quotas.get(model_name) if self.enabled else None
+        if quota is None or quota.rpm <= 0:
+            return
+        self.store.drain(f"{model_name}:requests", time.time())
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取进程内共享的限流器（首次调用时按配置创建）"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter.from_settings()
+    return _limiter
+
+
+def share_rate_limit_state(state, lock):
+    """让本进程的限流器改用跨进程共享的令牌桶状态（Manager 的 dict 与 Lock 代理）"""
+    get_rate_limiter().store = BucketStore(state, lock)
+
+
+def use_local_rate_limit_state():
+    """恢复为进程内的令牌桶状态（共享状态所在的 Manager 关闭前调用）"""
+    get_rate_limiter().store = BucketStore()
@@ -3,6 +3,8 @@ import inspect
 import random
 from typing import Any, Awaitable, Callable, Iterable, Tuple
 from anyio import to_thread
+from services.cancellation import raise_if_cancelled
+from services.metrics import RETRIES_TOTAL
 
 
 async def async_retry_full_jitter(
@@ -24,6 +26,8 @@ async def async_retry_full_jitter(
     - Retries only on provided `exceptions` types
     - Supports both sync and async callables; sync ones are executed via thread pool
     - Does not sleep on the final failed attempt
+    - Stops retrying once the current task is cancelled; thread-offloaded calls
+      are abandoned on cancellation so the awaiting task is released immediately
     """
 
     if max_attempts < 1:
@@ -31,15 +35,17 @@ async def async_retry_full_jitter(
 
     attempt = 0
     while True:
+        raise_if_cancelled()
         try:
             if inspect.iscoroutinefunction(func):
                 return await func(*args, **kwargs)
             # run sync in thread to avoid blocking event loop
-            return await to_thread.run_sync(lambda: func(*args, **kwargs))
+            return await to_thread.run_sync(lambda: func(*args, **kwargs), abandon_on_cancel=True)
         except exceptions as exc:  # type: ignore[misc]
             attempt += 1
             if attempt >= max_attempts:
                 raise
+            RETRIES_TOTAL.inc(component="analysis", operation=getattr(func, "__name__", "call"))
             backoff = min(max_backoff, base ** attempt)
             delay = rng() * backoff
             # ensure non-negative delay even if rng misbehaves
@@ -1,34 +1,255 @@
 import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Tuple, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, NamedTuple, Tuple, Optional
 import logging
+import threading
+import uuid
 from models.schemas import UserBackground
 from services.university_scoring_service import UniversityScoringService
+from services.major_classifier import MajorMatch, get_major_classifier
+from services.major_relatedness import MajorKey, get_major_relatedness
 from services.supabase_service import SupabaseService
+from services.case_index import CaseIndex
+from services.experience_features import HashedExperienceFeaturizer
+from services.lru import LRUCache
+from services.metrics import FIND_SIMILAR_CASES_SECONDS, SIMILARITY_CANDIDATES_TOTAL
+from services.profiling import span
+from services.startup import lazy_import
 from config.settings import settings
 
+# pandas 与 scikit-learn 导入较慢，在首次加载案例数据时才导入
+pd = lazy_import("pandas")
+
 logger = logging.getLogger(__name__)
 
-class SimilarityMatcher:
-    def __init__(self):
-        self.tfidf_vectorizer = TfidfVectorizer(
-            max_features=1000,
-            analyzer='char_wb',
-            ngram_range=(2, 4)
+# 院校层级对应的等级，未知层级按最低一级处理
+TIER_LEVELS = {
+    'Tier 0': 5,
+    'Tier 1': 4,
+    'Tier 2': 3,
+    'Tier 3': 2,
+    'Tier 4': 1
+}
+
+# 层级等级差 0/1/2/3+ 对应的相似度
+_TIER_DIFF_SIMILARITY = np.array([1.0, 0.7, 0.4, 0.1])
+
+# Weighted total similarity
+SIMILARITY_WEIGHTS = {
+    'major': 0.25,      # Highest weight for major relevance
+    'gpa': 0.25,       # Academic performance
+    'tier': 0.4,       # University prestige
+    'language': 0.05,  # Language ability
+    'experience': 0.05  # Experience background
+}
+
+# ANN 索引中 GPA 的分桶中心：0 号桶表示 GPA 缺失，其余按 0.25 分一档
+GPA_BIN_CENTERS = np.concatenate([[0.0], np.arange(0.0, 4.001, 0.25)])
+
+# ANN 索引中经历文本向量降维后的维数
+_EXPERIENCE_COMPONENTS = 32
+
+# 两阶段排序的分桶：GPA 按 0.1 分一档（0 号桶为 GPA 缺失）
+_GPA_BUCKET_WIDTH = 0.1
+# 剪枝比较上下界时的容差，避免浮点舍入把恰好等于阈值的案例剪掉
+_PRUNING_TOLERANCE = 1e-9
+
+# 参与评分的案例数组（其余数组仅用于排序与剪枝）
+_SCORING_COLUMNS = ('gpa', 'tier_level', 'major_code', 'language_score', 'language_type')
+
+# 按需加载模式下全量快照在最近使用记录中的键
+_ALL_COUNTRIES = '*'
+
+class SimilarityQuery(NamedTuple):
+    """相似度计算的全部输入（已规范化，含数据快照标识），相同输入得到相同排序"""
+    snapshot_id: str
+    tier: str
+    major: MajorKey
+    gpa: float
+    language_score: float
+    language_type: str
+    experience_text: str
+    target_countries: Tuple[str, ...]
+    target_degree_type: str
+
+
+class PruningStats(NamedTuple):
+    """两阶段排序的剪枝统计：过滤后的候选数、完整计算的案例数与被剪枝的案例数"""
+    candidates: int
+    scored: int
+    pruned: int
+
+
+class SimilarityRanking(NamedTuple):
+    """
+    一次查询的排序：所属数据快照、案例位置、总分与各分项得分（均按总分降序）。
+    指定名次上限计算时只包含前若干名（partial），否则为完整排序。
+    缓存中的排序不引用案例表（cases_df 为 None），rank_cases 返回时才绑定所属快照的案例表
+    """
+    snapshot_id: str
+    cases_df: Optional["pd.DataFrame"]
+    positions: np.ndarray
+    scores: np.ndarray
+    components: Dict[str, np.ndarray]
+    pruning: Optional[PruningStats] = None
+    truncated: bool = False
+    
+    @property
+    def partial(self) -> bool:
+        return self.truncated
+    
+    @property
+    def nbytes(self) -> int:
+        return (self.positions.nbytes + self.scores.nbytes
+                + sum(values.nbytes for values in self.components.values()))
+
+
+class CaseShard(NamedTuple):
+    """
+    一个 (录取国家, 学位类型) 分片：在案例表中的连续区间 [start, stop)，
+    以及该区间的特征数组与经历向量（均为全表数据的视图，不复制）
+    """
+    country: str
+    degree_type: str
+    start: int
+    stop: int
+    arrays: Dict[str, np.ndarray]
+    experience_vectors: Optional[object]
+
+
+class CaseSnapshot(NamedTuple):
+    """
+    一次加载得到的不可变数据快照：案例表以及由它构建的特征数组、分桶、经历向量、分片与 ANN 索引。
+    加载、刷新或按需加载国家时构建新的快照并以一次赋值切换；查询开始时取得快照，之后只读取该快照
+    """
+    snapshot_id: str
+    data_version: int
+    cases_df: "pd.DataFrame"
+    arrays: Dict[str, np.ndarray]
+    buckets: Dict[str, np.ndarray]
+    # 经历文本向量及其特征器（tfidf 为 TfidfVectorizer，hashing 为该快照独有的 HashedExperienceFeaturizer）
+    experience_vectors: Optional[object]
+    featurizer: Optional[object]
+    # 分片模式下的分片与分片重排前的原始加载顺序
+    shards: Optional[List[CaseShard]]
+    load_order: Optional[np.ndarray]
+    case_index: Optional[CaseIndex]
+    experience_projection: Optional[object]
+    # 各 (录取国家, 学位类型) 的案例数
+    group_counts: Dict[Tuple[str, str], int]
+    # 按需加载模式下快照包含的国家（没有案例的国家也计入）；包含全部国家时为 None
+    countries: Optional[frozenset] = None
+    
+    def has_cases(self, countries: List[str], degree_type: str) -> bool:
+        """快照中是否有满足目标国家与学位类型过滤条件的案例"""
+        return any(
+            count and country in countries and (not degree_type or degree == degree_type)
+            for (country, degree), count in self.group_counts.items()
         )
-        self.experience_vectors = None
-        self.cases_df = None
+
+
+_shard_executor: Optional[ThreadPoolExecutor] = None
+_shard_executor_lock = threading.Lock()
+
+
+def get_shard_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的分片计算线程池（首次使用时创建）"""
+    global _shard_executor
+    if _shard_executor is None:
+        with _shard_executor_lock:
+            if _shard_executor is None:
+                _shard_executor = ThreadPoolExecutor(
+                    max_workers=settings.SIMILARITY_SHARD_WORKERS, thread_name_prefix="similarity-shard"
+                )
+    return _shard_executor
+
+
+class SimilarityMatcher:
+    def __init__(self, supabase_service: Optional[SupabaseService] = None):
+        # 经历文本特征：tfidf（每次加载重新拟合词表）或 hashing（特征哈希，增量维护 IDF）
+        self.experience_features = settings.SIMILARITY_EXPERIENCE_FEATURES
+        # hashing 模式下上次构建快照时的特征器（记录已计入的案例及其词频行），刷新时复用未变化的行
+        self._experience_featurizer: Optional[HashedExperienceFeaturizer] = None
         self.university_scoring_service = UniversityScoringService()
-        self.supabase_service = SupabaseService()
+        self.major_classifier = get_major_classifier()
+        self.major_relatedness = get_major_relatedness(self.major_classifier.default_category)
+        # 当前数据快照（查询开始时取得，加载完成后以一次赋值切换）
+        self._snapshot: Optional[CaseSnapshot] = None
+        # 案例数据版本，每次构建新快照后递增
+        self.data_version = 0
+        self._ranking_cache = LRUCache(
+            "similarity_ranking", settings.SIMILARITY_RESULT_CACHE_SIZE,
+            max_bytes=settings.SIMILARITY_RESULT_CACHE_MB * 1024 * 1024, sizeof=lambda ranking: ranking.nbytes,
+        )
+        # 检索方式：exact 全量计算；ann 先用 IVF 索引召回候选再精确重排（案例数达到阈值时才构建索引）
+        self.search_mode = settings.SIMILARITY_SEARCH_MODE
+        self.ann_min_cases = settings.SIMILARITY_ANN_MIN_CASES
+        self.ann_candidates = settings.SIMILARITY_ANN_CANDIDATES
+        self.ann_nprobe = settings.SIMILARITY_ANN_NPROBE
+        # 按 (录取国家, 学位类型) 分片：查询只计算目标分片，多个分片并发计算（ANN 模式下不分片）
+        self.sharding = settings.SIMILARITY_SHARDING
+        # 两阶段排序：先按分桶的分数上下界剪掉不可能进入前 N 名的案例，再对剩余案例完整计算
+        self.pruning = settings.SIMILARITY_PRUNING
+        # 案例表使用紧凑的列式表示（category 编码、缩小的数值类型），按行取出的值不变
+        self.compact_cases = settings.SIMILARITY_COMPACT_CASES
+        # 流式加载：逐页读取并直接写入列缓冲区，加载峰值内存约为最终数据的一份
+        self.streaming_load = settings.SIMILARITY_STREAMING_LOAD
+        # 按需加载：只下载并索引查询目标国家的案例，常驻内存超过预算时淘汰最久未使用的国家
+        self.lazy_countries = settings.SIMILARITY_LAZY_COUNTRIES
+        self.preload_countries: List[str] = list(settings.SIMILARITY_PRELOAD_COUNTRIES)
+        self.memory_budget_bytes = settings.SIMILARITY_MEMORY_BUDGET_MB * 1024 * 1024
+        # 已加载的国家与全量快照（键为 _ALL_COUNTRIES），最久未使用的在前；没有案例的国家也登记，避免重复查询
+        self._country_usage: "OrderedDict[str, None]" = OrderedDict()
+        self._usage_lock = threading.Lock()
+        # 按需加载模式下未指定目标国家（或目标国家都没有案例）的查询使用的全量快照，与国家快照一起计入内存预算
+        self._full_snapshot: Optional[CaseSnapshot] = None
+        # 全量快照的标识：淘汰后重新下载的全量快照沿用该标识（分页游标与 ETag 保持有效），刷新时才更换
+        self._full_snapshot_id: Optional[str] = None
+        # 按需加载模式下由全部案例拟合的经历特征（加载与刷新时流式读取一遍全表得到），各快照共用，与常驻国家无关
+        self._lazy_featurizer = None
+        # 构建与切换快照互斥（查询不持有该锁）
+        self._load_lock = threading.RLock()
+        self.supabase_service = supabase_service or SupabaseService()
         self._data_loaded = False
     
+    @property
+    def cases_df(self) -> Optional["pd.DataFrame"]:
+        snapshot = self._snapshot
+        return snapshot.cases_df if snapshot is not None else None
+    
+    @property
+    def experience_vectors(self):
+        snapshot = self._snapshot
+        return snapshot.experience_vectors if snapshot is not None else None
+    
+    @property
+    def tfidf_vectorizer(self):
+        snapshot = self._snapshot
+        return snapshot.featurizer if snapshot is not None else None
+    
+    @property
+    def case_index(self) -> Optional[CaseIndex]:
+        snapshot = self._snapshot
+        return snapshot.case_index if snapshot is not None else None
+    
+    @property
+    def snapshot_id(self) -> str:
+        """数据快照标识（每次加载随机生成），用于排序结果缓存键、分页游标与 ETag，进程重启后也不会与旧快照混淆"""
+        snapshot = self._snapshot
+        return snapshot.snapshot_id if snapshot is not None else ""
+    
+    @property
+    def _shards(self) -> Optional[List[CaseShard]]:
+        snapshot = self._snapshot
+        return snapshot.shards if snapshot is not None else None
+    
     def _load_cases(self):
         """Load and prepare cases for similarity matching"""
         try:
             logger.info("Loading cases from Supabase...")
-            self._load_cases_from_supabase()
+            with span("similarity.load_cases"):
+                self._load_cases_from_supabase()
         except Exception as e:
             logger.error(f"Error loading cases: {str(e)}")
             raise Exception(f"数据库连接失败: {str(e)}")
@@ -36,50 +257,477 @@ class SimilarityMatcher:
     def _load_cases_from_supabase(self):
         """Load cases from Supabase"""
         try:
-            cases = self.supabase_service.get_all_cases()
-            
-            # Convert to DataFrame for easier processing
-            cases_data = []
-            for case in cases:
-                cases_data.append({
-                    'id': case.get('id', 0),
-                    'original_id': case.get('original_id', 0),
-                    'gpa_4_scale': case.get('gpa_4_scale', 0.0) or 0.0,
-                    'undergraduate_university_tier': case.get('undergraduate_university_tier', '未知') or '未知',
-                    'undergraduate_major_category': case.get('undergraduate_major_category', 'Other') or 'Other',
-                    'language_total_score': case.get('language_total_score', 0) or 0,
-                    'language_test_type': case.get('language_test_type', '') or '',
-                    'gre_total': case.get('gre_total', 0) or 0,
-                    'gmat_total': case.get('gmat_total', 0) or 0,
-                    'research_experience_count': case.get('research_experience_count', 0) or 0,
-                    'internship_experience_count': case.get('internship_experience_count', 0) or 0,
-                    'work_experience_years': case.get('work_experience_years', 0.0) or 0.0,
-                    'experience_text': case.get('experience_text', '') or '',
-                    'admitted_university': case.get('admitted_university', '') or '',
-                    'admitted_program': case.get('admitted_program', '') or '',
-                    'admitted_country': case.get('admitted_country', '') or '',
-                    'admitted_degree_type': case.get('admitted_degree_type', '') or '',
-                    'undergraduate_university': case.get('undergraduate_university', '') or '',
-                    'undergraduate_major': case.get('undergraduate_major', '') or '',
-                })
-            
-            self.cases_df = pd.DataFrame(cases_data)
-            self._prepare_experience_vectors()
+            from services.case_columns import compact_cases, normalize_case
             
+            if self.lazy_countries:
+                self._reload_countries()
+                return
+            if self.streaming_load:
+                cases_df = self._read_case_pages()
+            else:
+                cases = self.supabase_service.get_all_cases()
+                
+                # Convert to DataFrame for easier processing
+                cases_df = pd.DataFrame([normalize_case(case) for case in cases])
+                del cases
+                if self.compact_cases:
+                    cases_df = compact_cases(cases_df)
+            with self._load_lock:
+                self._install_snapshot(self._build_snapshot(cases_df))
+        
         except Exception as e:
             logger.error(f"Error loading cases from Supabase: {str(e)}")
             raise Exception(f"从Supabase加载案例失败: {str(e)}")
     
-    def _prepare_experience_vectors(self):
-        """Prepare experience text vectors for similarity calculation"""
-        if len(self.cases_df) > 0:
-            experience_texts = self.cases_df['experience_text'].fillna('').tolist()
-            if any(text.strip() for text in experience_texts):
-                self.experience_vectors = self.tfidf_vectorizer.fit_transform(experience_texts)
+    def _build_snapshot(self, cases_df: "pd.DataFrame", countries: Optional[frozenset] = None,
+                        snapshot_id: Optional[str] = None) -> CaseSnapshot:
+        """用案例表构建特征与索引，得到新的数据快照（未指定 snapshot_id 时随机生成；调用方持有 _load_lock）"""
+        featurizer, vectors = self._prepare_experience_vectors(cases_df)
+        cases_df, vectors, load_order, shard_ranges = self._group_by_shard(cases_df, vectors)
+        arrays, buckets = self._prepare_case_arrays(cases_df, load_order)
+        # 国家快照的 ANN 召回结果会随常驻国家变化，按需加载的国家快照始终精确计算
+        case_index, projection = self._build_case_index(arrays, vectors) if countries is None else (None, None)
+        group_counts = {} if cases_df.empty else {
+            (country, degree): int(count)
+            for (country, degree), count in cases_df.groupby(
+                ['admitted_country', 'admitted_degree_type'], observed=True, sort=False
+            ).size().items()
+        }
+        self.data_version += 1
+        return CaseSnapshot(
+            snapshot_id=snapshot_id or f"{uuid.uuid4().hex[:12]}{self.data_version}",
+            data_version=self.data_version,
+            cases_df=cases_df,
+            arrays=arrays,
+            buckets=buckets,
+            experience_vectors=vectors,
+            featurizer=featurizer,
+            shards=self._build_shards(shard_ranges, arrays, vectors),
+            load_order=load_order,
+            case_index=case_index,
+            experience_projection=projection,
+            group_counts=group_counts,
+            countries=countries,
+        )
+    
+    def _install_snapshot(self, snapshot: CaseSnapshot):
+        """切换到新的数据快照（一次赋值），并丢弃不再属于现有快照的缓存排序"""
+        self._snapshot = snapshot
+        self._discard_stale_rankings()
+    
+    def _discard_stale_rankings(self):
+        live = {snapshot.snapshot_id for snapshot in (self._snapshot, self._full_snapshot) if snapshot is not None}
+        self._ranking_cache.discard(lambda query: query.snapshot_id not in live)
+    
+    def _read_case_pages(self, filters: Optional[Dict] = None) -> "pd.DataFrame":
+        """流式加载：逐页写入列缓冲区，不保留完整的原始记录列表"""
+        from services.case_columns import CaseColumnBuilder
+        
+        builder = CaseColumnBuilder()
+        for page in self.supabase_service.iter_case_pages(filters):
+            builder.append(page)
+        logger.info(f"Streamed {builder.size} cases into column buffers")
+        return builder.build(compact=self.compact_cases)
+    
+    def _query_snapshot(self, user_background: UserBackground) -> Optional[CaseSnapshot]:
+        """本次查询使用的数据快照；按需加载模式下先确保目标国家已加载"""
+        self.ensure_data_loaded()
+        if not self.lazy_countries:
+            return self._snapshot
+        wanted = sorted(set(user_background.target_countries or []))
+        if wanted:
+            snapshot = self._ensure_countries(wanted)
+            if snapshot.has_cases(wanted, user_background.target_degree_type or ''):
+                return snapshot
+        # 未指定目标国家，或目标国家没有满足条件的案例（与全量加载一致，回退到全部案例）
+        return self._ensure_full_snapshot()
+    
+    def _ensure_countries(self, wanted: List[str]) -> CaseSnapshot:
+        """按需加载模式：返回包含目标国家的快照，加载了新的国家后按内存预算淘汰最久未使用的其他国家"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.countries is None or not snapshot.countries.issuperset(wanted):
+            with self._load_lock:
+                snapshot = self._snapshot
+                loaded = snapshot.countries if snapshot is not None and snapshot.countries is not None else frozenset()
+                missing = [country for country in wanted if country not in loaded]
+                if missing:
+                    # 只有加载了新的国家时常驻内存才会增长
+                    self._load_countries(missing)
+                    self._enforce_memory_budget(keep=set(wanted))
+                    snapshot = self._snapshot
+        self._touch(wanted)
+        return snapshot
+    
+    def _ensure_full_snapshot(self) -> CaseSnapshot:
+        """
+        按需加载模式下的全量快照（首次需要时构建，刷新时重建）。构建后按内存预算先淘汰最久未使用的国家，
+        全量快照本身超过预算时只供本次查询使用、不常驻，之后的全量查询重新下载
+        """
+        snapshot = self._full_snapshot
+        if snapshot is None:
+            with self._load_lock:
+                snapshot = self._full_snapshot
+                if snapshot is None:
+                    snapshot = self._build_full_snapshot()
+                    self._enforce_memory_budget(keep={_ALL_COUNTRIES})
+        self._touch([_ALL_COUNTRIES])
+        return snapshot
+    
+    def _touch(self, keys: List[str]):
+        """把已加载的国家（或全量快照）标记为最近使用"""
+        with self._usage_lock:
+            for key in keys:
+                if key in self._country_usage:
+                    self._country_usage.move_to_end(key)
+    
+    def _build_full_snapshot(self) -> CaseSnapshot:
+        with span("similarity.load_countries", countries=_ALL_COUNTRIES):
+            cases_df = self._read_case_pages()
+        snapshot = self._build_snapshot(cases_df, snapshot_id=self._full_snapshot_id)
+        self._full_snapshot, self._full_snapshot_id = snapshot, snapshot.snapshot_id
+        self._discard_stale_rankings()
+        with self._usage_lock:
+            self._country_usage.setdefault(_ALL_COUNTRIES, None)
+        logger.info(f"Loaded all countries: {len(cases_df)} cases in the full snapshot")
+        return snapshot
+    
+    def _reload_countries(self):
+        """
+        按需加载模式下的加载与刷新：重新下载已加载的国家（首次加载时为预加载的国家），已构建的全量快照一并重建，
+        数据增长后超出内存预算的部分按最久未使用的顺序淘汰
+        """
+        with self._load_lock:
+            self._lazy_featurizer = self._fit_lazy_featurizer()
+            self._full_snapshot_id = None
+            snapshot = self._snapshot
+            if snapshot is not None:
+                countries = sorted(snapshot.countries)
             else:
-                self.experience_vectors = None
+                countries = sorted(set(self.preload_countries))
+            if countries:
+                with span("similarity.load_countries", countries=",".join(countries)):
+                    fetched = self._read_case_pages({'admitted_country': countries})
+                self._install_snapshot(self._build_snapshot(self._sort_by_country(fetched), frozenset(countries)))
+                with self._usage_lock:
+                    usage = [key for key in self._country_usage if key in countries or key == _ALL_COUNTRIES]
+                    self._country_usage = OrderedDict(
+                        (country, None) for country in [c for c in countries if c not in usage] + usage
+                    )
+            if self._full_snapshot is not None:
+                self._build_full_snapshot()
+            self._enforce_memory_budget(keep=set())
+    
+    def _fit_lazy_featurizer(self):
+        """
+        按需加载模式：逐页读取全部案例，只取经历文本拟合经历特征（其余字段随页丢弃），
+        返回与全量加载相同的特征器；所有文本都为空时返回 None
+        """
+        with span("similarity.fit_experience_features"):
+            if self.experience_features == 'hashing':
+                featurizer = HashedExperienceFeaturizer(settings.SIMILARITY_HASHING_FEATURES,
+                                                        use_idf=settings.SIMILARITY_HASHING_IDF)
+                for page in self.supabase_service.iter_case_pages():
+                    featurizer.partial_fit(featurizer.counts([case.get('experience_text') or '' for case in page]))
+                return featurizer
+            experience_texts = [
+                case.get('experience_text') or ''
+                for page in self.supabase_service.iter_case_pages() for case in page
+            ]
+            if not any(text.strip() for text in experience_texts):
+                return None
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            
+            return TfidfVectorizer(max_features=1000, analyzer='char_wb', ngram_range=(2, 4)).fit(experience_texts)
+    
+    def _load_countries(self, countries: List[str]) -> CaseSnapshot:
+        """
+        下载指定国家的案例（国家过滤条件下推到数据库查询），与已加载的案例合并后构建并切换到新快照。
+        合并表按国家排序，同一组已加载国家得到的表与加载先后无关（调用方持有 _load_lock）
+        """
+        from services.case_columns import compact_cases
+        
+        with span("similarity.load_countries", countries=",".join(countries)):
+            fetched = self._read_case_pages({'admitted_country': countries})
+        
+        current = self._snapshot
+        frames, resident = [fetched], set(countries)
+        if current is not None:
+            resident |= current.countries
+            if len(current.cases_df):
+                frames.insert(0, self._table_in_load_order(current))
+        cases_df = self._sort_by_country(pd.concat(frames, ignore_index=True) if len(frames) > 1 else fetched)
+        snapshot = self._build_snapshot(compact_cases(cases_df) if self.compact_cases else cases_df, frozenset(resident))
+        self._install_snapshot(snapshot)
+        with self._usage_lock:
+            for country in countries:
+                self._country_usage[country] = None
+                self._country_usage.move_to_end(country)
+        logger.info(f"Loaded countries {countries}: {len(snapshot.cases_df)} cases resident")
+        return snapshot
+    
+    @staticmethod
+    def _table_in_load_order(snapshot: CaseSnapshot) -> "pd.DataFrame":
+        """快照的案例表（分片模式下还原为分片重排前的顺序）"""
+        if snapshot.load_order is None:
+            return snapshot.cases_df
+        return snapshot.cases_df.iloc[np.argsort(snapshot.load_order, kind='stable')]
+    
+    @staticmethod
+    def _sort_by_country(cases_df: "pd.DataFrame") -> "pd.DataFrame":
+        countries, _ = pd.factorize(cases_df['admitted_country'], sort=True)
+        return cases_df.iloc[np.argsort(countries, kind='stable')].reset_index(drop=True)
+    
+    @staticmethod
+    def _snapshot_bytes(snapshot: CaseSnapshot) -> int:
+        """快照的案例表、特征数组与经历向量占用的字节数"""
+        from services.case_columns import memory_report
+        
+        total = memory_report(snapshot.cases_df)['bytes'] + sum(values.nbytes for values in snapshot.arrays.values())
+        vectors = snapshot.experience_vectors
+        if vectors is not None:
+            total += vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes
+        return total
+    
+    def _resident_bytes(self) -> int:
+        """常驻快照（国家快照与全量快照）占用的字节数"""
+        return sum(self._snapshot_bytes(snapshot) for snapshot in (self._snapshot, self._full_snapshot)
+                   if snapshot is not None)
+    
+    def _enforce_memory_budget(self, keep: set):
+        """
+        常驻快照超过内存预算时，按最久未使用的顺序淘汰 keep 以外的国家与全量快照（各国家按案例数分摊国家快照的内存）；
+        淘汰其余快照后全量快照本身仍超过预算时也不保留（调用方持有 _load_lock）
+        """
+        snapshot, full = self._snapshot, self._full_snapshot
+        country_bytes = self._snapshot_bytes(snapshot) if snapshot is not None and len(snapshot.cases_df) else 0
+        full_bytes = self._snapshot_bytes(full) if full is not None else 0
+        total = country_bytes + full_bytes
+        if total <= self.memory_budget_bytes:
+            return
+        shares: Dict[str, float] = {_ALL_COUNTRIES: full_bytes}
+        if country_bytes:
+            per_case = country_bytes / len(snapshot.cases_df)
+            for (country, _), count in snapshot.group_counts.items():
+                shares[country] = shares.get(country, 0) + per_case * count
+        resident = set(snapshot.countries) if snapshot is not None else set()
+        if full is not None:
+            resident.add(_ALL_COUNTRIES)
+        with self._usage_lock:
+            usage = list(self._country_usage)
+        evicted = []
+        for key in usage:
+            if total <= self.memory_budget_bytes:
+                break
+            if key not in keep and key in resident:
+                evicted.append(key)
+                total -= shares.get(key, 0)
+        if total > self.memory_budget_bytes and full is not None and _ALL_COUNTRIES not in evicted:
+            # 正在进行的查询仍持有全量快照，用完即释放
+            logger.warning("The full snapshot alone exceeds the similarity memory budget and is not kept")
+            evicted.append(_ALL_COUNTRIES)
+            total -= full_bytes
+        elif total > self.memory_budget_bytes:
+            logger.warning(f"Countries {sorted(keep)} alone exceed the similarity memory budget")
+        if not evicted:
+            return
+        if _ALL_COUNTRIES in evicted:
+            self._full_snapshot = None
+            self._discard_stale_rankings()
+        countries = [key for key in evicted if key != _ALL_COUNTRIES]
+        if countries:
+            cases_df = self._table_in_load_order(snapshot)
+            cases_df = cases_df[~cases_df['admitted_country'].isin(countries)].reset_index(drop=True)
+            self._install_snapshot(self._build_snapshot(cases_df, snapshot.countries.difference(countries)))
+        with self._usage_lock:
+            for key in evicted:
+                self._country_usage.pop(key, None)
+        logger.info(f"Evicted {evicted}: {self._resident_bytes()} bytes resident")
+    
+    def _prepare_experience_vectors(self, cases_df: "pd.DataFrame") -> Tuple[Optional[object], Optional[object]]:
+        """Prepare experience text vectors for similarity calculation, returning (featurizer, vectors)"""
+        featurizer, vectors = None, None
+        if len(cases_df) > 0:
+            experience_texts = cases_df['experience_text'].fillna('').tolist()
+            if self.lazy_countries:
+                # 按需加载：用全部案例拟合的特征器向量化，结果与哪些国家常驻无关
+                featurizer = self._lazy_featurizer
+                if featurizer is not None:
+                    vectors = featurizer.transform(experience_texts)
+            elif self.experience_features == 'hashing':
+                featurizer, vectors = self._prepare_hashed_experience_vectors(cases_df, experience_texts)
+            elif any(text.strip() for text in experience_texts):
+                from sklearn.feature_extraction.text import TfidfVectorizer
+                
+                featurizer = TfidfVectorizer(
+                    max_features=1000,
+                    analyzer='char_wb',
+                    ngram_range=(2, 4)
+                )
+                vectors = featurizer.fit_transform(experience_texts)
         
-        logger.info(f"Loaded {len(self.cases_df)} cases for similarity matching")
+        logger.info(f"Loaded {len(cases_df)} cases for similarity matching")
+        return featurizer, vectors
+    
+    def _prepare_hashed_experience_vectors(self, cases_df: "pd.DataFrame", experience_texts: List[str]):
+        """
+        哈希特征：在上次特征器的副本上同步当前案例（未变化的案例沿用词频行，文档频率恰好对应当前案例），
+        再按同步后的 IDF 对全部案例加权；已有快照的特征器不受影响
+        """
+        if self._experience_featurizer is None:
+            featurizer = HashedExperienceFeaturizer(settings.SIMILARITY_HASHING_FEATURES,
+                                                    use_idf=settings.SIMILARITY_HASHING_IDF)
+        else:
+            featurizer = self._experience_featurizer.copy()
+        counts = featurizer.sync(cases_df['id'].to_numpy(), experience_texts)
+        self._experience_featurizer = featurizer
+        return featurizer, featurizer.weight(counts)
+    
+    def table_memory_report(self) -> Dict:
+        """当前案例表的内存占用（每条案例的字节数，按列细分）"""
+        from services.case_columns import memory_report
+        
+        self.ensure_data_loaded()
+        return memory_report(self.cases_df)
+    
+    def _prepare_case_arrays(self, df: "pd.DataFrame",
+                             load_order: Optional[np.ndarray]) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """预先把相似度计算用到的列转换为 NumPy 数组，查询时按位置整体取用；返回 (案例数组, 分桶)"""
+        major_keys = [
+            self._major_key(category, self.major_classifier.classify(major))
+            for category, major in zip(df['undergraduate_major_category'], df['undergraduate_major'])
+        ]
+        arrays = {
+            'gpa': df['gpa_4_scale'].to_numpy(dtype=float),
+            'tier_level': np.fromiter(
+                (TIER_LEVELS.get(tier, 1) for tier in df['undergraduate_university_tier']), dtype=np.int64, count=len(df)
+            ),
+            'major_code': self.major_relatedness.codes(major_keys),
+            'language_score': df['language_total_score'].to_numpy(dtype=float),
+            'language_type': df['language_test_type'].to_numpy(dtype=object),
+            # 案例在数据源中的原始顺序（分片模式下表按分片重排，合并排序时用它决定同分案例的先后）
+            'load_order': load_order if load_order is not None else np.arange(len(df)),
+        }
+        return arrays, self._prepare_buckets(arrays)
+    
+    @staticmethod
+    def _prepare_buckets(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """两阶段排序的分桶：(院校层级, 专业, GPA 区间) 相同的案例归为一桶，记录桶内 GPA 的范围"""
+        gpa, tier_level, major_code = arrays['gpa'], arrays['tier_level'], arrays['major_code']
+        gpa_bin = np.where(gpa == 0, 0, 1 + np.floor(np.clip(gpa, 0, 4) / _GPA_BUCKET_WIDTH)).astype(np.int64)
+        gpa_bins = int(4 / _GPA_BUCKET_WIDTH) + 2
+        majors = int(np.max(major_code, initial=0)) + 1
+        keys, bucket = np.unique((tier_level * majors + major_code) * gpa_bins + gpa_bin, return_inverse=True)
+        gpa_min = np.full(len(keys), np.inf)
+        gpa_max = np.full(len(keys), -np.inf)
+        np.minimum.at(gpa_min, bucket, gpa)
+        np.maximum.at(gpa_max, bucket, gpa)
+        arrays['bucket'] = bucket.astype(np.int32)
+        return {
+            'tier_level': keys // gpa_bins // majors,
+            'major_code': keys // gpa_bins % majors,
+            'gpa_min': gpa_min,
+            'gpa_max': gpa_max,
+        }
+    
+    def _group_by_shard(self, cases_df: "pd.DataFrame", vectors):
+        """
+        分片模式：按 (录取国家, 学位类型) 稳定重排案例表与经历向量，使每个分片在表中连续。
+        经历向量按原始顺序构建后再重排（TF-IDF 的词表选取与文档顺序有关）。
+        返回 (重排后的案例表, 经历向量, 原始加载顺序, 分片区间)，不分片时后两项为 None
+        """
+        if not self.sharding or cases_df.empty:
+            return cases_df, vectors, None, None
+        countries, country_names = pd.factorize(cases_df['admitted_country'], sort=True)
+        degrees, degree_names = pd.factorize(cases_df['admitted_degree_type'], sort=True)
+        order = np.lexsort((degrees, countries))
+        grouped = cases_df.iloc[order].reset_index(drop=True)
+        if vectors is not None:
+            vectors = vectors[order]
+        
+        keys = countries[order].astype(np.int64) * len(degree_names) + degrees[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        stops = np.r_[starts[1:], len(keys)]
+        shard_ranges = [
+            (country_names[keys[start] // len(degree_names)], degree_names[keys[start] % len(degree_names)],
+             int(start), int(stop))
+            for start, stop in zip(starts, stops)
+        ]
+        logger.info(f"Grouped {len(cases_df)} cases into {len(shard_ranges)} country/degree shards")
+        return grouped, vectors, order, shard_ranges
+    
+    @staticmethod
+    def _build_shards(shard_ranges: Optional[List[Tuple[str, str, int, int]]], case_arrays: Dict[str, np.ndarray],
+                      vectors) -> Optional[List[CaseShard]]:
+        """按分片区间切出各分片的特征数组与经历向量视图"""
+        if shard_ranges is None:
+            return None
+        from scipy import sparse
+        
+        shards = []
+        for country, degree_type, start, stop in shard_ranges:
+            arrays = {name: values[start:stop] for name, values in case_arrays.items() if name != 'load_order'}
+            shard_vectors = None
+            if vectors is not None:
+                # CSR 行区间：data/indices 为全表数组的切片视图
+                low, high = vectors.indptr[start], vectors.indptr[stop]
+                shard_vectors = sparse.csr_matrix(
+                    (vectors.data[low:high], vectors.indices[low:high], vectors.indptr[start:stop + 1] - low),
+                    shape=(stop - start, vectors.shape[1]), copy=False,
+                )
+            shards.append(CaseShard(country, degree_type, start, stop, arrays, shard_vectors))
+        return shards
+    
+    def _build_case_index(self, arrays: Dict[str, np.ndarray], vectors) -> Tuple[Optional[CaseIndex], Optional[object]]:
+        """ANN 模式下构建 IVF 索引，返回 (索引, 经历向量降维投影)；案例数不足 ann_min_cases 时仍使用精确计算"""
+        size = len(arrays['gpa'])
+        if self.search_mode != 'ann' or size < self.ann_min_cases:
+            return None, None
+        with span("similarity.build_case_index", cases=size):
+            projection, dense = None, None
+            if vectors is not None:
+                from sklearn.decomposition import TruncatedSVD
+                
+                components = min(_EXPERIENCE_COMPONENTS, vectors.shape[1] - 1)
+                if components > 0:
+                    projection = TruncatedSVD(n_components=components, random_state=0)
+                    dense = projection.fit_transform(vectors)
+            case_index = CaseIndex({
+                'tier': (arrays['tier_level'], max(TIER_LEVELS.values()) + 1),
+                'major': (arrays['major_code'], int(arrays['major_code'].max()) + 1),
+                'gpa': (self._gpa_bins(arrays['gpa']), len(GPA_BIN_CENTERS)),
+            }, dense=dense)
+        return case_index, projection
+    
+    @staticmethod
+    def _gpa_bins(gpa: np.ndarray) -> np.ndarray:
+        return np.where(gpa == 0, 0, 1 + np.rint(np.clip(gpa, 0, 4) * 4)).astype(np.int32)
+    
+    def _ann_candidates(self, snapshot: CaseSnapshot, query: "SimilarityQuery", user_major_code: int,
+                        positions: np.ndarray) -> np.ndarray:
+        """用 IVF 索引从过滤后的案例中召回 ann_candidates 个候选"""
+        mask = None
+        if positions.size < len(snapshot.cases_df):
+            mask = np.zeros(len(snapshot.cases_df), dtype=bool)
+            mask[positions] = True
+        weights = SIMILARITY_WEIGHTS
+        rows = {
+            'tier': weights['tier'] * self._vector_tier_similarity(query.tier, np.arange(max(TIER_LEVELS.values()) + 1)),
+            'major': weights['major'] * self.major_relatedness.matrix[user_major_code],
+            'gpa': weights['gpa'] * self._vector_gpa_similarity(query.gpa, GPA_BIN_CENTERS),
+        }
+        dense_query = None
+        if snapshot.experience_projection is not None and query.experience_text:
+            user_vector = snapshot.featurizer.transform([query.experience_text])
+            dense_query = weights['experience'] * snapshot.experience_projection.transform(user_vector)[0]
+        with span("similarity.ann_search", nprobe=self.ann_nprobe):
+            return snapshot.case_index.search(
+                snapshot.case_index.encode_query(rows, dense_query), self.ann_candidates, self.ann_nprobe, mask
+            )
+    
+    @staticmethod
+    def _major_key(category: str, match: MajorMatch) -> MajorKey:
+        """专业在相关度矩阵中的键：类别以案例标注为准，专业类仅在分类结果与该类别一致时采用"""
+        return (category, match.subcategory_code if match.category == category else "")
     
     def _calculate_gpa_similarity(self, user_gpa: float, case_gpa: float) -> float:
         """Calculate GPA similarity score (0-1)"""
@@ -94,19 +742,8 @@ class SimilarityMatcher:
     
     def _calculate_university_tier_similarity(self, user_tier: str, case_tier: str) -> float:
         """Calculate university tier similarity score (0-1) using new tier system"""
-        # 新的层级体系
-        tier_hierarchy = {
-            'Tier 0': 5,
-            'Tier 1': 4,
-            'Tier 2': 3,
-            'Tier 3': 2,
-            'Tier 4': 1
-        }
-        
-
-        
-        user_level = tier_hierarchy.get(user_tier, 1)
-        case_level = tier_hierarchy.get(case_tier, 1)
+        user_level = TIER_LEVELS.get(user_tier, 1)
+        case_level = TIER_LEVELS.get(case_tier, 1)
         
         # Same tier gets full score
         if user_level == case_level:
@@ -122,23 +759,8 @@ class SimilarityMatcher:
             return 0.1
     
     def _calculate_major_similarity(self, user_major_category: str, case_major_category: str) -> float:
-        """Calculate major category similarity score (0-1)"""
-        if user_major_category == case_major_category:
-            return 1.0
-        
-        # Define related major categories
-        related_majors = {
-            'CS': ['EE', 'ME'],
-            'EE': ['CS', 'ME'],
-            'ME': ['CS', 'EE'],
-            'Finance': ['Business'],
-            'Business': ['Finance'],
-        }
-        
-        if case_major_category in related_majors.get(user_major_category, []):
-            return 0.6
-        
-        return 0.1
+        """Calculate major category similarity score (0-1) from the configured relatedness matrix"""
+        return self.major_relatedness.similarity((user_major_category, ""), (case_major_category, ""))
     
     def _calculate_language_similarity(self, user_score: int, case_score: int, 
                                      user_type: str, case_type: str) -> float:
@@ -166,25 +788,15 @@ class SimilarityMatcher:
         if self.experience_vectors is None or case_idx >= len(self.cases_df):
             return 0.5
         
-        # Prepare user experience text
-        user_experience_parts = []
-        
-        for exp in user_background.research_experiences or []:
-            user_experience_parts.append(f"{exp.get('name', '')} {exp.get('description', '')}")
-        
-        for exp in user_background.internship_experiences or []:
-            user_experience_parts.append(f"{exp.get('company', '')} {exp.get('position', '')} {exp.get('description', '')}")
-        
-        for exp in user_background.other_experiences or []:
-            user_experience_parts.append(f"{exp.get('name', '')} {exp.get('description', '')}")
-        
-        user_experience_text = ' '.join(user_experience_parts)
+        user_experience_text = self._user_experience_text(user_background)
         
         if not user_experience_text.strip():
             return 0.5
         
         # Calculate text similarity
         try:
+            from sklearn.metrics.pairwise import cosine_similarity
+            
             user_vector = self.tfidf_vectorizer.transform([user_experience_text])
             case_vector = self.experience_vectors[case_idx:case_idx+1]
             similarity = cosine_similarity(user_vector, case_vector)[0][0]
@@ -193,101 +805,342 @@ class SimilarityMatcher:
             logger.warning(f"Error calculating experience similarity: {str(e)}")
             return 0.5
     
+    @staticmethod
+    def _user_experience_text(user_background: UserBackground) -> str:
+        """Concatenate the user's experiences for TF-IDF matching"""
+        user_experience_parts = []
+        
+        for exp in user_background.research_experiences or []:
+            user_experience_parts.append(f"{exp.get('name', '')} {exp.get('description', '')}")
+        
+        for exp in user_background.internship_experiences or []:
+            user_experience_parts.append(f"{exp.get('company', '')} {exp.get('position', '')} {exp.get('description', '')}")
+        
+        for exp in user_background.other_experiences or []:
+            user_experience_parts.append(f"{exp.get('name', '')} {exp.get('description', '')}")
+        
+        return ' '.join(user_experience_parts)
+    
+    def ensure_data_loaded(self):
+        """Load cases data if it has not been loaded yet"""
+        if not self._data_loaded:
+            with self._load_lock:
+                if not self._data_loaded:
+                    logger.info("Loading cases data for first time...")
+                    self._load_cases()
+                    self._data_loaded = True
+    
     def find_similar_cases(self, user_background: UserBackground, top_n: int = 150) -> List[Dict]:
         """Find the most similar cases to the user's background"""
+        with FIND_SIMILAR_CASES_SECONDS.time(), span("similarity.find_similar_cases", top_n=top_n):
+            return self._find_similar_cases(user_background, top_n)
+    
+    def _find_similar_cases(self, user_background: UserBackground, top_n: int) -> List[Dict]:
+        ranking = self.rank_cases(user_background, limit=top_n)
+        similarities = []
+        for i in range(min(top_n, len(ranking.positions))):
+            case_data = ranking.cases_df.iloc[ranking.positions[i]].to_dict()
+            similarities.append({
+                'case_id': case_data['id'],
+                'original_id': case_data['original_id'],
+                'similarity_score': float(ranking.scores[i]),
+                'component_scores': {
+                    name: float(values[i]) for name, values in ranking.components.items()
+                },
+                'case_data': case_data
+            })
+        return similarities
+    
+    def rank_cases(self, user_background: UserBackground, limit: Optional[int] = None) -> SimilarityRanking:
+        """
+        返回请求开始时取得的数据快照下的排序（按评分输入缓存，可用于分页浏览）；
+        计算期间即使切换了快照，排序、分项得分与返回的案例表也都来自同一快照。
+        指定 limit 时只保证前 limit 名准确完整（至少计算前 SIMILAR_CASES_LIMIT 名，供不同 top_n 共用）
+        """
         # Lazy load data on first use
-        if not self._data_loaded:
-            logger.info("Loading cases data for first time...")
-            self._load_cases()
-            self._data_loaded = True
+        snapshot = self._query_snapshot(user_background)
         
-        if self.cases_df is None or self.cases_df.empty:
+        if snapshot is None or snapshot.cases_df.empty:
             logger.error("No cases available for similarity matching")
             raise Exception("暂无案例，稍后重试")
         
+        query = self._build_query(user_background, snapshot)
+        ranking = self._ranking_cache.get(query)
+        if ranking is None or (ranking.partial and (limit is None or len(ranking.positions) < limit)):
+            top = None if limit is None else max(limit, settings.SIMILAR_CASES_LIMIT)
+            ranking = self._compute_ranking(snapshot, query, top)
+            if snapshot is self._snapshot or snapshot is self._full_snapshot:
+                self._ranking_cache.put(query, ranking)
+        return ranking._replace(cases_df=snapshot.cases_df)
+    
+    @staticmethod
+    def project_page(ranking: SimilarityRanking, offset: int, limit: int, fields: Tuple[str, ...]) -> List[Dict]:
+        """取排序中的一页，只投影指定的案例字段"""
+        positions = ranking.positions[offset:offset + limit]
+        rows = ranking.cases_df.iloc[positions][list(fields)].to_dict('records')
+        for row, score in zip(rows, ranking.scores[offset:offset + limit]):
+            row['similarity_score'] = float(score)
+        return rows
+    
+    def _build_query(self, user_background: UserBackground,
+                     snapshot: Optional[CaseSnapshot] = None) -> "SimilarityQuery":
+        """把用户背景规范化为相似度计算实际用到的输入，作为排序结果的缓存键（默认使用当前快照）"""
+        snapshot = snapshot or self._snapshot
+        user_major = self.major_classifier.classify(user_background.undergraduate_major)
+        language_score = user_background.language_total_score or 0
+        experience_text = self._user_experience_text(user_background)
+        if snapshot.experience_vectors is None or not experience_text.strip():
+            # 经历相似度取中性分，与经历内容无关
+            experience_text = ''
+        return SimilarityQuery(
+            snapshot_id=snapshot.snapshot_id,
+            tier=self._get_user_university_tier(user_background.undergraduate_university),
+            major=self._major_key(user_major.category, user_major),
+            # Convert user GPA to 4.0 scale
+            gpa=self._convert_gpa_to_4_scale(user_background.gpa, user_background.gpa_scale),
+            language_score=language_score,
+            # 没有语言成绩时语言相似度与考试类型无关
+            language_type=(user_background.language_test_type or '') if language_score else '',
+            experience_text=experience_text,
+            target_countries=tuple(sorted(set(user_background.target_countries or []))),
+            target_degree_type=user_background.target_degree_type or '',
+        )
+    
+    def _compute_ranking(self, snapshot: CaseSnapshot, query: "SimilarityQuery",
+                         limit: Optional[int] = None) -> "SimilarityRanking":
+        """
+        在指定快照上计算候选案例的相似度并按总分降序排列（分数相同保持案例原有顺序）；
+        指定 limit 时先剪枝，只保证前 limit 名与完整排序一致
+        """
+        if snapshot.shards is not None and snapshot.case_index is None:
+            return self._compute_sharded_ranking(snapshot, query, limit)
+        cases_df = snapshot.cases_df
         # Pre-filter cases based on target countries and degree type
-        filtered_df = self.cases_df.copy()
+        mask = np.ones(len(cases_df), dtype=bool)
+        if query.target_countries:
+            mask &= cases_df['admitted_country'].isin(query.target_countries).to_numpy()
+        if query.target_degree_type:
+            mask &= (cases_df['admitted_degree_type'] == query.target_degree_type).to_numpy()
+        positions = np.flatnonzero(mask)
+        if positions.size == 0:
+            logger.warning("No cases match the filtering criteria")
+            # Fall back to all cases if filtering is too restrictive
+            positions = np.arange(len(cases_df))
         
-        if user_background.target_countries:
-            filtered_df = filtered_df[
-                filtered_df['admitted_country'].isin(user_background.target_countries)
-            ]
+        user_major_code = self.major_relatedness.code(query.major)
+        if snapshot.case_index is not None and positions.size > self.ann_candidates:
+            positions = self._ann_candidates(snapshot, query, user_major_code, positions)
         
-        if user_background.target_degree_type:
-            filtered_df = filtered_df[
-                filtered_df['admitted_degree_type'] == user_background.target_degree_type
-            ]
+        pruning = None
+        keep = self._prune(snapshot, query, user_major_code, snapshot.arrays['bucket'][positions], limit)
+        if keep is not None:
+            positions, candidates = positions[keep], len(positions)
+            pruning = PruningStats(candidates, len(positions), candidates - len(positions))
+        total_similarity, components = self._score_positions(snapshot, query, user_major_code, positions)
         
-        if filtered_df.empty:
+        # Sort by similarity score (stable, ties keep case order)
+        if snapshot.load_order is None:
+            order = np.argsort(-total_similarity, kind='stable')
+        else:
+            order = np.lexsort((snapshot.load_order[positions], -total_similarity))
+        return self._ranking(snapshot, positions, total_similarity, components, order, pruning, limit)
+    
+    def _ranking(self, snapshot: CaseSnapshot, positions: np.ndarray, total_similarity: np.ndarray, components: Dict[str, np.ndarray],
+                 order: np.ndarray, pruning: Optional[PruningStats], limit: Optional[int]) -> "SimilarityRanking":
+        if pruning is not None:
+            SIMILARITY_CANDIDATES_TOTAL.inc(pruning.scored, stage="scored")
+            SIMILARITY_CANDIDATES_TOTAL.inc(pruning.pruned, stage="pruned")
+        # 调用方只用到前 limit 名（剪枝后也只有前 limit 名是准确的），缓存中不保留其余案例
+        truncated = limit is not None and len(order) > limit
+        if truncated:
+            order = order[:limit]
+        return SimilarityRanking(
+            snapshot_id=snapshot.snapshot_id,
+            cases_df=None,
+            positions=positions[order],
+            scores=total_similarity[order],
+            components={name: values[order] for name, values in components.items()},
+            pruning=pruning,
+            truncated=truncated,
+        )
+    
+    def _prune(self, snapshot: CaseSnapshot, query: "SimilarityQuery", user_major_code: int, bucket_ids: np.ndarray,
+               limit: Optional[int]) -> Optional[np.ndarray]:
+        """
+        第一阶段：按桶计算总分的上下界（经历、语言分项取其取值范围），
+        按下界从高到低累计到 limit 个案例时的下界为阈值，上界低于阈值的桶不可能进入前 limit 名。
+        返回保留案例的布尔掩码；未开启剪枝或候选不超过 limit 时返回 None
+        """
+        if not self.pruning or limit is None or len(bucket_ids) <= limit:
+            return None
+        with span("similarity.prune", candidates=len(bucket_ids)):
+            lower, upper = self._bucket_bounds(snapshot, query, user_major_code)
+            counts = np.bincount(bucket_ids, minlength=len(lower))
+            present = np.flatnonzero(counts)
+            ranked = present[np.argsort(-lower[present], kind='stable')]
+            reached = np.searchsorted(np.cumsum(counts[ranked]), limit)
+            threshold = lower[ranked[reached]]
+            return (upper >= threshold - _PRUNING_TOLERANCE)[bucket_ids]
+    
+    def _bucket_bounds(self, snapshot: CaseSnapshot, query: "SimilarityQuery",
+                       user_major_code: int) -> Tuple[np.ndarray, np.ndarray]:
+        """各桶内案例总分的下界与上界"""
+        buckets, weights = snapshot.buckets, SIMILARITY_WEIGHTS
+        gpa_min, gpa_max = buckets['gpa_min'], buckets['gpa_max']
+        nearest = np.clip(query.gpa, gpa_min, gpa_max)
+        farthest = np.where(np.abs(query.gpa - gpa_min) > np.abs(query.gpa - gpa_max), gpa_min, gpa_max)
+        fixed = (
+            weights['major'] * self.major_relatedness.matrix[user_major_code][buckets['major_code']] +
+            weights['tier'] * self._vector_tier_similarity(query.tier, buckets['tier_level'])
+        )
+        # 无语言成绩/无经历时这两项为固定的中性分，否则取值在 [0, 1]
+        language = (0.5, 0.5) if not query.language_score else (0.0, 1.0)
+        experience = (0.5, 0.5) if snapshot.experience_vectors is None or not query.experience_text else (0.0, 1.0)
+        lower = (fixed + weights['gpa'] * self._vector_gpa_similarity(query.gpa, farthest) +
+                 weights['language'] * language[0] + weights['experience'] * experience[0])
+        upper = (fixed + weights['gpa'] * self._vector_gpa_similarity(query.gpa, nearest) +
+                 weights['language'] * language[1] + weights['experience'] * experience[1])
+        return lower, upper
+    
+    def _compute_sharded_ranking(self, snapshot: CaseSnapshot, query: "SimilarityQuery",
+                                 limit: Optional[int]) -> "SimilarityRanking":
+        """
+        分片计算：只对目标国家/学位类型的分片打分，多个分片在线程池中并发计算
+        （NumPy/SciPy 的计算内核会释放 GIL），再按总分合并；分数相同按原始加载顺序，结果与不分片时一致。
+        各分片分别剪枝（全局前 limit 名一定在各分片各自的前 limit 名之中）
+        """
+        shards = [
+            shard for shard in snapshot.shards
+            if (not query.target_countries or shard.country in query.target_countries)
+            and (not query.target_degree_type or shard.degree_type == query.target_degree_type)
+        ]
+        if not shards:
             logger.warning("No cases match the filtering criteria")
             # Fall back to all cases if filtering is too restrictive
-            filtered_df = self.cases_df.copy()
+            shards = snapshot.shards
+        user_major_code = self.major_relatedness.code(query.major)
         
-        # Calculate similarity scores for each case
-        similarities = []
+        def score(shard: CaseShard):
+            positions = np.arange(shard.start, shard.stop)
+            arrays, vectors = shard.arrays, shard.experience_vectors
+            keep = self._prune(snapshot, query, user_major_code, arrays['bucket'], limit)
+            if keep is not None:
+                kept = np.flatnonzero(keep)
+                positions = positions[kept]
+                arrays = {name: values[kept] for name, values in arrays.items()}
+                if vectors is not None and query.experience_text:
+                    vectors = vectors[kept]
+            return (positions, *self._score_cases(snapshot, query, user_major_code, arrays, vectors), keep)
         
-        # Determine user's university tier and major category
-        user_tier = self._get_user_university_tier(user_background.undergraduate_university)
-        user_major_category = self._get_user_major_category(user_background.undergraduate_major)
+        with span("similarity.score_shards", shards=len(shards)):
+            if len(shards) > 1:
+                scored = list(get_shard_executor().map(score, shards))
+            else:
+                scored = [score(shards[0])]
+        positions = np.concatenate([positions for positions, _, _, _ in scored])
+        total_similarity = np.concatenate([total for _, total, _, _ in scored])
+        components = {name: np.concatenate([parts[name] for _, _, parts, _ in scored]) for name in scored[0][2]}
+        pruning = None
+        masks = [keep for _, _, _, keep in scored if keep is not None]
+        if masks:
+            candidates = sum(shard.stop - shard.start for shard in shards)
+            pruning = PruningStats(candidates, len(positions), candidates - len(positions))
         
-        # Convert user GPA to 4.0 scale
-        user_gpa_4_scale = self._convert_gpa_to_4_scale(
-            user_background.gpa, user_background.gpa_scale
-        )
+        order = np.lexsort((snapshot.arrays['load_order'][positions], -total_similarity))
+        return self._ranking(snapshot, positions, total_similarity, components, order, pruning, limit)
+    
+    def _score_positions(self, snapshot: CaseSnapshot, query: "SimilarityQuery", user_major_code: int,
+                         positions: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """对指定位置的案例计算各分项与加权总分"""
+        arrays = {name: snapshot.arrays[name][positions] for name in _SCORING_COLUMNS}
+        vectors = None
+        if snapshot.experience_vectors is not None and query.experience_text:
+            vectors = snapshot.experience_vectors[positions]
+        return self._score_cases(snapshot, query, user_major_code, arrays, vectors)
+    
+    def _score_cases(self, snapshot: CaseSnapshot, query: "SimilarityQuery", user_major_code: int,
+                     arrays: Dict[str, np.ndarray], experience_vectors) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """对一组案例（已按位置取出的数组与经历向量）计算各分项与加权总分"""
+        # 各分项与逐条计算的 _calculate_* 方法一致，这里对所有候选案例一次性计算
+        # 先登记用户专业再取矩阵，保证矩阵已包含该编码
+        components = {
+            'major': self.major_relatedness.matrix[user_major_code][arrays['major_code']],
+            'gpa': self._vector_gpa_similarity(query.gpa, arrays['gpa']),
+            'tier': self._vector_tier_similarity(query.tier, arrays['tier_level']),
+            'language': self._vector_language_similarity(
+                query.language_score,
+                query.language_type,
+                arrays['language_score'],
+                arrays['language_type'],
+            ),
+            'experience': self._vector_experience_similarity(
+                snapshot.featurizer, query.experience_text, experience_vectors, len(arrays['gpa'])
+            ),
+        }
         
-        for idx, case in filtered_df.iterrows():
-            # Calculate individual similarity components
-            gpa_sim = self._calculate_gpa_similarity(user_gpa_4_scale, case['gpa_4_scale'])
-            tier_sim = self._calculate_university_tier_similarity(user_tier, case['undergraduate_university_tier'])
-            major_sim = self._calculate_major_similarity(user_major_category, case['undergraduate_major_category'])
-            
-            # Language similarity
-            lang_sim = 0.5  # Default neutral score
-            if user_background.language_total_score and case['language_total_score']:
-                lang_sim = self._calculate_language_similarity(
-                    user_background.language_total_score,
-                    case['language_total_score'],
-                    user_background.language_test_type or '',
-                    case['language_test_type']
-                )
-            
-            # Experience similarity
-            exp_sim = self._calculate_experience_similarity(user_background, idx)
-            
-            # Weighted total similarity
-            weights = {
-                'major': 0.25,      # Highest weight for major relevance
-                'gpa': 0.25,       # Academic performance
-                'tier': 0.4,       # University prestige
-                'language': 0.05,  # Language ability
-                'experience': 0.05  # Experience background
-            }
-            
-            total_similarity = (
-                weights['major'] * major_sim +
-                weights['gpa'] * gpa_sim +
-                weights['tier'] * tier_sim +
-                weights['language'] * lang_sim +
-                weights['experience'] * exp_sim
-            )
+        # Weighted total similarity
+        weights = SIMILARITY_WEIGHTS
+        total_similarity = (
+            weights['major'] * components['major'] +
+            weights['gpa'] * components['gpa'] +
+            weights['tier'] * components['tier'] +
+            weights['language'] * components['language'] +
+            weights['experience'] * components['experience']
+        )
+        return total_similarity, components
+    
+    @staticmethod
+    def _vector_gpa_similarity(user_gpa: float, case_gpa: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_gpa_similarity"""
+        if user_gpa == 0:
+            return np.full(case_gpa.shape, 0.5)
+        similarity = np.maximum(0, 1 - (np.abs(user_gpa - case_gpa) / 4.0))
+        return np.where(case_gpa == 0, 0.5, similarity)
+    
+    @staticmethod
+    def _vector_tier_similarity(user_tier: str, case_level: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_university_tier_similarity"""
+        diff = np.abs(TIER_LEVELS.get(user_tier, 1) - case_level)
+        return _TIER_DIFF_SIMILARITY[np.minimum(diff, len(_TIER_DIFF_SIMILARITY) - 1)]
+    
+    @staticmethod
+    def _vector_language_similarity(user_score, user_type: str, case_score: np.ndarray,
+                                    case_type: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_language_similarity (including the neutral score for missing scores)"""
+        if not user_score:
+            return np.full(case_score.shape, 0.5)
+        same = case_type == user_type
+        if user_type == 'IELTS':
+            # IELTS 用户与 TOEFL 案例比较时换算为 TOEFL 分数
+            converted = case_type == 'TOEFL'
+            user_scores = np.where(converted, user_score * 10, user_score)
+            case_scores = case_score
+        elif user_type == 'TOEFL':
+            converted = case_type == 'IELTS'
+            user_scores = user_score
+            case_scores = np.where(converted, case_score * 10, case_score)
+        else:
+            converted = np.zeros(case_score.shape, dtype=bool)
+            user_scores, case_scores = user_score, case_score
+        max_score = np.where(converted | (user_type == 'TOEFL'), 120, 90)
+        similarity = np.maximum(0, 1 - (np.abs(user_scores - case_scores) / max_score))
+        similarity = np.where(same | converted, similarity, 0.3)
+        return np.where(case_score == 0, 0.5, similarity)
+    
+    @staticmethod
+    def _vector_experience_similarity(featurizer, user_experience_text: str, case_vectors, size: int) -> np.ndarray:
+        """Vectorized _calculate_experience_similarity"""
+        if case_vectors is None or not user_experience_text.strip():
+            return np.full(size, 0.5)
+        try:
+            from sklearn.metrics.pairwise import cosine_similarity
             
-            similarities.append({
-                'case_id': case['id'],
-                'original_id': case['original_id'],
-                'similarity_score': total_similarity,
-                'component_scores': {
-                    'major': major_sim,
-                    'gpa': gpa_sim,
-                    'tier': tier_sim,
-                    'language': lang_sim,
-                    'experience': exp_sim
-                },
-                'case_data': case.to_dict()
-            })
-        
-        # Sort by similarity score and return top N
-        similarities.sort(key=lambda x: x['similarity_score'], reverse=True)
-        return similarities[:top_n]
+            user_vector = featurizer.transform([user_experience_text])
+            similarity = cosine_similarity(user_vector, case_vectors)[0]
+            return np.maximum(0, similarity)
+        except Exception as e:
+            logger.warning(f"Error calculating experience similarity: {str(e)}")
+            return np.full(size, 0.5)
     
     def _get_user_university_tier(self, university_name: str) -> str:
         """Get user's university tier using new scoring service"""
@@ -295,26 +1148,8 @@ class SimilarityMatcher:
         return tier
     
     def _get_user_major_category(self, major_name: str) -> str:
-        """Get user's major category"""
-        major_categories = {
-            "计算机科学与技术": "CS", "软件工程": "CS", "网络工程": "CS", "信息安全": "CS",
-            "数据科学与大数据技术": "CS", "人工智能": "CS", "物联网工程": "CS",
-            "电子信息工程": "EE", "通信工程": "EE", "电气工程及其自动化": "EE",
-            "自动化": "EE", "电子科学与技术": "EE",
-            "机械工程": "ME", "机械设计制造及其自动化": "ME",
-            "金融学": "Finance", "经济学": "Finance", "国际经济与贸易": "Finance",
-            "工商管理": "Business", "市场营销": "Business", "会计学": "Business",
-        }
-        
-        if major_name in major_categories:
-            return major_categories[major_name]
-        
-        # Fuzzy matching
-        for major, category in major_categories.items():
-            if major in major_name or major_name in major:
-                return category
-        
-        return "Other"
+        """Get user's major category from the shared major catalog index"""
+        return self.major_classifier.category_of(major_name)
     
     def _convert_gpa_to_4_scale(self, gpa: float, scale: str) -> float:
         """Convert GPA to 4.0 scale"""
@@ -349,16 +1184,15 @@ class SimilarityMatcher:
     def get_case_details(self, case_ids: List[int]) -> List[Dict]:
         """Get detailed information for specific cases"""
         # Lazy load data if needed
-        if not self._data_loaded:
-            self._load_cases()
-            self._data_loaded = True
+        self.ensure_data_loaded()
+        cases_df = self.cases_df
             
-        if self.cases_df is None or self.cases_df.empty:
+        if cases_df is None or cases_df.empty:
             return []
         
         detailed_cases = []
         for case_id in case_ids:
-            case_row = self.cases_df[self.cases_df['id'] == case_id]
+            case_row = cases_df[cases_df['id'] == case_id]
             if not case_row.empty:
                 case_data = case_row.iloc[0].to_dict()
                 detailed_cases.append(case_data)
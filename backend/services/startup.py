@@ -0,0 +1,93 @@
+"""
+启动耗时统计与延迟导入
+pandas、scikit-learn、google.generativeai、supabase 等重量级依赖在首次使用时才导入，
+/health 等轻量接口与工作进程启动不再为它们付出导入开销。
+STARTUP 记录各启动阶段（模块导入、服务初始化、数据预加载）的耗时，启动完成时写入日志；
+python start_server.py --startup-report 输出完整的分项报告
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# 延迟导入的重量级依赖，启动报告中单独列出其（首次使用时的）导入耗时
+HEAVY_MODULES = (
+    "pandas",
+    "sklearn.feature_extraction.text",
+    "sklearn.metrics.pairwise",
+    "google.generativeai",
+    "supabase",
+)
+
+
+def lazy_import(name: str):
+    """返回一个在首次访问属性时才真正执行导入的模块对象（仅适用于顶层包或父包已很轻的模块）"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class StartupReport:
+    """按阶段记录启动耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def import_module(self, name: str) -> float:
+        """导入模块并记录耗时（已完整导入的模块记为 0）"""
+        with self.phase(f"import {name}"):
+            module = importlib.import_module(name)
+            # 延迟导入的模块在访问属性时才真正执行
+            dir(module)
+        return self._phases[-1][1]
+
+    def phases(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return list(self._phases)
+
+    def summary(self) -> str:
+        """单行摘要，用于启动日志"""
+        phases = self.phases()
+        total = sum(seconds for _, seconds in phases)
+        parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in phases)
+        return f"{total:.2f}s ({parts})" if phases else "0.00s"
+
+    def format(self) -> str:
+        """多行表格，按耗时降序"""
+        phases = self.phases()
+        total = sum(seconds for _, seconds in phases) or 1.0
+        width = max([len(name) for name, _ in phases] + [5])
+        lines = [f"{'phase':<{width}}  {'seconds':>8}  {'share':>6}"]
+        for name, seconds in sorted(phases, key=lambda item: -item[1]):
+            lines.append(f"{name:<{width}}  {seconds:>8.3f}  {seconds / total:>6.1%}")
+        lines.append(f"{'total':<{width}}  {sum(s for _, s in phases):>8.3f}")
+        return "\n".join(lines)
+
+
+# 进程内的启动耗时记录
+STARTUP = StartupReport()
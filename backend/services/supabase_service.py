@@ -1,60 +1,88 @@
-import pandas as pd
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 import logging
-from supabase import create_client, Client
+import threading
 from config.settings import settings
+from services.metrics import SUPABASE_PAGE_FETCH_SECONDS
+from services.profiling import span
 
 logger = logging.getLogger(__name__)
 
 class SupabaseService:
     def __init__(self):
         self.table_name = settings.SUPABASE_TABLE
-        self.client = None
-        self._initialize_client()
+        self._client = None
+        self._client_lock = threading.Lock()
+        # 配置缺失时立即失败；客户端（及较慢的 supabase 库导入）推迟到首次查询
+        if not settings.use_supabase:
+            logger.error("Failed to initialize Supabase client: Supabase not configured")
+            raise Exception("Supabase连接失败: Supabase not configured")
+    
+    @property
+    def client(self):
+        """Supabase client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._initialize_client()
+        return self._client
     
     def _initialize_client(self):
         """Initialize Supabase client"""
         try:
-            if not settings.use_supabase:
-                raise Exception("Supabase not configured")
+            from supabase import create_client
             
-            self.client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+            self._client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
             logger.info("Supabase client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Supabase client: {str(e)}")
             raise Exception(f"Supabase连接失败: {str(e)}")
     
-    def get_all_cases(self) -> List[Dict]:
-        """Get all processed cases from Supabase with pagination support"""
+    def _case_query(self, filters: Optional[Dict] = None):
+        query = self.client.table(self.table_name).select("*")
+        # Apply filters
+        for key, value in (filters or {}).items():
+            if value is not None and value != "":
+                if isinstance(value, list):
+                    query = query.in_(key, value)
+                else:
+                    query = query.eq(key, value)
+        return query
+    
+    def iter_case_pages(self, filters: Optional[Dict] = None, page_size: int = 1000) -> Iterator[List[Dict]]:
+        """逐页读取案例（可按字段过滤）；调用方处理完一页即可丢弃，内存中只保留当前页"""
         if not self.client:
             raise Exception("Supabase client not initialized")
         
+        label = "filtered_cases" if filters else "all_cases"
+        offset = 0
+        while True:
+            # 使用分页查询
+            with SUPABASE_PAGE_FETCH_SECONDS.time(query=label), span("supabase.page_fetch", offset=offset):
+                response = self._case_query(filters).range(offset, offset + page_size - 1).execute()
+            
+            if hasattr(response, 'data'):
+                cases = response.data
+            else:
+                # Fallback for older supabase-py versions
+                cases = response['data'] if isinstance(response, dict) else []
+            
+            if not cases:
+                break
+            
+            logger.info(f"Retrieved {len(cases)} {label.replace('_', ' ')} (offset: {offset})")
+            yield cases
+            offset += page_size
+            
+            # 如果返回的记录数少于page_size，说明已经到最后一页
+            if len(cases) < page_size:
+                break
+    
+    def get_all_cases(self) -> List[Dict]:
+        """Get all processed cases from Supabase with pagination support"""
         try:
             all_cases = []
-            page_size = 1000  # Supabase默认限制
-            offset = 0
-            
-            while True:
-                # 使用分页查询
-                response = self.client.table(self.table_name).select("*").range(offset, offset + page_size - 1).execute()
-                
-                if hasattr(response, 'data'):
-                    cases = response.data
-                else:
-                    # Fallback for older supabase-py versions
-                    cases = response['data'] if isinstance(response, dict) else []
-                
-                if not cases:
-                    break
-                
+            for cases in self.iter_case_pages():
                 all_cases.extend(cases)
-                offset += page_size
-                
-                # 如果返回的记录数少于page_size，说明已经到最后一页
-                if len(cases) < page_size:
-                    break
-                
-                logger.info(f"Retrieved {len(cases)} cases (offset: {offset - page_size})")
             
             logger.info(f"Retrieved total {len(all_cases)} cases from Supabase")
             return all_cases
@@ -65,45 +93,11 @@ class SupabaseService:
     
     def get_cases_by_filters(self, filters: Dict) -> List[Dict]:
         """Get cases with specific filters with pagination support"""
-        if not self.client:
-            raise Exception("Supabase client not initialized")
-        
         try:
-            query = self.client.table(self.table_name).select("*")
-            
-            # Apply filters
-            for key, value in filters.items():
-                if value is not None and value != "":
-                    if isinstance(value, list):
-                        query = query.in_(key, value)
-                    else:
-                        query = query.eq(key, value)
-            
             # 使用分页查询获取所有匹配的记录
             all_cases = []
-            page_size = 1000
-            offset = 0
-            
-            while True:
-                page_query = query.range(offset, offset + page_size - 1)
-                response = page_query.execute()
-                
-                if hasattr(response, 'data'):
-                    cases = response.data
-                else:
-                    cases = response['data'] if isinstance(response, dict) else []
-                
-                if not cases:
-                    break
-                
+            for cases in self.iter_case_pages(filters):
                 all_cases.extend(cases)
-                offset += page_size
-                
-                # 如果返回的记录数少于page_size，说明已经到最后一页
-                if len(cases) < page_size:
-                    break
-                
-                logger.info(f"Retrieved {len(cases)} filtered cases (offset: {offset - page_size})")
             
             logger.info(f"Retrieved total {len(all_cases)} filtered cases from Supabase")
             return all_cases
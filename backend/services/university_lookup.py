@@ -0,0 +1,269 @@
+"""
+院校分层查询
+以 config/university_tiers.json 为唯一数据源，进程内只构建一次不可变的查找表
+（标准名、别名及其规范化形式 -> 标准名与层级），供雷达图评分与相似度匹配共用。
+精确查找失败时，基于 data/processed_universities.json 与分层配置构建的字符 n-gram
+倒排索引做模糊匹配（简称、错别字、缺省括号等），返回最佳标准名与置信度
+"""
+import json
+import logging
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from services.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+TIER_CONFIG_PATH = Path(__file__).parent.parent / "config" / "university_tiers.json"
+UNIVERSITY_CATALOG_PATH = Path(__file__).parent.parent.parent / "data" / "processed_universities.json"
+
+# 未收录院校的默认层级
+DEFAULT_TIER = "Tier 4"
+
+# 模糊匹配的最低置信度，低于该值视为未收录
+MIN_FUZZY_CONFIDENCE = 0.6
+
+# 出现在超过该比例名称中的 n-gram（如“大学”“学院”）不用于召回候选
+_COMMON_GRAM_RATIO = 0.05
+
+# 分校、独立学院等在主校名（“……大学”）之后带有区分性的后缀（如“威海”“南方学院”“城市学院”），
+# 模糊匹配时主校名与后缀分别比较，避免解析为主校或其他大学的同名附属学院
+_MAIN_NAME_MARKER = "大学"
+
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[()\[\]·・\-_.,，、'\"]")
+
+
+def normalize_university_name(name: str) -> str:
+    """规范化院校名称：全角转半角、统一括号、去除空白、英文转小写"""
+    if not name:
+        return ""
+    normalized = unicodedata.normalize("NFKC", name)
+    normalized = normalized.replace("〔", "(").replace("〕", ")").replace("【", "(").replace("】", ")")
+    return _WHITESPACE.sub("", normalized).lower()
+
+
+def _compact(normalized: str) -> str:
+    """去除括号与标点后的名称，用于模糊匹配"""
+    return _PUNCTUATION.sub("", normalized)
+
+
+def _bigrams(text: str) -> Set[str]:
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    """Dice 系数：2|A∩B| / (|A|+|B|)，两侧都为空时为 1"""
+    if not a and not b:
+        return 1.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _split_main_name(key: str) -> Optional[Tuple[str, str]]:
+    """拆分为主校名（含“大学”）与其后的后缀；名称中没有“大学”时返回 None"""
+    index = key.find(_MAIN_NAME_MARKER)
+    if index < 0:
+        return None
+    index += len(_MAIN_NAME_MARKER)
+    return key[:index], key[index:]
+
+
+class UniversityMatch(NamedTuple):
+    """查找结果：标准名称与层级"""
+    name: str
+    tier: str
+
+
+class UniversityResolution(NamedTuple):
+    """模糊解析结果：标准名称、层级与置信度（0-1，精确/别名匹配为 1）"""
+    name: str
+    tier: str
+    confidence: float
+
+
+class UniversityLookup:
+    """不可变的院校层级查找表"""
+
+    def __init__(self, tier_data: Dict, catalog: Optional[List[str]] = None):
+        self.tier_data = tier_data
+        self.tier_definitions: Mapping[str, Dict] = MappingProxyType(dict(tier_data["tier_definitions"]))
+
+        canonical: Dict[str, str] = {}
+        index: Dict[str, UniversityMatch] = {}
+        for tier, universities in tier_data.get("university_tiers", {}).items():
+            for university in universities:
+                if university in canonical:
+                    logger.warning(f"University '{university}' listed in both {canonical[university]} and {tier}")
+                    continue
+                canonical[university] = tier
+                index.setdefault(normalize_university_name(university), UniversityMatch(university, tier))
+
+        for alias, university in tier_data.get("university_aliases", {}).items():
+            tier = canonical.get(university)
+            if tier is None:
+                logger.warning(f"Alias '{alias}' points to unknown university '{university}'")
+                continue
+            index.setdefault(normalize_university_name(alias), UniversityMatch(university, tier))
+
+        self.tier_by_name: Mapping[str, str] = MappingProxyType(canonical)
+        self._index: Mapping[str, UniversityMatch] = MappingProxyType(index)
+        self._build_fuzzy_index(catalog or [])
+        self._resolved = LRUCache("university_resolve", 4096)
+
+    def _build_fuzzy_index(self, catalog: List[str]):
+        """构建模糊匹配用的候选：紧凑名称 -> 候选位置，以及 bigram 倒排索引"""
+        # 中文简称只做精确匹配：过短的别名会在模糊匹配中抢占全称（如“电子科大”之于“西安电子科大”）
+        entries: List[Tuple[str, UniversityMatch]] = [
+            (normalized, match) for normalized, match in self._index.items()
+            if normalized.isascii() or normalized == normalize_university_name(match.name)
+        ]
+        for university in catalog:
+            normalized = normalize_university_name(university)
+            if normalized not in self._index:
+                # 名录中未分层的院校归为 Tier 4，但仍可解析出标准名称
+                entries.append((normalized, UniversityMatch(university, DEFAULT_TIER)))
+
+        matches: List[UniversityMatch] = []
+        keys: List[str] = []
+        grams: List[Set[str]] = []
+        by_compact: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = {}
+        for normalized, match in entries:
+            key = _compact(normalized)
+            if not key or key in by_compact:
+                continue
+            position = len(matches)
+            by_compact[key] = position
+            matches.append(match)
+            keys.append(key)
+            grams.append(_bigrams(key))
+            for gram in grams[-1]:
+                postings.setdefault(gram, []).append(position)
+
+        limit = max(1, int(len(matches) * _COMMON_GRAM_RATIO))
+        self._fuzzy_matches: Tuple[UniversityMatch, ...] = tuple(matches)
+        self._fuzzy_keys: Tuple[str, ...] = tuple(keys)
+        self._fuzzy_grams: Tuple[frozenset, ...] = tuple(frozenset(g) for g in grams)
+        self._by_compact: Mapping[str, int] = MappingProxyType(by_compact)
+        self._postings: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+            {gram: tuple(ids) for gram, ids in postings.items() if len(ids) <= limit}
+        )
+
+    @classmethod
+    def from_file(cls, path: Path = TIER_CONFIG_PATH,
+                  catalog_path: Optional[Path] = UNIVERSITY_CATALOG_PATH) -> "UniversityLookup":
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                tier_data = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load university tier data: {str(e)}")
+            raise Exception(f"院校层级配置文件缺失或损坏: {str(e)}")
+        catalog: List[str] = []
+        if catalog_path is not None:
+            try:
+                with open(catalog_path, 'r', encoding='utf-8') as f:
+                    catalog = [item["name"] for item in json.load(f) if item.get("name")]
+            except Exception as e:
+                # 院校名录仅用于扩充模糊匹配候选，缺失时退化为只匹配分层配置中的院校
+                logger.warning(f"Failed to load university catalog for fuzzy matching: {str(e)}")
+        return cls(tier_data, catalog)
+
+    def match(self, university_name: str) -> Optional[UniversityMatch]:
+        """按标准名、别名或其规范化形式精确查找"""
+        if not university_name:
+            return None
+        return self._index.get(normalize_university_name(university_name))
+
+    def resolve(self, university_name: str) -> Optional[UniversityResolution]:
+        """
+        解析院校名称：先精确查找标准名/别名，再做 n-gram 模糊匹配；
+        置信度低于 MIN_FUZZY_CONFIDENCE 时返回 None。结果按规范化名称缓存
+        """
+        normalized = normalize_university_name(university_name)
+        if not normalized:
+            return None
+        exact = self._index.get(normalized)
+        if exact:
+            return UniversityResolution(exact.name, exact.tier, 1.0)
+        cached = self._resolved.get(normalized)
+        if cached is None:
+            cached = self._resolve_fuzzy(normalized) or False
+            self._resolved.put(normalized, cached)
+        return cached or None
+
+    def _resolve_fuzzy(self, normalized: str) -> Optional[UniversityResolution]:
+        key = _compact(normalized)
+        if not key:
+            return None
+        position = self._by_compact.get(key)
+        if position is not None:
+            match = self._fuzzy_matches[position]
+            return UniversityResolution(match.name, match.tier, 0.95)
+
+        query = _bigrams(key)
+        query_parts = _split_main_name(key)
+        candidates: Set[int] = set()
+        for gram in query:
+            candidates.update(self._postings.get(gram, ()))
+        best: Optional[Tuple[bool, float, bool, bool, int]] = None
+        best_dice = 0.0
+        for candidate in candidates:
+            dice = _dice(query, self._fuzzy_grams[candidate])
+            score, same_main, main_campus = dice, False, False
+            if query_parts is not None:
+                candidate_parts = _split_main_name(self._fuzzy_keys[candidate])
+                if candidate_parts is not None:
+                    same_main = query_parts[0] == candidate_parts[0]
+                    main_campus = not candidate_parts[1]
+                    main = _dice(_bigrams(query_parts[0]), _bigrams(candidate_parts[0]))
+                    if query_parts[1]:
+                        # 主校名与后缀都要相近：后缀只有一侧有（分校与主校）或主校名不同（不同大学的附属学院）时置信度很低
+                        score = min(dice, main, _dice(_bigrams(query_parts[1]), _bigrams(candidate_parts[1])))
+                    else:
+                        # 查询没有后缀时只比较主校名，同一大学的各校区中优先主校区
+                        score = main
+            # 主校名完全相同的候选优先（其余候选即使整体相近也不采用）；平分时优先主校区与分层配置中收录的院校
+            ranked = (same_main, score, main_campus, self._fuzzy_matches[candidate].tier != DEFAULT_TIER, -candidate)
+            if best is None or ranked > best:
+                best, best_dice = ranked, dice
+        if best is None or best[1] < MIN_FUZZY_CONFIDENCE:
+            return None
+        match = self._fuzzy_matches[-best[4]]
+        # 置信度不高于整体名称的相似度（没有后缀的查询解析到某一校区时并不确定）
+        return UniversityResolution(match.name, match.tier, round(max(min(best[1], best_dice), MIN_FUZZY_CONFIDENCE), 3))
+
+    def tier_of(self, university_name: str) -> str:
+        """返回院校层级（含模糊匹配），未收录的院校归为 Tier 4"""
+        resolution = self.resolve(university_name)
+        return resolution.tier if resolution else DEFAULT_TIER
+
+    def fixed_score(self, tier: str) -> float:
+        return self.tier_definitions[tier]["fixed_score"]
+
+    def score_range(self, tier: str) -> Tuple[int, int]:
+        low, high = self.tier_definitions[tier]["score_range"]
+        return low, high
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+_lookup: Optional[UniversityLookup] = None
+_lookup_lock = threading.Lock()
+
+
+def get_university_lookup() -> UniversityLookup:
+    """获取进程内共享的院校查找表（首次调用时构建）"""
+    global _lookup
+    if _lookup is None:
+        with _lookup_lock:
+            if _lookup is None:
+                _lookup = UniversityLookup.from_file()
+                logger.info(f"University lookup built with {len(_lookup)} names")
+    return _lookup
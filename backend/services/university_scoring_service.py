@@ -1,7 +1,6 @@
-import json
 import logging
 from typing import Dict, Tuple, Optional
-from pathlib import Path
+from services.university_lookup import DEFAULT_TIER, UniversityLookup, get_university_lookup
 
 logger = logging.getLogger(__name__)
 
@@ -10,29 +9,13 @@ class UniversityScoringService:
     院校评分服务 - 基于手动维护的分级列表进行院校评分和分级
     """
     
-    def __init__(self):
-        self.tier_data = self._load_tier_data()
-        self.university_to_tier_map = self._build_university_map()
+    def __init__(self, lookup: Optional[UniversityLookup] = None):
+        # 与雷达图评分共用进程内唯一的院校查找表
+        self.lookup = lookup or get_university_lookup()
+        self.tier_data = self.lookup.tier_data
+        self.university_to_tier_map = self.lookup.tier_by_name
         logger.info("University scoring service initialized with manual tier data")
     
-    def _load_tier_data(self) -> Dict:
-        """加载院校分级数据"""
-        try:
-            config_path = Path(__file__).parent.parent / "config" / "university_tiers.json"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to load university tier data: {str(e)}")
-            raise Exception(f"院校层级配置文件缺失或损坏: {str(e)}")
-    
-    def _build_university_map(self) -> Dict[str, str]:
-        """构建大学名称到层级的映射"""
-        university_map = {}
-        for tier, universities in self.tier_data.get("university_tiers", {}).items():
-            for university in universities:
-                university_map[university] = tier
-        return university_map
-    
     def get_university_score_and_tier(self, university_name: str) -> Tuple[float, str]:
         """
         获取大学的评分和层级
@@ -49,12 +32,14 @@ class UniversityScoringService:
         # 清理大学名称（去除空格等）
         cleaned_name = university_name.strip()
         
-        # 查找精确匹配
-        tier = self.university_to_tier_map.get(cleaned_name)
+        # 查找标准名、别名及其规范化形式，失败时做 n-gram 模糊匹配（简称、错别字、全半角括号等）
+        resolution = self.lookup.resolve(cleaned_name)
         
-        if tier:
-            score = self.tier_data["tier_definitions"][tier]["fixed_score"]
-            logger.debug(f"Found university '{cleaned_name}' in {tier} with score {score}")
+        if resolution:
+            tier = resolution.tier
+            score = self.lookup.fixed_score(tier)
+            logger.debug(f"Resolved university '{cleaned_name}' to '{resolution.name}' in {tier} "
+                         f"(confidence {resolution.confidence}) with score {score}")
             return score, tier
         
 
@@ -68,8 +53,8 @@ class UniversityScoringService:
     
     def _get_default_score_and_tier(self) -> Tuple[float, str]:
         """获取默认的评分和层级（Tier 4）"""
-        tier = "Tier 4"
-        score = self.tier_data["tier_definitions"][tier]["fixed_score"]
+        tier = DEFAULT_TIER
+        score = self.lookup.fixed_score(tier)
         return score, tier
     
     def get_tier_info(self, tier: str) -> Dict:
@@ -1,25 +1,185 @@
 #!/usr/bin/env python3
 """
-简化的后端服务启动脚本
+后端服务启动脚本
+
+    python start_server.py               开发模式：单进程，代码变更自动重载
+    python start_server.py --production  生产模式：父进程预加载案例数据后 fork 多个工作进程
+    python start_server.py --startup-report [--preload]
+                                         输出启动耗时报告（模块导入、服务初始化、按需导入的依赖）
+
+生产模式下案例表、TF-IDF 矩阵等只在父进程加载一次，工作进程通过写时复制共享；
+加载完成后执行 gc.freeze()，避免垃圾回收改写共享对象导致内存页被复制。
+安装了 uvloop/httptools 时自动使用（uvicorn 的 loop/http="auto"）
 """
-import uvicorn
-import sys
+import argparse
+import asyncio
+import gc
 import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import uvicorn
 
 # 添加当前目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-if __name__ == "__main__":
+from config.settings import settings
+
+# 工作进程异常退出后重新拉起前的等待时间（秒）
+_RESPAWN_DELAY = 1.0
+
+
+def run_development():
     print("启动留学定位与选校规划系统后端服务...")
-    print("服务地址: http://localhost:8000")
-    print("API文档: http://localhost:8000/docs")
-    
+    print(f"服务地址: http://localhost:{settings.SERVER_PORT}")
+    print(f"API文档: http://localhost:{settings.SERVER_PORT}/docs")
+
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
         reload=True,
         log_level="info",
         timeout_keep_alive=600
     )
 
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(app, sock: socket.socket):
+    config = uvicorn.Config(
+        app,
+        loop="auto",
+        http="auto",
+        log_level="info",
+        timeout_keep_alive=settings.SERVER_TIMEOUT_KEEP_ALIVE,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn_worker(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # 工作进程：恢复默认信号处理（由 uvicorn 接管），重新设置随机种子
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    random.seed()
+    code = 0
+    try:
+        _serve(app, sock)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    os._exit(code)
+
+
+def run_production(workers: int):
+    import app.main as main_module
+
+    print(f"预加载案例数据（{workers} 个工作进程共享）...")
+    try:
+        main_module.preload_similarity_data()
+    except Exception as e:
+        # 数据源不可用时仍然启动服务，各工作进程在首次请求时再尝试加载
+        print(f"预加载案例数据失败，将在工作进程中按需加载: {e}")
+    # 把预加载的对象移入永久代，之后的垃圾回收不再遍历（和改写）这些对象
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(settings.SERVER_HOST, settings.SERVER_PORT)
+    print(f"服务地址: http://{settings.SERVER_HOST}:{settings.SERVER_PORT}（{workers} 个工作进程）")
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        _serve(main_module.app, sock)
+        return
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    children = set()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    for _ in range(workers):
+        children.add(_spawn_worker(main_module.app, sock))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"工作进程 {pid} 退出（状态 {status}），重新启动")
+            time.sleep(_RESPAWN_DELAY)
+            children.add(_spawn_worker(main_module.app, sock))
+    sock.close()
+
+
+def run_startup_report(preload: bool):
+    from services.startup import HEAVY_MODULES, STARTUP, StartupReport
+
+    import app.main as main_module
+
+    if preload:
+        try:
+            main_module.preload_similarity_data()
+        except Exception as e:
+            print(f"预加载案例数据失败: {e}")
+
+    async def _startup():
+        async with main_module.app.router.lifespan_context(main_module.app):
+            pass
+
+    asyncio.run(_startup())
+    print("启动耗时：")
+    print(STARTUP.format())
+
+    # 重量级依赖在首次使用时才导入，这部分耗时由第一个用到它们的请求承担
+    deferred = StartupReport()
+    for module in HEAVY_MODULES:
+        deferred.import_module(module)
+    print("\n按需导入（首次使用时）：")
+    print(deferred.format())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="留学定位与选校规划系统后端服务")
+    parser.add_argument("--production", action="store_true", help="生产模式：预加载数据并启动多个工作进程")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="生产模式的工作进程数")
+    parser.add_argument("--startup-report", action="store_true", help="输出启动耗时报告后退出")
+    parser.add_argument("--preload", action="store_true", help="启动报告中包含案例数据预加载")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        run_startup_report(args.preload)
+    elif args.production:
+        run_production(max(1, args.workers))
+    else:
+        run_development()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,7 @@ def test_no_similar_cases_returns_empty_structures(monkeypatch):
         target_degree_type="Master",
     )
 
-    report = svc.radar_scoring_service.calculate_radar_scores(ub)  # ensure service usable
+    report = __import__("asyncio").run(svc.radar_scoring_service.calculate_radar_scores(ub))  # ensure service usable
     assert len(report) == 5
 
     # Now run main report
@@ -0,0 +1,41 @@
+import asyncio
+
+from backend.models.schemas import UserBackground
+
+
+def test_process_analysis_task_dispatches_to_worker_pool():
+    import backend.app.main as main_mod
+
+    calls = {"pool": 0}
+
+    class FakePool:
+        async def generate_analysis_report(self, ub):
+            calls["pool"] += 1
+            return {"ok": True}
+
+    class FailingService:
+        async def generate_analysis_report(self, ub):
+            raise AssertionError("should not run in-process when pool is configured")
+
+    main_mod.analysis_worker_pool = FakePool()
+    main_mod.analysis_service = FailingService()
+    try:
+        ub = UserBackground(
+            undergraduate_university="U",
+            undergraduate_major="M",
+            gpa=3.2,
+            gpa_scale="4.0",
+            graduation_year=2024,
+            target_countries=["US"],
+            target_majors=["CS"],
+            target_degree_type="Master",
+        )
+        main_mod.analysis_tasks["t1"] = {"status": "pending", "progress": 0, "created_at": "x"}
+        asyncio.run(main_mod.process_analysis_task("t1", ub))
+    finally:
+        main_mod.analysis_worker_pool = None
+        main_mod.analysis_service = None
+
+    assert calls["pool"] == 1
+    assert main_mod.analysis_tasks["t1"]["status"] == "completed"
+    assert main_mod.analysis_tasks["t1"]["result"] == {"ok": True}
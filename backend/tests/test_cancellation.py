@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import backend.app.main as main_mod
+from backend.models.schemas import UserBackground
+from backend.services.retry import async_retry_full_jitter
+
+# use the cancellation module instance the application code imports
+CancellationToken = main_mod.CancellationToken
+TaskCancelled = main_mod.TaskCancelled
+use_token = main_mod.use_token
+
+
+def _user_background():
+    return UserBackground(
+        undergraduate_university="U",
+        undergraduate_major="M",
+        gpa=3.2,
+        gpa_scale="4.0",
+        graduation_year=2024,
+        target_countries=["US"],
+        target_majors=["CS"],
+        target_degree_type="Master",
+    )
+
+
+@pytest.mark.asyncio
+async def test_retry_stops_once_token_is_cancelled():
+    calls = {"n": 0}
+    token = CancellationToken()
+
+    def flaky():
+        calls["n"] += 1
+        token.cancel()
+        raise RuntimeError("flaky")
+
+    async def fake_sleep(_):
+        return None
+
+    with use_token(token):
+        with pytest.raises(TaskCancelled):
+            await async_retry_full_jitter(
+                flaky, exceptions=(RuntimeError,), max_attempts=5, sleep=fake_sleep
+            )
+    assert calls["n"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_endpoint_stops_running_task_and_keeps_cancelled_status():
+    from anyio import to_thread
+    from services.cancellation import raise_if_cancelled
+
+    stopped = threading.Event()
+
+    class SlowService:
+        async def generate_analysis_report(self, ub):
+            def blocking_llm_call():
+                # simulate a long thread-offloaded call that honours the token between steps
+                try:
+                    for _ in range(200):
+                        raise_if_cancelled()
+                        time.sleep(0.01)
+                finally:
+                    stopped.set()
+                return "late result"
+
+            return await to_thread.run_sync(blocking_llm_call, abandon_on_cancel=True)
+
+    main_mod.analysis_service = SlowService()
+    try:
+        main_mod.analysis_tasks["c1"] = {"status": "pending", "progress": 0, "created_at": "x"}
+        token = CancellationToken()
+        handle = asyncio.create_task(main_mod.process_analysis_task("c1", _user_background(), token))
+        main_mod.running_analysis_tasks["c1"] = (handle, token)
+        await asyncio.sleep(0.05)
+
+        await main_mod.cancel_analysis_task("c1")
+        done, _ = await asyncio.wait([handle], timeout=1.0)
+        assert handle in done
+        assert await asyncio.to_thread(stopped.wait, 1.0)
+    finally:
+        main_mod.analysis_service = None
+
+    assert main_mod.analysis_tasks["c1"]["status"] == "cancelled"
+    assert "result" not in main_mod.analysis_tasks["c1"]
+    assert "c1" not in main_mod.running_analysis_tasks
@@ -0,0 +1,68 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.case_columns import CaseColumnBuilder, compact_cases, memory_report, normalize_case
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def test_compact_table_returns_identical_rows():
+    df = pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "gpa_4_scale": [3.57, 0.0, 3.9, 3.57],
+        "work_experience_years": [0.0, 1.5, 2.0, 0.0],
+        "admitted_country": ["US", "UK", "US", "US"],
+        "experience_text": ["a", "b", "c", "d"],
+    })
+    compact = compact_cases(df)
+
+    assert compact["id"].dtype == "int8"
+    assert compact["gpa_4_scale"].dtype == "float64"
+    assert compact["work_experience_years"].dtype == "float32"
+    assert isinstance(compact["admitted_country"].dtype, pd.CategoricalDtype)
+    assert not isinstance(compact["experience_text"].dtype, pd.CategoricalDtype)
+    assert compact.to_dict("records") == df.to_dict("records")
+
+
+def test_memory_report_shrinks_and_matcher_outputs_are_unchanged():
+    cases = generate_cases(1000, seed=41)
+    matchers = {}
+    for compact in (False, True):
+        matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+        matcher.compact_cases = compact
+        matchers[compact] = matcher
+
+    before, after = matchers[False].table_memory_report(), matchers[True].table_memory_report()
+    assert after["bytes_per_case"] < before["bytes_per_case"]
+    assert set(after["columns"]) == set(before["columns"])
+
+    for user in generate_user_backgrounds(4, seed=42):
+        assert matchers[True].find_similar_cases(user, top_n=30) == matchers[False].find_similar_cases(user, top_n=30)
+
+
+def test_streamed_pages_build_the_same_table():
+    cases = generate_cases(3000, seed=43)
+    cases[3]["original_id"] = None
+    cases[4]["admitted_country"] = None
+    del cases[5]["gpa_4_scale"]
+    expected = pd.DataFrame([normalize_case(case) for case in cases])
+
+    for compact in (False, True):
+        builder = CaseColumnBuilder()
+        for offset in range(0, len(cases), 700):
+            builder.append(cases[offset:offset + 700])
+        assert_frame_equal(builder.build(compact=compact), compact_cases(expected) if compact else expected)
+
+
+def test_streaming_load_matches_list_load():
+    cases = generate_cases(1200, seed=44)
+    matchers = {}
+    for streaming in (False, True):
+        matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases, page_size=250))
+        matcher.streaming_load = streaming
+        matcher.ensure_data_loaded()
+        matchers[streaming] = matcher
+
+    assert_frame_equal(matchers[True].cases_df, matchers[False].cases_df)
+    user = generate_user_backgrounds(1, seed=45)[0]
+    assert matchers[True].find_similar_cases(user, top_n=20) == matchers[False].find_similar_cases(user, top_n=20)
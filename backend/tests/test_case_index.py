@@ -0,0 +1,61 @@
+import numpy as np
+
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.case_index import CaseIndex
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def _index(size=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = {"a": (rng.integers(0, 6, size), 6), "b": (rng.integers(0, 40, size), 40)}
+    dense = rng.normal(size=(size, 8)).astype(np.float32)
+    return CaseIndex(codes, dense=dense, nlist=50), rng
+
+
+def test_search_recalls_top_scoring_cases():
+    index, rng = _index()
+    query = index.encode_query({"a": rng.random(6), "b": rng.random(40)}, rng.normal(size=8))
+    exact = index.approximate_scores(query, np.arange(index.size))
+    expected = set(np.argsort(-exact)[:100])
+
+    found = index.search(query, 500, nprobe=20)
+    assert len(set(found) & expected) >= 90
+    assert np.all(np.diff(found) > 0)
+
+
+def test_search_respects_mask_and_widens_probe():
+    index, rng = _index()
+    mask = np.zeros(index.size, dtype=bool)
+    mask[rng.choice(index.size, 300, replace=False)] = True
+    query = index.encode_query({"a": rng.random(6), "b": rng.random(40)})
+
+    found = index.search(query, 200, nprobe=1, mask=mask)
+    assert len(found) == 200
+    assert mask[found].all()
+
+
+def test_ann_mode_reranks_candidates_exactly():
+    cases = generate_cases(3000, seed=11)
+    exact = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+    exact.ensure_data_loaded()
+    approximate = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+    approximate.search_mode, approximate.ann_min_cases, approximate.ann_candidates = "ann", 0, 1000
+    approximate.ensure_data_loaded()
+    assert approximate.case_index is not None
+
+    for user in generate_user_backgrounds(5, seed=12):
+        expected = exact.find_similar_cases(user, top_n=20)
+        found = approximate.find_similar_cases(user, top_n=20)
+        expected_scores = {r["case_id"]: r["similarity_score"] for r in expected}
+        # 召回的案例使用精确公式打分
+        for result in found:
+            if result["case_id"] in expected_scores:
+                assert result["similarity_score"] == expected_scores[result["case_id"]]
+        assert len(expected_scores.keys() & {r["case_id"] for r in found}) >= 18
+
+
+def test_small_tables_skip_the_index():
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(generate_cases(200, seed=1)))
+    matcher.search_mode = "ann"
+    matcher.ensure_data_loaded()
+    assert matcher.case_index is None
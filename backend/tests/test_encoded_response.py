@@ -0,0 +1,79 @@
+import asyncio
+import gzip
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from backend.models.schemas import UserBackground
+from backend.services import encoded_response
+from backend.services.encoded_response import EncodedBody, dumps
+
+
+def test_dumps_handles_models_numpy_and_chinese():
+    background = UserBackground(
+        undergraduate_university="北京大学", undergraduate_major="数学", gpa=3.5, gpa_scale="4.0",
+        graduation_year=2025, target_countries=["US"], target_majors=["CS"], target_degree_type="Master",
+    )
+    data = json.loads(dumps({"bg": background, "score": np.float64(0.5), "n": np.int64(3)}))
+    assert data["bg"]["undergraduate_university"] == "北京大学"
+    assert (data["score"], data["n"]) == (0.5, 3)
+    assert "北京大学".encode() in dumps({"name": "北京大学"})
+
+
+def test_negotiation_prefers_supported_compressed_variant():
+    body = EncodedBody({"text": "案例分析" * 500})
+    raw, encoding = body.negotiate("gzip, deflate")
+    assert encoding == "gzip" and gzip.decompress(raw) == body.identity
+    assert len(raw) < len(body.identity) / 4
+    assert body.negotiate(None) == (body.identity, None)
+    assert body.negotiate("gzip;q=0, identity") == (body.identity, None)
+    assert body.negotiate("br")[1] == ("br" if "br" in body.variants else None)
+
+    small = EncodedBody({"ok": True})
+    assert small.negotiate("gzip") == (small.identity, None)
+
+
+def test_br_request_falls_back_when_brotli_is_missing(monkeypatch):
+    monkeypatch.setattr(encoded_response, "brotli", None)
+    body = EncodedBody({"text": "案例分析" * 500})
+    assert "br" not in body.variants
+    assert body.negotiate("br") == (body.identity, None)
+    raw, encoding = body.negotiate("br, gzip;q=0.5")
+    assert encoding == "gzip" and gzip.decompress(raw) == body.identity
+
+
+def test_dumps_falls_back_to_json_without_orjson(monkeypatch):
+    payload = {"name": "北京大学", "score": np.float64(0.5)}
+    expected = json.loads(dumps(payload))
+    monkeypatch.setattr(encoded_response, "orjson", None)
+    assert json.loads(dumps(payload)) == expected
+
+
+def test_completed_task_is_served_from_cached_bytes():
+    import backend.app.main as main_mod
+
+    class FakeService:
+        async def generate_analysis_report(self, ub):
+            return {"summary": "结果" * 1000}
+
+    ub = UserBackground(
+        undergraduate_university="U", undergraduate_major="M", gpa=3.2, gpa_scale="4.0",
+        graduation_year=2024, target_countries=["US"], target_majors=["CS"], target_degree_type="Master",
+    )
+    main_mod.analysis_service = FakeService()
+    try:
+        main_mod.analysis_tasks["e1"] = {"status": "pending", "progress": 0, "created_at": "x"}
+        asyncio.run(main_mod.process_analysis_task("e1", ub))
+    finally:
+        main_mod.analysis_service = None
+
+    assert main_mod.analysis_tasks["e1"]["encoded_response"].variants
+    client = TestClient(main_mod.app)
+    resp = client.get("/api/analyze/e1", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.json()["result"] == {"summary": "结果" * 1000}
+    plain = client.get("/api/analyze/e1", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == resp.json()
@@ -0,0 +1,72 @@
+import numpy as np
+
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.experience_features import HashedExperienceFeaturizer
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def test_counts_are_stateless_and_idf_is_incremental():
+    texts = ["机器学习项目；论文发表", "腾讯实习", "机器学习竞赛"]
+    first, second = HashedExperienceFeaturizer(1 << 12), HashedExperienceFeaturizer(1 << 12)
+    assert (first.counts(texts) != second.counts(texts)).nnz == 0
+
+    first.partial_fit(first.counts(texts[:2]))
+    first.partial_fit(first.counts(texts[2:]))
+    second.partial_fit(second.counts(texts))
+    assert first.n_documents == 3
+    np.testing.assert_array_equal(first.idf, second.idf)
+
+    vectors = first.transform(texts)
+    np.testing.assert_allclose(np.sqrt(vectors.multiply(vectors).sum(axis=1)).A.ravel(), 1.0)
+
+
+def _hashing_matcher(cases):
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+    matcher.experience_features = "hashing"
+    matcher.ensure_data_loaded()
+    return matcher
+
+
+def test_refresh_hashes_only_new_and_modified_cases(monkeypatch):
+    cases = generate_cases(300, seed=5)
+    matcher = _hashing_matcher(cases[:250])
+    hashed = []
+    featurizer_type = type(matcher.tfidf_vectorizer)
+    counts = featurizer_type.counts
+    monkeypatch.setattr(featurizer_type, "counts", lambda self, texts: hashed.extend(texts) or counts(self, texts))
+
+    changed = dict(cases[10], experience_text="量化研究实习；顶会论文")
+    matcher.supabase_service = SyntheticSupabaseService(cases[:10] + [changed] + cases[11:])
+    matcher._load_cases()
+
+    assert matcher.experience_vectors.shape[0] == 300
+    assert len(hashed) == 1 + 50
+    # 文档频率恰好对应当前案例：修改的案例扣减旧词频后重新计入
+    assert matcher.tfidf_vectorizer.n_documents == 300
+    np.testing.assert_array_equal(matcher.tfidf_vectorizer.idf, _hashing_matcher(
+        cases[:10] + [changed] + cases[11:]).tfidf_vectorizer.idf)
+
+
+def test_reloading_the_same_cases_keeps_idf_and_vectors():
+    cases = generate_cases(200, seed=7)
+    matcher = _hashing_matcher(cases)
+    idf, vectors = matcher.tfidf_vectorizer.idf.copy(), matcher.experience_vectors.copy()
+    # 删除部分案例后再加回（如刷新或按需加载时淘汰后重新加载）
+    matcher.supabase_service = SyntheticSupabaseService(cases[50:])
+    matcher._load_cases()
+    matcher.supabase_service = SyntheticSupabaseService(cases)
+    matcher._load_cases()
+    matcher._load_cases()
+
+    np.testing.assert_array_equal(matcher.tfidf_vectorizer.idf, idf)
+    assert matcher.tfidf_vectorizer.n_documents == 200
+    assert abs(matcher.experience_vectors - vectors).max() < 1e-12
+
+
+def test_hashing_mode_ranks_cases():
+    matcher = _hashing_matcher(generate_cases(200, seed=6))
+    user = generate_user_backgrounds(1, seed=1)[0]
+    results = matcher.find_similar_cases(user, top_n=10)
+    assert len(results) == 10
+    scores = [r["similarity_score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,37 @@
+# use the module instances the application code imports
+import services.llm_client as llm_client_mod
+from services.analysis_service import AnalysisService
+from services.gemini_service import GeminiService
+
+
+def test_llm_client_is_shared_and_caches_model_handles(monkeypatch):
+    calls = {"configure": 0, "models": []}
+
+    def fake_configure(api_key):
+        calls["configure"] += 1
+
+    class FakeModel:
+        def __init__(self, name):
+            calls["models"].append(name)
+            self.name = name
+
+    monkeypatch.setattr(llm_client_mod.settings, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_client_mod.genai, "configure", fake_configure)
+    monkeypatch.setattr(llm_client_mod.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(llm_client_mod, "_client", None)
+
+    a = GeminiService()
+    b = GeminiService()
+    assert a.llm_client is b.llm_client
+    # genai 在首次获取模型时才配置
+    assert calls["configure"] == 0
+
+    first = a.llm_client.get_model("gemma-3-27b-it")
+    second = b.llm_client.get_model("gemma-3-27b-it")
+    assert first is second
+    assert calls["models"] == ["gemma-3-27b-it"]
+    assert calls["configure"] == 1
+
+    svc = AnalysisService(similarity_matcher=object())
+    assert svc.radar_scoring_service.gemini_service is svc.gemini_service
+    assert calls["configure"] == 1
@@ -0,0 +1,44 @@
+import pytest
+
+from backend.services.major_classifier import get_major_classifier
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+@pytest.mark.parametrize("major, category", [
+    # 旧的硬编码映射中的专业保持原有类别
+    ("计算机科学与技术", "CS"),
+    ("数据科学与大数据技术", "CS"),
+    ("人工智能", "CS"),
+    ("电子信息工程", "EE"),
+    ("自动化", "EE"),
+    ("机械设计制造及其自动化", "ME"),
+    ("国际经济与贸易", "Finance"),
+    ("市场营销", "Business"),
+    # 目录中的其他专业、代码与专业类
+    ("物联网工程", "CS"),
+    ("080901", "CS"),
+    ("车辆工程", "ME"),
+    ("保险学", "Finance"),
+    ("信息管理与信息系统", "Business"),
+    ("计算机类", "CS"),
+    ("英语", "Other"),
+    # 回退：括号备注、关键词、目录名子串
+    ("软件工程（中外合作办学）", "CS"),
+    ("Computer Science", "CS"),
+    ("金融学（CFA方向）", "Finance"),
+    ("某某专业", "Other"),
+    ("", "Other"),
+])
+def test_major_categories(major, category):
+    assert get_major_classifier().category_of(major) == category
+
+
+def test_catalog_matches_expose_subcategory_and_feed_the_matcher():
+    classifier = get_major_classifier()
+    match = classifier.classify("通信工程")
+    assert (match.name, match.subcategory_code, match.category) == ("通信工程", "0807", "EE")
+    assert classifier.classify("应用数学").name == "数学与应用数学"
+
+    matcher = SimilarityMatcher(supabase_service=object())
+    assert matcher._get_user_major_category("人工智能") == "CS"
+    assert matcher._get_user_major_category("保险学") == "Finance"
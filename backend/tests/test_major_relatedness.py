@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.major_classifier import get_major_classifier
+from backend.services.major_relatedness import MajorRelatedness, RELATEDNESS_CONFIG_PATH
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def _key(major):
+    match = get_major_classifier().classify(major)
+    return match.category, match.subcategory_code
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("计算机科学与技术", "软件工程", 1.0),
+    ("计算机科学与技术", "电子信息工程", 0.6),
+    ("金融学", "会计学", 0.6),
+    ("英语", "日语", 1.0),
+    ("数学与应用数学", "统计学", 0.4),
+    ("数学与应用数学", "计算机科学与技术", 0.3),
+    ("英语", "法学", 0.1),
+    ("临床医学", "英语", 0.1),
+])
+def test_graded_relatedness_covers_all_disciplines(a, b, expected):
+    relatedness = MajorRelatedness.from_file(RELATEDNESS_CONFIG_PATH)
+    assert relatedness.similarity(_key(a), _key(b)) == expected
+    assert relatedness.similarity(_key(b), _key(a)) == expected
+
+
+def test_matrix_grows_with_new_keys_and_matches_pairwise_rules():
+    relatedness = MajorRelatedness.from_file(RELATEDNESS_CONFIG_PATH)
+    keys = [("CS", "0809"), ("EE", "0807"), ("Other", "0701"), ("Other", ""), ("CS", "0809")]
+    codes = relatedness.codes(keys)
+    assert codes[0] == codes[-1]
+    extra = relatedness.code(("Other", "0712"))
+    matrix = relatedness.matrix
+    assert matrix.shape == (extra + 1, extra + 1)
+    registered = keys[:4] + [("Other", "0712")]
+    for a in registered:
+        for b in registered:
+            assert matrix[relatedness.code(a), relatedness.code(b)] == relatedness.similarity(a, b)
+
+
+def test_codes_are_published_after_the_matrix_that_covers_them():
+    relatedness = MajorRelatedness.from_file(RELATEDNESS_CONFIG_PATH)
+
+    class CheckedCodes(dict):
+        def __setitem__(self, key, code):
+            # 不加锁的读取方一看到编码，就能在当前矩阵中取到对应的行
+            assert code < relatedness.matrix.shape[0]
+            super().__setitem__(key, code)
+
+    relatedness._codes = CheckedCodes()
+    relatedness.codes([("CS", "0809"), ("EE", "0807")])
+    relatedness.code(("Other", "0701"))
+    assert relatedness.row(("Other", "0701")).shape == (3,)
+
+
+def test_vectorized_scores_match_scalar_components():
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(generate_cases(300, seed=3)))
+    matcher.ensure_data_loaded()
+    user = generate_user_backgrounds(1, seed=4)[0]
+    results = matcher.find_similar_cases(user, top_n=20)
+    assert len(results) == 20
+    scores = [r['similarity_score'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+    user_gpa = matcher._convert_gpa_to_4_scale(user.gpa, user.gpa_scale)
+    user_tier = matcher._get_user_university_tier(user.undergraduate_university)
+    for result in results:
+        case = result['case_data']
+        components = result['component_scores']
+        assert components['gpa'] == matcher._calculate_gpa_similarity(user_gpa, case['gpa_4_scale'])
+        assert components['tier'] == matcher._calculate_university_tier_similarity(
+            user_tier, case['undergraduate_university_tier'])
+        assert components['experience'] == pytest.approx(
+            matcher._calculate_experience_similarity(user, case['id'] - 1))
+        assert np.isclose(result['similarity_score'], sum(
+            w * components[k] for k, w in
+            [('major', 0.25), ('gpa', 0.25), ('tier', 0.4), ('language', 0.05), ('experience', 0.05)]))
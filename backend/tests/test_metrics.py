@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.services.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets_and_merges_snapshots():
+    registry = MetricsRegistry()
+    hist = registry.register(Histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1.0)))
+    counter = registry.register(Counter("op_total", "Ops", ("op",)))
+
+    hist.observe(0.05, op="a")
+    hist.observe(0.5, op="a")
+    counter.inc(op="a")
+
+    other = MetricsRegistry()
+    other_hist = other.register(Histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1.0)))
+    other_counter = other.register(Counter("op_total", "Ops", ("op",)))
+    other_hist.observe(5.0, op="a")
+    other_counter.inc(2, op="a")
+    registry.merge(other.snapshot())
+
+    text = registry.render()
+    assert 'op_seconds_bucket{op="a",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="a",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{op="a",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="a"} 3' in text
+    assert 'op_total{op="a"} 3.0' in text
+
+
+def test_worker_gauges_are_merged_per_process():
+    registry = MetricsRegistry()
+    gauge = registry.register(Gauge("queue_depth", "Depth", ("queue",)))
+    gauge.set(4, queue="a")
+
+    worker = MetricsRegistry()
+    worker_gauge = worker.register(Gauge("queue_depth", "Depth", ("queue",)))
+    worker_counter = worker.register(Counter("op_total", "Ops", ("op",)))
+    worker_gauge.set(1, queue="a")
+    worker_counter.inc(op="a")
+    registry.merge(worker.drain(), process="101")
+    # 回传后工作进程的 Counter 清零，Gauge 保留当前值
+    assert worker_counter.get(op="a") == 0.0 and worker_gauge.get(queue="a") == 1.0
+
+    worker_gauge.set(3, queue="a")
+    registry.merge(worker.drain(), process="101")
+    assert gauge.get(queue="a") == 4.0
+    assert gauge.get(process="101", queue="a") == 3.0
+    text = registry.render()
+    assert 'queue_depth{queue="a"} 4.0' in text
+    assert 'queue_depth{queue="a",process="101"} 3.0' in text
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    for name in (
+        "similarity_find_similar_cases_seconds",
+        "gemini_call_seconds",
+        "supabase_page_fetch_seconds",
+        "analysis_report_seconds",
+        "retries_total",
+        "fallbacks_total",
+        "cache_requests_total",
+        "analysis_partial_failures_total",
+        "analysis_queue_depth",
+        "analysis_tasks_in_flight",
+    ):
+        assert f"# TYPE {name}" in body
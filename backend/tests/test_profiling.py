@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import backend.app.main as main_mod
+# use the profiling module instance the application code imports
+import services.profiling as profiling_mod
+from backend.models.schemas import UserBackground
+
+
+client = TestClient(main_mod.app)
+
+
+def _busy_wait(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_spans_are_nested_and_sampler_collects_stacks():
+    profile = profiling_mod.TaskProfile("t", sample_interval_seconds=0.002)
+    with profiling_mod.profiling(profile):
+        with profiling_mod.span("outer"):
+            with profiling_mod.span("inner", step=1):
+                _busy_wait(0.1)
+
+    data = profile.to_dict()
+    spans = {s["name"]: s for s in data["spans"]}
+    assert spans["inner"]["parent_id"] == spans["outer"]["id"]
+    assert spans["inner"]["attributes"] == {"step": 1}
+    assert spans["outer"]["duration_ms"] >= spans["inner"]["duration_ms"] >= 90
+    assert data["sample_count"] > 0
+    assert "_busy_wait" in data["collapsed_stacks"]
+
+
+def _other_request_busy_wait(seconds: float):
+    _busy_wait(seconds)
+
+
+def test_event_loop_samples_only_include_the_profiled_task():
+    profile = profiling_mod.TaskProfile("t", sample_interval_seconds=0.002)
+
+    async def profiled():
+        with profiling_mod.profiling(profile):
+            _busy_wait(0.1)
+            await asyncio.sleep(0.15)
+
+    async def other():
+        await asyncio.sleep(0.12)
+        _other_request_busy_wait(0.1)
+
+    async def main():
+        await asyncio.gather(profiled(), other())
+
+    asyncio.run(main())
+    stacks = profile.to_dict()["collapsed_stacks"]
+    assert "_busy_wait" in stacks
+    assert "_other_request_busy_wait" not in stacks
+
+
+def test_worker_threads_are_sampled_only_inside_spans():
+    profile = profiling_mod.TaskProfile("t", sample_interval_seconds=0.002)
+
+    def in_thread():
+        with profiling_mod.span("work"):
+            assert threading.get_ident() in profile.sampler._watched
+        return threading.get_ident()
+
+    async def main():
+        with profiling_mod.profiling(profile):
+            return await asyncio.to_thread(in_thread)
+
+    thread_id = asyncio.run(main())
+    assert thread_id not in profile.sampler._watched
+    assert profile.sampler._watched == {}
+
+
+def test_span_is_noop_without_active_profile():
+    with profiling_mod.span("ignored"):
+        pass
+
+
+def test_profile_endpoint_returns_task_profile():
+    class FakeService:
+        async def generate_analysis_report(self, ub):
+            with profiling_mod.span("report.fake"):
+                await asyncio.sleep(0.01)
+            return {"ok": True}
+
+    main_mod.analysis_service = FakeService()
+    try:
+        ub = UserBackground(
+            undergraduate_university="U",
+            undergraduate_major="M",
+            gpa=3.2,
+            gpa_scale="4.0",
+            graduation_year=2024,
+            target_countries=["US"],
+            target_majors=["CS"],
+            target_degree_type="Master",
+        )
+        main_mod.analysis_tasks["p1"] = {"status": "pending", "progress": 0, "created_at": "x", "profile_enabled": True}
+        asyncio.run(main_mod.process_analysis_task("p1", ub, profile=True))
+    finally:
+        main_mod.analysis_service = None
+
+    resp = client.get("/api/analyze/p1/profile")
+    assert resp.status_code == 200
+    assert [s["name"] for s in resp.json()["spans"]] == ["report.fake"]
+
+    resp = client.get("/api/analyze/p1/profile?format=collapsed")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+
+
+def test_profile_endpoint_404_when_profiling_disabled():
+    main_mod.analysis_tasks["p2"] = {"status": "pending", "progress": 0, "created_at": "x"}
+    resp = client.get("/api/analyze/p2/profile")
+    assert resp.status_code == 404
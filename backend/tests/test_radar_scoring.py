@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+
+from backend.models.schemas import UserBackground
+from backend.services.experience_scorer import (
+    ExperienceScorer, fit_calibration, fit_label_file, load_calibrations, save_calibrations,
+)
+from backend.services.radar_scoring_service import RadarScoringService
+
+
+class SlowGemini:
+    def __init__(self, delay=0.2, score=80):
+        self.delay = delay
+        self.score = score
+        self.calls = []
+
+    def evaluate_research_experience(self, text, fallback=50):
+        self.calls.append(("research", text))
+        time.sleep(self.delay)
+        return self.score
+
+    def evaluate_internship_experience(self, text, fallback=50):
+        self.calls.append(("internship", text))
+        time.sleep(self.delay)
+        return self.score
+
+
+def _background(research="发表SCI论文一篇", internship="腾讯 算法实习"):
+    return UserBackground(
+        undergraduate_university="清华大学",
+        undergraduate_major="计算机科学与技术",
+        gpa=3.8,
+        gpa_scale="4.0",
+        graduation_year=2025,
+        research_experiences=[{"name": research}],
+        internship_experiences=[{"company": internship}],
+        target_countries=["US"],
+        target_majors=["CS"],
+        target_degree_type="Master",
+    )
+
+
+def test_experience_evaluations_run_concurrently_and_are_memoized():
+    gemini = SlowGemini()
+    svc = RadarScoringService(gemini_service=gemini)
+    svc.experience_scorer_mode = "llm"
+
+    started = time.perf_counter()
+    scores = asyncio.run(svc.calculate_radar_scores(_background()))
+    elapsed = time.perf_counter() - started
+    assert scores[2] == 80 and scores[3] == 80
+    assert len(gemini.calls) == 2
+    assert elapsed < 0.35  # 两次 0.2s 的评估并发执行
+
+    # 全半角、大小写与空白差异不影响缓存命中
+    again = asyncio.run(svc.calculate_radar_scores(_background("发表SCI论文一篇  ", "腾讯　算法实习")))
+    assert again == scores
+    assert len(gemini.calls) == 2
+
+
+def test_failed_evaluation_is_not_cached():
+    gemini = SlowGemini(delay=0, score=None)
+    svc = RadarScoringService(gemini_service=gemini)
+    svc.experience_scorer_mode = "llm"
+
+    scores = asyncio.run(svc.calculate_radar_scores(_background()))
+    assert scores[2] == 50 and scores[3] == 50
+    asyncio.run(svc.calculate_radar_scores(_background()))
+    assert len(gemini.calls) == 4
+
+
+def test_confident_heuristic_scores_skip_the_llm():
+    gemini = SlowGemini(delay=0, score=70)
+    svc = RadarScoringService(gemini_service=gemini, experience_scorer=ExperienceScorer())
+    background = _background(
+        "以第一作者身份在CVPR发表论文，参与国家自然科学基金项目，负责深度学习模型设计",
+        "字节跳动后端开发实习，负责接口优化，QPS提升30%",
+    )
+    scores = asyncio.run(svc.calculate_radar_scores(background))
+    assert gemini.calls == []
+    assert scores[2] >= 90 and scores[3] >= 80
+
+
+def test_low_confidence_falls_back_to_llm_and_records_labels(tmp_path):
+    gemini = SlowGemini(delay=0, score=70)
+    labels = tmp_path / "labels.jsonl"
+    scorer = ExperienceScorer(labels_path=labels)
+    svc = RadarScoringService(gemini_service=gemini, experience_scorer=scorer)
+    scores = asyncio.run(svc.calculate_radar_scores(_background("课程作业", "某公司实习")))
+    assert len(gemini.calls) == 2
+    assert scores[2] == 70 and scores[3] == 70
+    recorded = sorted(json.loads(line)["kind"] for line in labels.read_text().splitlines())
+    assert recorded == ["internship", "research"]
+    # 标注样本不改变运行中的评分
+    assert scorer.score("research", "课程作业").score == ExperienceScorer().score("research", "课程作业").score
+
+
+def test_calibration_maps_heuristic_scores_towards_llm_scores():
+    text = "阿里巴巴数据分析实习"
+    raw = ExperienceScorer().score("internship", text).raw_score
+    # 大模型评分系统性地比本地原始分高 10 分
+    calibration = fit_calibration([(raw + offset % 5, raw + offset % 5 + 10) for offset in range(30)])
+    scorer = ExperienceScorer({"internship": calibration})
+    assert scorer.score("internship", text).score == round(raw + 10)
+
+
+def test_calibration_is_monotonic_and_separates_strong_experiences(tmp_path):
+    # 样本只覆盖原始分 40-50（大模型只评估低置信度的经历），范围外沿拟合直线外推
+    calibration = fit_calibration([(40 + offset % 11, 0.8 * (40 + offset % 11) + 20) for offset in range(30)])
+    calibrated = [calibration.apply(raw) for raw in range(30, 131, 5)]
+    assert calibrated == sorted(set(calibrated))
+    scorer = ExperienceScorer({"research": calibration})
+    strong = scorer.score("research", "以第一作者身份在CVPR发表论文，参与国家自然科学基金项目，负责深度学习模型设计")
+    moderate = scorer.score("research", "参与课题组科研项目，负责实验设计，论文在投")
+    assert strong.raw_score > moderate.raw_score > 50
+    assert strong.score > moderate.score
+    assert fit_calibration([(45, 50)] * 5) is None
+    # 斜率不为正的拟合会打乱原始分的先后顺序，不采用
+    assert fit_calibration([(40 + offset % 11, 90 - (40 + offset % 11)) for offset in range(30)]) is None
+
+    path = tmp_path / "calibration.json"
+    save_calibrations({"research": calibration}, path)
+    assert load_calibrations(path) == {"research": calibration}
+    assert load_calibrations(tmp_path / "missing.json") == {}
+
+
+def test_labels_are_written_for_offline_fitting(tmp_path):
+    labels = tmp_path / "labels.jsonl"
+    scorer = ExperienceScorer(labels_path=labels)
+    for raw in range(40, 70):
+        scorer.record_label("research", raw, raw + 5)
+    fitted = fit_label_file(labels)
+    assert set(fitted) == {"research"}
+    assert round(fitted["research"].apply(50), 6) == 55
+
+
+def test_confident_local_scores_are_cached():
+    gemini = SlowGemini(delay=0, score=70)
+    svc = RadarScoringService(gemini_service=gemini, experience_scorer=ExperienceScorer())
+    text = "以第一作者身份在CVPR发表论文，参与国家自然科学基金项目，负责深度学习模型设计"
+    score = asyncio.run(svc._evaluate_experience("research", text, gemini.evaluate_research_experience))
+    assert svc.experience_score_cache.get(("research", svc._experience_digest(text))) == score
@@ -0,0 +1,59 @@
+import multiprocessing
+import time
+
+from backend.services.rate_limiter import BucketStore, ModelQuota, RateLimiter, estimate_tokens, parse_quotas
+
+
+def test_parse_quotas_and_estimate_tokens():
+    quotas = parse_quotas("gemma-3-27b-it:30:15000, bad-entry ,gemini-1.5-flash:15:1000000")
+    assert set(quotas) == {"gemma-3-27b-it", "gemini-1.5-flash"}
+    assert quotas["gemma-3-27b-it"].rpm == 30 and quotas["gemma-3-27b-it"].tpm == 15000
+
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("abcdefgh") == 2
+
+
+def test_acquire_waits_for_refill_when_no_alternative():
+    # 120 RPM => 每 0.5 秒补充一个请求
+    limiter = RateLimiter({"a": ModelQuota(rpm=120, tpm=0)}, max_wait_seconds=5)
+    for _ in range(120):
+        assert limiter.try_acquire("a", 10) == 0.0
+    assert limiter.try_acquire("a", 10) > 0
+
+    started = time.monotonic()
+    assert limiter.acquire("a", 10) is True
+    assert 0.2 < time.monotonic() - started < 2.0
+
+
+def test_acquire_routes_to_candidate_with_headroom_or_gives_up():
+    limiter = RateLimiter({"a": ModelQuota(rpm=0, tpm=100), "b": ModelQuota(rpm=0, tpm=100)}, max_wait_seconds=0.05)
+    assert limiter.acquire("a", 100) is True
+    # a 已无余量，b 有余量：立即改用 b
+    assert limiter.acquire("a", 50, alternatives=["b"]) is False
+    assert limiter.acquire("b", 50) is True
+    # 没有其他候选时等待超过上限即放弃
+    assert limiter.acquire("a", 100) is False
+    # 未配置的模型不限流
+    assert limiter.acquire("unknown", 10 ** 9) is True
+
+
+def test_usage_reconciliation_and_throttle_feedback():
+    limiter = RateLimiter({"a": ModelQuota(rpm=60, tpm=1000)})
+    assert limiter.try_acquire("a", 100) == 0.0
+    # 实际只用了 10 个 token，归还多估的部分
+    limiter.record_usage("a", 100, 10)
+    assert limiter.has_headroom("a", 985)
+    limiter.report_throttled("a")
+    assert not limiter.has_headroom("a", 1)
+
+
+def test_bucket_state_can_be_shared_across_processes():
+    with multiprocessing.get_context("spawn").Manager() as manager:
+        state, lock = manager.dict(), manager.Lock()
+        quotas = {"a": ModelQuota(rpm=2, tpm=0)}
+        first = RateLimiter(quotas, store=BucketStore(state, lock))
+        second = RateLimiter(quotas, store=BucketStore(state, lock))
+        assert first.try_acquire("a", 1) == 0.0
+        assert second.try_acquire("a", 1) == 0.0
+        assert first.try_acquire("a", 1) > 0
@@ -16,3 +16,47 @@ def test_similar_cases_endpoint_basic():
         assert len(data["items"]) <= 3
 
 
+
+
+def _synthetic_service(monkeypatch, seed=11):
+    from types import SimpleNamespace
+    import backend.app.main as main
+    from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases
+    from backend.services.similarity_matcher import SimilarityMatcher
+
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(generate_cases(60, seed=seed)))
+    monkeypatch.setattr(main, "analysis_service", SimpleNamespace(similarity_matcher=matcher))
+    return matcher
+
+
+def test_similar_cases_cursor_pages_cover_the_ranking(monkeypatch):
+    _synthetic_service(monkeypatch)
+    seen, cursor, totals = [], None, set()
+    while True:
+        resp = client.get("/api/similar-cases", params={"limit": 25, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        data = resp.json()
+        totals.add(data["total"])
+        seen.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert totals == {len(seen)}
+    assert len(seen) == len(set(seen)) > 25
+    item = data["items"][0]
+    assert "experience_text" not in item and "similarity_score" in item
+
+
+def test_similar_cases_etag_and_stale_cursor(monkeypatch):
+    matcher = _synthetic_service(monkeypatch)
+    first = client.get("/api/similar-cases?limit=10")
+    etag = first.headers["etag"]
+    assert client.get("/api/similar-cases?limit=10", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/similar-cases?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+    cursor = first.json()["next_cursor"]
+    matcher._load_cases()
+    resp = client.get("/api/similar-cases", params={"limit": 10, "cursor": cursor})
+    assert resp.status_code == 400
+    assert client.get("/api/similar-cases?limit=10", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api/similar-cases", params={"cursor": "not-a-cursor"}).status_code == 400
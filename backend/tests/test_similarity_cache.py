@@ -0,0 +1,69 @@
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.lru import LRUCache
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def _matcher():
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(generate_cases(200, seed=7)))
+    matcher.ensure_data_loaded()
+    return matcher
+
+
+def test_equivalent_profiles_share_one_ranking():
+    matcher = _matcher()
+    user = generate_user_backgrounds(1, seed=2)[0]
+    first = matcher.find_similar_cases(user, top_n=10)
+
+    reordered = user.model_copy(update={"target_countries": list(reversed(user.target_countries)) * 2})
+    calls = []
+    original = matcher._compute_ranking
+    matcher._compute_ranking = lambda query: calls.append(query) or original(query)
+    second = matcher.find_similar_cases(reordered, top_n=30)
+
+    assert calls == []
+    assert second[:10] == first
+    assert len(second) == 30
+
+
+def test_language_type_without_score_does_not_split_the_cache():
+    matcher = _matcher()
+    user = generate_user_backgrounds(1, seed=3)[0].model_copy(update={"language_total_score": None})
+    assert matcher._build_query(user) == matcher._build_query(user.model_copy(update={"language_test_type": "IELTS"}))
+
+
+def test_reload_invalidates_cached_rankings():
+    matcher = _matcher()
+    user = generate_user_backgrounds(1, seed=4)[0]
+    before = matcher.find_similar_cases(user, top_n=5)
+
+    matcher.supabase_service = SyntheticSupabaseService(generate_cases(200, seed=8))
+    version = matcher.data_version
+    matcher._load_cases()
+    after = matcher.find_similar_cases(user, top_n=5)
+
+    assert matcher.data_version == version + 1
+    assert after != before
+
+
+def test_cached_rankings_are_truncated_and_do_not_hold_the_table():
+    matcher = _matcher()
+    matcher.pruning = False
+    user = generate_user_backgrounds(1, seed=5)[0].model_copy(update={"target_countries": []})
+    ranking = matcher.rank_cases(user, limit=20)
+    assert ranking.cases_df is matcher.cases_df
+
+    cached = matcher._ranking_cache.get(matcher._build_query(user))
+    assert cached.cases_df is None
+    # 至少保留前 SIMILAR_CASES_LIMIT（150）名
+    assert cached.partial and len(cached.positions) == 150
+    assert all(len(values) == len(cached.positions) for values in cached.components.values())
+
+
+def test_ranking_cache_is_bounded_by_bytes():
+    cache = LRUCache("test_bytes", maxsize=100, max_bytes=100, sizeof=len)
+    cache.put("a", b"x" * 60)
+    cache.put("b", b"x" * 30)
+    cache.put("c", b"x" * 30)
+    assert cache.get("a") is None and cache.nbytes == 60
+    cache.put("huge", b"x" * 101)
+    assert cache.get("huge") is None and len(cache) == 2
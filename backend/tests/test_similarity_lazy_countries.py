@@ -0,0 +1,191 @@
+import pytest
+
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+class RecordingSupabaseService(SyntheticSupabaseService):
+    def __init__(self, cases):
+        super().__init__(cases)
+        self.queries = []
+
+    def iter_case_pages(self, filters=None, page_size=None):
+        self.queries.append(filters)
+        return super().iter_case_pages(filters, page_size)
+
+
+def _lazy_matcher(cases, budget_bytes=1 << 40):
+    matcher = SimilarityMatcher(supabase_service=RecordingSupabaseService(cases))
+    matcher.lazy_countries, matcher.preload_countries = True, []
+    matcher.memory_budget_bytes = budget_bytes
+    matcher.ensure_data_loaded()
+    return matcher
+
+
+def _full_matcher(cases, experience_features="tfidf"):
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+    matcher.experience_features = experience_features
+    matcher.ensure_data_loaded()
+    return matcher
+
+
+def _assert_same_cases(results, expected):
+    """案例与顺序相同，分数一致（稀疏向量的列顺序不同，只允许浮点舍入误差）"""
+    assert [r["case_id"] for r in results] == [r["case_id"] for r in expected]
+    assert [r["similarity_score"] for r in results] == pytest.approx([r["similarity_score"] for r in expected])
+
+
+def _user(countries, seed=31):
+    return generate_user_backgrounds(1, seed=seed)[0].model_copy(update={"target_countries": countries})
+
+
+def _resident_countries(matcher):
+    return set(matcher.cases_df['admitted_country'])
+
+
+def test_only_target_countries_are_loaded():
+    cases = generate_cases(600, seed=30)
+    matcher = _lazy_matcher(cases)
+    # 加载时只流式读取一遍全表拟合经历特征，不保留案例
+    assert matcher.cases_df is None and matcher.supabase_service.queries == [None]
+
+    user = _user(["UK"])
+    results = matcher.find_similar_cases(user, top_n=20)
+    assert matcher.supabase_service.queries == [None, {"admitted_country": ["UK"]}]
+    assert _resident_countries(matcher) == {"UK"}
+    # 与全量加载的结果一致
+    _assert_same_cases(results, _full_matcher(cases).find_similar_cases(user, top_n=20))
+
+    matcher.find_similar_cases(user, top_n=20)
+    matcher.find_similar_cases(_user(["UK", "US"]), top_n=20)
+    assert matcher.supabase_service.queries[2:] == [{"admitted_country": ["US"]}]
+    assert _resident_countries(matcher) == {"UK", "US"}
+
+
+def test_least_recently_used_countries_are_evicted():
+    cases = generate_cases(900, seed=32)
+    probe = _lazy_matcher(cases)
+    probe.rank_cases(_user(["US"]))
+    matcher = _lazy_matcher(cases, budget_bytes=int(probe._resident_bytes() * 1.2))
+
+    matcher.rank_cases(_user(["US"]))
+    matcher.rank_cases(_user(["UK"]))
+    assert _resident_countries(matcher) == {"UK"}
+    assert list(matcher._country_usage) == ["UK"]
+
+    matcher.rank_cases(_user(["US"]))
+    assert matcher.supabase_service.queries[-1] == {"admitted_country": ["US"]}
+    assert _resident_countries(matcher) == {"US"}
+
+
+def test_query_without_countries_uses_the_full_snapshot_and_refresh_keeps_the_loaded_set():
+    cases = generate_cases(400, seed=33)
+    matcher = _lazy_matcher(cases)
+    matcher.rank_cases(_user(["HK"]))
+    version = matcher.data_version
+    matcher._load_cases()
+    assert matcher.supabase_service.queries[-1] == {"admitted_country": ["HK"]}
+    assert matcher.data_version == version + 1
+
+    ranking = matcher.rank_cases(_user([]))
+    assert matcher.supabase_service.queries[-1] is None
+    assert len(ranking.cases_df) == len(cases)
+    # 全量快照不计入常驻国家
+    assert _resident_countries(matcher) == {"HK"}
+    matcher.rank_cases(_user(["SG"]))
+    assert matcher.supabase_service.queries[-1] == {"admitted_country": ["SG"]}
+    assert _resident_countries(matcher) == {"HK", "SG"}
+
+    # 刷新时重新下载常驻国家，并重建已有的全量快照
+    matcher._load_cases()
+    assert matcher.supabase_service.queries[-3:] == [None, {"admitted_country": ["HK", "SG"]}, None]
+    assert matcher.rank_cases(_user([])).snapshot_id != ranking.snapshot_id
+
+
+def test_memory_budget_still_applies_after_an_all_country_query():
+    cases = generate_cases(900, seed=35)
+    probe = _lazy_matcher(cases)
+    probe.rank_cases(_user(["US"]))
+    budget = int(probe._resident_bytes() * 1.2)
+    matcher = _lazy_matcher(cases, budget_bytes=budget)
+
+    exploration = matcher.rank_cases(_user([]))
+    assert len(exploration.cases_df) == len(cases)
+    # 全量快照超过预算，只供本次查询使用，已返回的排序仍可分页
+    assert matcher._full_snapshot is None and matcher._resident_bytes() <= budget
+    assert len(SimilarityMatcher.project_page(exploration, 0, 20, ("id",))) == 20
+    matcher.rank_cases(_user(["US"]))
+    matcher.rank_cases(_user(["UK"]))
+    assert _resident_countries(matcher) == {"UK"}
+    assert list(matcher._country_usage) == ["UK"]
+    # 之后的全量查询重新下载，快照标识不变，分页游标仍然有效
+    assert matcher.rank_cases(_user([])).snapshot_id == exploration.snapshot_id
+    assert matcher.supabase_service.queries.count(None) == 3
+    assert matcher._resident_bytes() <= budget
+    # 刷新后更换标识
+    matcher._load_cases()
+    assert matcher.rank_cases(_user([])).snapshot_id != exploration.snapshot_id
+
+
+def test_resident_bytes_stay_within_budget_after_an_all_country_query():
+    cases = generate_cases(900, seed=38)
+    probe = _lazy_matcher(cases)
+    probe.rank_cases(_user([]))
+    budget = int(probe._resident_bytes() * 1.1)
+    matcher = _lazy_matcher(cases, budget_bytes=budget)
+
+    matcher.rank_cases(_user(["US"]))
+    exploration = matcher.rank_cases(_user([]))
+    # 全量快照计入预算：淘汰最久未使用的国家后常驻
+    assert matcher._resident_bytes() <= budget
+    assert _resident_countries(matcher) == set() and list(matcher._country_usage) == ["*"]
+    assert matcher.rank_cases(_user([])).snapshot_id == exploration.snapshot_id
+    assert matcher.supabase_service.queries.count(None) == 2
+
+    # 全量快照同样按最近使用淘汰
+    matcher.rank_cases(_user(["US"]))
+    assert matcher._resident_bytes() <= budget
+    assert matcher._full_snapshot is None and list(matcher._country_usage) == ["US"]
+
+
+def test_rankings_keep_the_snapshot_they_started_with():
+    cases = generate_cases(900, seed=36)
+    probe = _lazy_matcher(cases)
+    probe.rank_cases(_user(["US"]))
+    matcher = _lazy_matcher(cases, budget_bytes=int(probe._resident_bytes() * 1.2))
+
+    ranking = matcher.rank_cases(_user(["US"]))
+    page = SimilarityMatcher.project_page(ranking, 0, 20, ("id", "admitted_country"))
+    # 加载 UK 时淘汰 US，已返回的排序仍引用原快照的案例表
+    matcher.rank_cases(_user(["UK"]))
+    assert ranking.snapshot_id != matcher.snapshot_id
+    assert SimilarityMatcher.project_page(ranking, 0, 20, ("id", "admitted_country")) == page
+    assert {row["admitted_country"] for row in page} == {"US"}
+
+
+def test_countries_without_cases_fall_back_to_all_cases():
+    cases = generate_cases(300, seed=34)
+    matcher = _lazy_matcher(cases)
+    assert len(matcher.rank_cases(_user(["ZZ"])).positions) == len(cases)
+    assert matcher.supabase_service.queries == [None, {"admitted_country": ["ZZ"]}, None]
+
+
+@pytest.mark.parametrize("experience_features", ["tfidf", "hashing"])
+def test_rankings_do_not_depend_on_which_countries_are_resident(experience_features):
+    cases = generate_cases(900, seed=37)
+    probe = _lazy_matcher(cases)
+    probe.rank_cases(_user(["US"]))
+    budget = int(probe._resident_bytes() * 1.2)
+    matcher = SimilarityMatcher(supabase_service=RecordingSupabaseService(cases))
+    matcher.lazy_countries, matcher.preload_countries = True, []
+    matcher.memory_budget_bytes, matcher.experience_features = budget, experience_features
+    matcher.ensure_data_loaded()
+
+    user = _user(["US"])
+    before = matcher.find_similar_cases(user, top_n=30)
+    matcher.rank_cases(_user(["UK", "US"]))
+    matcher.rank_cases(_user(["HK"]))
+    assert "HK" in _resident_countries(matcher)
+    # 其他国家加载、淘汰后重新加载同一国家，结果（案例与分数）完全相同
+    assert matcher.find_similar_cases(user, top_n=30) == before
+    _assert_same_cases(before, _full_matcher(cases, experience_features).find_similar_cases(user, top_n=30))
@@ -0,0 +1,45 @@
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def _matcher(cases, pruning=True, sharding=False):
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+    matcher.pruning, matcher.sharding = pruning, sharding
+    matcher.ensure_data_loaded()
+    return matcher
+
+
+def test_pruned_top_n_matches_full_scoring():
+    cases = generate_cases(4000, seed=31)
+    full = _matcher(cases, pruning=False)
+    pruned, sharded = _matcher(cases), _matcher(cases, sharding=True)
+
+    for user in generate_user_backgrounds(6, seed=32):
+        expected = full.find_similar_cases(user, top_n=150)
+        assert pruned.find_similar_cases(user, top_n=150) == expected
+        assert sharded.find_similar_cases(user, top_n=150) == expected
+
+
+def test_pruning_statistics_are_reported():
+    matcher = _matcher(generate_cases(4000, seed=33))
+    user = generate_user_backgrounds(1, seed=34)[0].model_copy(update={"target_countries": [], "target_degree_type": ""})
+
+    ranking = matcher.rank_cases(user, limit=10)
+    stats = ranking.pruning
+    assert stats.candidates == 4000
+    assert stats.scored + stats.pruned == stats.candidates
+    assert stats.pruned > 0
+    assert ranking.partial and len(ranking.positions) == 150
+
+
+def test_browsing_past_a_partial_ranking_scores_everything():
+    matcher = _matcher(generate_cases(4000, seed=35))
+    user = generate_user_backgrounds(1, seed=36)[0].model_copy(update={"target_countries": [], "target_degree_type": ""})
+    top = matcher.rank_cases(user, limit=10)
+
+    ranking = matcher.rank_cases(user)
+    assert not ranking.partial
+    assert len(ranking.positions) == 4000
+    assert list(ranking.positions[:150]) == list(top.positions)
+    # 完整排序命中缓存（返回时绑定案例表，数组与缓存中的相同）
+    assert matcher.rank_cases(user, limit=20).positions is ranking.positions
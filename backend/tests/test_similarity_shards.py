@@ -0,0 +1,43 @@
+from backend.benchmarks.synthetic_cases import SyntheticSupabaseService, generate_cases, generate_user_backgrounds
+from backend.services.similarity_matcher import SimilarityMatcher
+
+
+def _matcher(cases, sharding):
+    matcher = SimilarityMatcher(supabase_service=SyntheticSupabaseService(cases))
+    matcher.sharding = sharding
+    matcher.ensure_data_loaded()
+    return matcher
+
+
+def _ranked_ids(matcher, user):
+    ranking = matcher.rank_cases(user)
+    return list(ranking.cases_df['id'].to_numpy()[ranking.positions]), list(ranking.scores)
+
+
+def test_sharded_ranking_matches_unsharded():
+    cases = generate_cases(1500, seed=21)
+    plain, sharded = _matcher(cases, False), _matcher(cases, True)
+    assert len(sharded._shards) > 1
+
+    for user in generate_user_backgrounds(8, seed=22):
+        assert _ranked_ids(sharded, user) == _ranked_ids(plain, user)
+        assert sharded.find_similar_cases(user, top_n=20) == plain.find_similar_cases(user, top_n=20)
+
+
+def test_only_target_shards_are_scored():
+    cases = generate_cases(800, seed=23)
+    matcher = _matcher(cases, True)
+    user = generate_user_backgrounds(1, seed=24)[0].model_copy(
+        update={"target_countries": ["UK"], "target_degree_type": "Master"}
+    )
+    ranking = matcher.rank_cases(user)
+    expected = sum(1 for c in cases if c["admitted_country"] == "UK" and c["admitted_degree_type"] == "Master")
+    assert len(ranking.positions) == expected
+    assert set(ranking.cases_df.iloc[ranking.positions]['admitted_country']) == {"UK"}
+
+
+def test_unknown_country_falls_back_to_all_shards():
+    cases = generate_cases(300, seed=25)
+    matcher = _matcher(cases, True)
+    user = generate_user_backgrounds(1, seed=26)[0].model_copy(update={"target_countries": ["ZZ"]})
+    assert len(matcher.rank_cases(user).positions) == len(cases)
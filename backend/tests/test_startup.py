@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from backend.services.startup import StartupReport, lazy_import
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_app_import_defers_heavy_dependencies():
+    code = (
+        "import sys, app.main;"
+        "heavy = ('pandas', 'sklearn', 'google.generativeai', 'supabase');"
+        "print([m for m in heavy if m in sys.modules and type(sys.modules[m]).__name__ != '_LazyModule'])"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_lazy_import_loads_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+    module = lazy_import("colorsys")
+    assert type(module).__name__ == "_LazyModule"
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0)[0] == 0.0
+    assert lazy_import("colorsys") is sys.modules["colorsys"]
+
+
+def test_startup_report_formats_phases():
+    report = StartupReport()
+    report.record("import app.main", 0.5)
+    with report.phase("init analysis_service"):
+        pass
+    report.import_module("json")
+    names = [name for name, _ in report.phases()]
+    assert names == ["import app.main", "init analysis_service", "import json"]
+    text = report.format()
+    assert text.splitlines()[1].startswith("import app.main")
+    assert "total" in text.splitlines()[-1]
+    assert report.summary().startswith("0.5")
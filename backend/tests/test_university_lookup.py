@@ -0,0 +1,79 @@
+import pytest
+
+from backend.models.schemas import UserBackground
+from backend.services.radar_scoring_service import RadarScoringService
+from backend.services.university_lookup import get_university_lookup, normalize_university_name
+from backend.services.university_scoring_service import UniversityScoringService
+
+
+def test_normalized_variants_and_aliases_resolve_to_canonical_names():
+    lookup = get_university_lookup()
+    assert lookup is get_university_lookup()
+
+    assert normalize_university_name(" 中国地质大学（北京） ") == "中国地质大学(北京)"
+    assert lookup.match("中国地质大学(北京)").name == "中国地质大学（北京）"
+    assert lookup.match("中国地质大学（北京）").tier == "Tier 3"
+    assert lookup.match("北航") == ("北京航空航天大学", "Tier 1")
+    assert lookup.match("tsinghua  university").name == "清华大学"
+    assert lookup.match("某某学院") is None
+    assert lookup.tier_of("某某学院") == "Tier 4"
+
+    with pytest.raises(TypeError):
+        lookup.tier_by_name["某某学院"] = "Tier 0"
+
+
+@pytest.mark.parametrize("name", ["清华大学", "北京外国语大学", "西南政法大学", "哈尔滨工程大学", "某某学院"])
+def test_radar_and_similarity_scoring_agree_on_tiers(name):
+    lookup = get_university_lookup()
+    _, tier = UniversityScoringService().get_university_score_and_tier(name)
+    assert tier == lookup.tier_of(name)
+
+    radar = RadarScoringService(gemini_service=object())
+    background = UserBackground(
+        undergraduate_university=name, undergraduate_major="计算机科学与技术", gpa=3.5, gpa_scale="4.0",
+        graduation_year=2025, target_countries=["US"], target_majors=["CS"], target_degree_type="Master",
+    )
+    low, high = lookup.score_range(tier)
+    assert radar._calculate_university_score(background) == int((low + high) / 2)
+
+
+@pytest.mark.parametrize("name, expected, tier", [
+    ("中国地质大学北京", "中国地质大学（北京）", "Tier 3"),
+    ("清华大雪", "清华大学", "Tier 0"),
+    ("南京航空航天", "南京航空航天大学", "Tier 2"),
+    ("西安电子科大", "西安电子科技大学", "Tier 2"),
+    ("河南大学", "河南大学", "Tier 4"),
+])
+def test_fuzzy_resolution_returns_canonical_name_and_confidence(name, expected, tier):
+    resolution = get_university_lookup().resolve(name)
+    assert resolution is not None
+    assert (resolution.name, resolution.tier) == (expected, tier)
+    assert 0.6 <= resolution.confidence < 1.0
+    assert UniversityScoringService().get_university_score_and_tier(name)[1] == tier
+
+
+def test_unresolvable_names_fall_back_to_tier_4():
+    lookup = get_university_lookup()
+    assert lookup.resolve("某某学院") is None
+    assert lookup.resolve("大学") is None
+    assert lookup.resolve("北航").confidence == 1.0
+
+
+@pytest.mark.parametrize("name", ["中山大学南方学院", "山东大学威海", "山东大学威海分校", "吉林大学珠海学院", "浙江大学城市学院"])
+def test_branch_campuses_and_independent_colleges_do_not_inherit_other_tiers(name):
+    # 分校、独立学院不解析为主校，也不解析为其他大学的同名附属学院
+    assert get_university_lookup().resolve(name) is None
+    assert get_university_lookup().tier_of(name) == "Tier 4"
+
+
+def test_matching_campus_suffix_still_resolves():
+    lookup = get_university_lookup()
+    assert lookup.resolve("北京理工大学珠海学园").name == "北京理工大学珠海学院"
+    assert lookup.resolve("中国石油大学华东").name == "中国石油大学（华东）"
+
+
+def test_name_without_campus_suffix_resolves_to_the_main_campus():
+    # 没有后缀时只比较主校名，不解析为主校名不同的“河北地质大学”
+    resolution = get_university_lookup().resolve("中国地质大学")
+    assert (resolution.name, resolution.tier) == ("中国地质大学（北京）", "Tier 3")
+    assert 0.6 <= resolution.confidence < 1.0